@@ -1,10 +1,15 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import StreamingResponse
-from database.connection import SessionLocal
-from models.models import MaterialEntry, SampleRequest
+from database.connection import SessionLocal, check_database_settings
+from models.models import MaterialEntry, SampleRequest, Supplier
 from utils.reports import ReportGenerator
+from utils.response_cache import ConditionalGetMiddleware
+from utils.change_events import change_broadcaster, change_event_response
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import base64
 import io
 
 app = FastAPI(
@@ -13,6 +18,22 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Кэшируемые GET-маршруты: путь -> таблицы, от которых зависит ответ
+CACHED_ROUTES = [
+    (r"/materials", ("material_entries", "suppliers")),
+    (r"/materials/\d+", ("material_entries",)),
+    (r"/samples", ("sample_requests",)),
+    (r"/statistics", ("material_entries",)),
+]
+
+app.add_middleware(ConditionalGetMiddleware, routes=CACHED_ROUTES)
+
+@app.on_event("startup")
+async def startup_self_check():
+    """Проверка настроек базы данных при запуске"""
+    check_database_settings()
+    change_broadcaster.start()
+
 def get_db():
     """Dependency для получения сессии БД"""
     db = SessionLocal()
@@ -21,29 +42,143 @@ def get_db():
     finally:
         db.close()
 
+# Поля, доступные для выборки в /materials (fields=...)
+MATERIAL_LIST_FIELDS = {
+    "id": MaterialEntry.id,
+    "material_grade": MaterialEntry.material_grade,
+    "material_type": MaterialEntry.material_type,
+    "batch_number": MaterialEntry.batch_number,
+    "melt_number": MaterialEntry.melt_number,
+    "supplier_id": MaterialEntry.supplier_id,
+    "supplier_name": Supplier.name,
+    "status": MaterialEntry.status,
+    "quantity": MaterialEntry.quantity,
+    "unit": MaterialEntry.unit,
+    "certificate_number": MaterialEntry.certificate_number,
+    "order_number": MaterialEntry.order_number,
+    "created_at": MaterialEntry.created_at,
+    "updated_at": MaterialEntry.updated_at,
+}
+
+DEFAULT_MATERIAL_FIELDS = [
+    "id", "material_grade", "material_type", "batch_number", "melt_number",
+    "supplier_id", "status", "created_at", "updated_at"
+]
+
+# Размер страницы /materials, если передан только cursor
+DEFAULT_PAGE_SIZE = 100
+
+def encode_cursor(created_at, material_id: int) -> str:
+    """Курсор страницы: позиция последней выданной записи (created_at, id); created_at может быть NULL"""
+    raw = f"{created_at.isoformat() if created_at else ''}|{material_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """Разбор курсора, полученного из encode_cursor"""
+    try:
+        created_at, material_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return (datetime.fromisoformat(created_at) if created_at else None), int(material_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
 @app.get("/materials", response_model=List[Dict[str, Any]])
-async def get_materials(db: Session = Depends(get_db)):
-    """Получить список всех материалов"""
+async def get_materials(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Количество записей на странице (без limit и cursor - весь список)"),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    fields: Optional[str] = Query(None, description="Список полей через запятую"),
+    status: Optional[str] = Query(None, description="Статус"),
+    supplier_id: Optional[int] = Query(None, description="ID поставщика"),
+    material_grade: Optional[str] = Query(None, description="Марка материала"),
+    date_from: Optional[datetime] = Query(None, description="Дата поступления с"),
+    date_to: Optional[datetime] = Query(None, description="Дата поступления по"),
+    melt_number: Optional[str] = Query(None, description="Номер плавки (часть)"),
+    batch_number: Optional[str] = Query(None, description="Номер партии (часть)"),
+    search: Optional[str] = Query(None, description="Поиск по марке, партии и плавке"),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить список материалов (новые первыми).
+    
+    Без limit и cursor возвращается весь список, как раньше. С limit или
+    cursor - постранично (по умолчанию DEFAULT_PAGE_SIZE записей): страницы
+    выбираются по ключу (created_at, id), курсор следующей страницы
+    возвращается в заголовке X-Next-Cursor, его нет на последней странице.
+    Записи без created_at идут в конце списка.
+    """
+    requested_fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else DEFAULT_MATERIAL_FIELDS
+    unknown_fields = [field for field in requested_fields if field not in MATERIAL_LIST_FIELDS]
+    if unknown_fields:
+        raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(unknown_fields)}")
+    
     try:
-        materials = db.query(MaterialEntry).filter(
-            MaterialEntry.is_deleted == False
-        ).all()
+        # id и created_at нужны для курсора, даже если не запрошены
+        selected_fields = list(dict.fromkeys(["id", "created_at"] + requested_fields))
+        query = db.query(*[MATERIAL_LIST_FIELDS[field].label(field) for field in selected_fields])
+        if "supplier_name" in selected_fields:
+            query = query.outerjoin(Supplier, Supplier.id == MaterialEntry.supplier_id)
+        
+        query = query.filter(MaterialEntry.is_deleted == False)
+        
+        # Фильтры расширенного поиска склада
+        if status:
+            query = query.filter(MaterialEntry.status == status)
+        if supplier_id:
+            query = query.filter(MaterialEntry.supplier_id == supplier_id)
+        if material_grade:
+            query = query.filter(MaterialEntry.material_grade == material_grade)
+        if date_from:
+            query = query.filter(MaterialEntry.created_at >= date_from)
+        if date_to:
+            query = query.filter(MaterialEntry.created_at <= date_to)
+        if melt_number:
+            query = query.filter(MaterialEntry.melt_number.ilike(f"%{melt_number}%"))
+        if batch_number:
+            query = query.filter(MaterialEntry.batch_number.ilike(f"%{batch_number}%"))
+        if search:
+            text = f"%{search}%"
+            query = query.filter(or_(
+                MaterialEntry.material_grade.ilike(text),
+                MaterialEntry.batch_number.ilike(text),
+                MaterialEntry.melt_number.ilike(text)
+            ))
+        
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            if cursor_created_at is None:
+                # Курсор уже в хвосте записей без created_at
+                query = query.filter(MaterialEntry.created_at.is_(None), MaterialEntry.id < cursor_id)
+            else:
+                query = query.filter(or_(
+                    MaterialEntry.created_at < cursor_created_at,
+                    and_(MaterialEntry.created_at == cursor_created_at, MaterialEntry.id < cursor_id),
+                    MaterialEntry.created_at.is_(None)
+                ))
+        
+        # В SQLite NULL при сортировке по убыванию идут последними
+        query = query.order_by(MaterialEntry.created_at.desc(), MaterialEntry.id.desc())
+        
+        if limit is None and cursor is None:
+            rows = query.all()
+        else:
+            page_size = limit or DEFAULT_PAGE_SIZE
+            # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+            rows = query.limit(page_size + 1).all()
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
         
         result = []
-        for material in materials:
-            result.append({
-                "id": material.id,
-                "material_grade": material.material_grade,
-                "material_type": material.material_type,
-                "batch_number": material.batch_number,
-                "melt_number": material.melt_number,
-                "supplier_id": material.supplier_id,
-                "status": material.status,
-                "created_at": material.created_at.isoformat(),
-                "updated_at": material.updated_at.isoformat() if material.updated_at else None
-            })
+        for row in rows:
+            item = {}
+            for field in requested_fields:
+                value = getattr(row, field)
+                item[field] = value.isoformat() if isinstance(value, datetime) else value
+            result.append(item)
         
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -150,6 +285,11 @@ async def generate_qr_code(sample_code: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/events")
+async def get_events(request: Request, since: Optional[int] = Query(None, ge=0)):
+    """Поток событий изменений материалов, испытаний и проб (text/event-stream)"""
+    return change_event_response(request, since)
+
 @app.get("/statistics")
 async def get_statistics(db: Session = Depends(get_db)):
     """Получить статистику по материалам"""
@@ -245,10 +385,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Next-Cursor"],
 )
 
-from datetime import datetime
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -7,6 +8,8 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Get database connection details from environment variables or use defaults
 DB_USER = os.getenv('DB_USER', 'ppsd_user')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'password')
@@ -15,14 +18,109 @@ DB_NAME = os.getenv('DB_NAME', 'ppsd_db')
 
 # Create SQLite database for development
 # In production, consider using a more robust database like PostgreSQL
-DATABASE_URL = f"sqlite:///database/ppsd.db"
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'database/ppsd.db')
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+
+# Профили настройки SQLite.
+# "wal" - журнал WAL: читатели не блокируют писателей, подходит для
+#         одновременной работы клиента, API и планировщика.
+# "legacy" - прежнее поведение (rollback journal), например для сетевых
+#            дисков, где WAL не поддерживается.
+ENGINE_PROFILES = {
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,       # ~64 МБ (отрицательное значение - в КиБ)
+        "mmap_size": 268435456,     # 256 МБ
+        "temp_store": "MEMORY",
+        "busy_timeout": 15000,      # мс
+        "pool_size": 5,
+        "max_overflow": 10,
+    },
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 15000,
+        "pool_size": 5,
+        "max_overflow": 10,
+    },
+}
+
+DB_PROFILE = os.getenv('DB_PROFILE', 'wal').lower()
+if DB_PROFILE not in ENGINE_PROFILES:
+    logger.warning(f"Unknown DB_PROFILE '{DB_PROFILE}', falling back to 'wal'")
+    DB_PROFILE = 'wal'
+
+
+def _load_engine_settings(profile: str) -> dict:
+    """
+    Build effective engine settings from a profile and DB_* overrides.
+    Every profile key can be overridden with an env var, e.g. DB_CACHE_SIZE.
+    """
+    settings = dict(ENGINE_PROFILES[profile])
+    for key, default in settings.items():
+        value = os.getenv(f"DB_{key.upper()}")
+        if value is None:
+            continue
+        settings[key] = int(value) if isinstance(default, int) else value.upper()
+    return settings
+
+
+ENGINE_SETTINGS = _load_engine_settings(DB_PROFILE)
 
 # Create database engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={
+        "check_same_thread": False,
+        "timeout": ENGINE_SETTINGS["busy_timeout"] / 1000,
+    },
+    pool_size=ENGINE_SETTINGS["pool_size"],
+    max_overflow=ENGINE_SETTINGS["max_overflow"],
+    pool_pre_ping=True,
+)
+
+
+@event.listens_for(engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Применяет PRAGMA профиля к каждому новому соединению"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={ENGINE_SETTINGS['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous={ENGINE_SETTINGS['synchronous']}")
+        cursor.execute(f"PRAGMA cache_size={int(ENGINE_SETTINGS['cache_size'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(ENGINE_SETTINGS['mmap_size'])}")
+        cursor.execute(f"PRAGMA temp_store={ENGINE_SETTINGS['temp_store']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(ENGINE_SETTINGS['busy_timeout'])}")
+    finally:
+        cursor.close()
+    # Встроенная lower() SQLite меняет регистр только латиницы, а ilike
+    # компилируется в lower(x) LIKE lower(y): без замены поиск по
+    # кириллице ("Ст3" / "ст3") был бы регистрозависимым
+    dbapi_connection.create_function("lower", 1, _unicode_lower, deterministic=True)
+
+def _unicode_lower(value):
+    """lower() для SQLite с учетом Unicode"""
+    if value is None:
+        return None
+    return value.lower() if isinstance(value, str) else str(value).lower()
+
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def set_session_user(user_id):
+    """
+    Пользователь, от имени которого работают все сессии процесса, открытые
+    после вызова (session.info["user_id"]). Вызывается после входа в
+    настольное приложение; None - при выходе. Сессию другого пользователя
+    (API, бот) открывают явно: SessionLocal(info={"user_id": user_id}).
+    """
+    SessionLocal.configure(info={"user_id": user_id})
+
 # Base class for all models
 Base = declarative_base()
 
@@ -35,4 +133,31 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def check_database_settings() -> dict:
+    """
+    Startup self-check: reads back the effective PRAGMA values and pool size,
+    logs them and warns when the database did not accept the profile
+    (e.g. WAL on a network share).
+
+    Returns:
+        dict: Effective settings
+    """
+    effective = {"profile": DB_PROFILE, "database": DATABASE_PATH}
+    with engine.connect() as connection:
+        for pragma in ("journal_mode", "synchronous", "cache_size",
+                       "mmap_size", "temp_store", "busy_timeout"):
+            effective[pragma] = connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+    effective["pool_size"] = engine.pool.size()
+    effective["max_overflow"] = ENGINE_SETTINGS["max_overflow"]
+
+    logger.info(
+        "Database settings: " + ", ".join(f"{key}={value}" for key, value in effective.items())
+    )
+    if str(effective["journal_mode"]).upper() != ENGINE_SETTINGS["journal_mode"]:
+        logger.warning(
+            f"Requested journal_mode={ENGINE_SETTINGS['journal_mode']}, "
+            f"database uses {effective['journal_mode']}"
+        )
+    return effective
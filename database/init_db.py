@@ -180,7 +180,11 @@ def create_audit_log_table(engine):
         Column('user_id', Integer, nullable=False),
         Column('action', String(128), nullable=False),
         Column('details', Text),
-        Column('timestamp', DateTime, nullable=False)
+        Column('timestamp', DateTime, nullable=False),
+        Column('entity_type', String(50)),
+        Column('entity_id', Integer),
+        Column('old_value', Text),
+        Column('new_value', Text)
     )
     metadata.create_all(engine)
 
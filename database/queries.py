@@ -0,0 +1,199 @@
+"""
+Запросы списков для вкладок и диалогов интерфейса
+
+Связанные записи (поставщик, материал, пользователь, вид испытания)
+загружаются вместе со списком через joinedload/selectinload, поэтому
+число SQL-запросов на один список не зависит от количества строк.
+Проверка: scripts/check_loader_queries.py.
+"""
+
+from sqlalchemy import and_, desc, func, or_
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+
+from models.models import (MaterialEntry, Supplier, SampleRequest, LabTest, LabTestSample,
+                           Sample)
+
+def keyset_page(query, entity, cursor, limit):
+    """
+    Страница запроса в порядке (created_at DESC, id DESC)
+
+    Записи без created_at SQLite при DESC отдает в конце, после всех дат.
+
+    Args:
+        query: Запрос SQLAlchemy по entity
+        entity: Модель с колонками created_at и id
+        cursor: (created_at, id) последней загруженной записи или None;
+            created_at может быть None
+        limit: Размер страницы
+
+    Returns:
+        tuple: (список записей, курсор следующей страницы или None)
+    """
+    if cursor is not None:
+        cursor_created_at, cursor_id = cursor
+        if cursor_created_at is None:
+            # Курсор уже в хвосте записей без created_at
+            query = query.filter(entity.created_at.is_(None), entity.id < cursor_id)
+        else:
+            query = query.filter(or_(
+                entity.created_at < cursor_created_at,
+                and_(entity.created_at == cursor_created_at, entity.id < cursor_id),
+                entity.created_at.is_(None)
+            ))
+
+    items = query.order_by(desc(entity.created_at), desc(entity.id)).limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = (items[-1].created_at, items[-1].id)
+    return items, next_cursor
+
+# При большем числе изменений список дешевле перезагрузить целиком
+MAX_INCREMENTAL_CHANGES = 500
+
+def changes_since(db, query, entity, since, limit=MAX_INCREMENTAL_CHANGES):
+    """
+    Записи, измененные после отметки since (по updated_at), для инкрементного обновления
+
+    Удаление записей мягкое (is_deleted), поэтому удаленные записи тоже
+    попадают в список измененных ID, но не в выборку query.
+
+    Args:
+        db: Сессия
+        query: Запрос списка с фильтрами по entity
+        entity: Модель с колонками id и updated_at
+        since: Последняя отметка updated_at или None
+        limit: Максимальное число изменений
+
+    Returns:
+        tuple: (записи query среди измененных, ID всех измененных записей, новая отметка);
+            при since=None - ([], пустое множество, текущая отметка);
+            None, если изменений больше limit
+    """
+    if since is None:
+        return [], set(), db.query(func.max(entity.updated_at)).scalar()
+
+    changed = (
+        db.query(entity.id, entity.updated_at)
+        .filter(entity.updated_at > since)
+        .order_by(entity.updated_at)
+        .limit(limit + 1)
+        .all()
+    )
+    if len(changed) > limit:
+        return None
+    if not changed:
+        return [], set(), since
+
+    changed_ids = {row.id for row in changed}
+    return query.filter(entity.id.in_(changed_ids)).all(), changed_ids, changed[-1].updated_at
+
+def materials_query(db, with_sizes=False):
+    """
+    Неудаленные материалы вместе с поставщиком
+
+    Поставщик присоединяется через LEFT JOIN, поэтому в фильтрах можно
+    использовать колонки Supplier (например, поиск по названию).
+
+    Args:
+        db: Сессия
+        with_sizes: Загрузить размеры (MaterialEntry.sizes) одним запросом на страницу
+    """
+    query = (
+        db.query(MaterialEntry)
+        .outerjoin(MaterialEntry.supplier)
+        .options(contains_eager(MaterialEntry.supplier))
+        .filter(MaterialEntry.is_deleted == False)
+    )
+    if with_sizes:
+        query = query.options(selectinload(MaterialEntry.sizes))
+    return query
+
+def materials_count_query(db, query_entity, join_supplier=False):
+    """
+    Запрос количества для фильтров, написанных для materials_query
+
+    Args:
+        db: Сессия
+        query_entity: Выражение для подсчета, например func.count(MaterialEntry.id)
+        join_supplier: Присоединить поставщика (нужно для фильтров по Supplier)
+    """
+    query = db.query(query_entity).select_from(MaterialEntry)
+    if join_supplier:
+        query = query.outerjoin(Supplier, Supplier.id == MaterialEntry.supplier_id)
+    return query.filter(MaterialEntry.is_deleted == False)
+
+def sample_requests_query(db, require_material=False, with_creator=False):
+    """
+    Неудаленные заявки на пробы вместе с материалом
+
+    Args:
+        db: Сессия
+        require_material: Только заявки, материал которых существует (INNER JOIN)
+        with_creator: Загрузить автора заявки
+    """
+    query = db.query(SampleRequest).filter(SampleRequest.is_deleted == False)
+    if require_material:
+        query = query.join(SampleRequest.material_entry).options(contains_eager(SampleRequest.material_entry))
+    else:
+        query = query.options(joinedload(SampleRequest.material_entry))
+    if with_creator:
+        query = query.options(joinedload(SampleRequest.created_by_user))
+    return query
+
+def lab_tests_query(db):
+    """Неудаленные испытания вместе с материалом, видом испытания и исполнителем"""
+    return (
+        db.query(LabTest)
+        .filter(LabTest.is_deleted == False)
+        .options(
+            joinedload(LabTest.material_entry),
+            joinedload(LabTest.test_type_ref),
+            joinedload(LabTest.performed_by_user),
+        )
+    )
+
+def material_sample_requests(db, material_id):
+    """Заявки на пробы материала (новые первыми) вместе с автором"""
+    return (
+        sample_requests_query(db, with_creator=True)
+        .filter(SampleRequest.material_entry_id == material_id)
+        .order_by(SampleRequest.created_at.desc())
+        .all()
+    )
+
+def material_lab_tests(db, material_id):
+    """Испытания материала (новые первыми) вместе с видом испытания и исполнителем"""
+    return (
+        lab_tests_query(db)
+        .filter(LabTest.material_entry_id == material_id)
+        .order_by(LabTest.performed_at.desc())
+        .all()
+    )
+
+def material_samples(db, material_id, statuses):
+    """
+    Образцы материала по всем его заявкам
+
+    Args:
+        db: Сессия
+        material_id: ID материала
+        statuses: Допустимые статусы образцов
+    """
+    return (
+        db.query(Sample)
+        .join(Sample.sample_request)
+        .filter(
+            SampleRequest.material_entry_id == material_id,
+            SampleRequest.is_deleted == False,
+            Sample.is_deleted == False,
+            Sample.status.in_(statuses)
+        )
+        .order_by(SampleRequest.id, Sample.id)
+        .all()
+    )
+
+def linked_sample_ids(db, test_id):
+    """ID образцов, связанных с испытанием"""
+    rows = db.query(LabTestSample.sample_id).filter(LabTestSample.lab_test_id == test_id).all()
+    return {row[0] for row in rows}
@@ -4,7 +4,7 @@ import os
 from PySide6.QtWidgets import QApplication
 from ui.login_window import LoginWindow
 from utils.painter_fix import patch_painter
-from database.connection import Base, engine
+from database.connection import Base, engine, check_database_settings
 from ui.themes import theme_manager, ThemeType
 
 # Настройка логирования
@@ -46,6 +46,21 @@ def main():
     migrate_database()
     logging.info("Database migration completed")
     
+    # Проверяем фактические настройки SQLite (WAL, PRAGMA, пул соединений)
+    try:
+        check_database_settings()
+    except Exception as e:
+        logging.error(f"Database self-check failed: {str(e)}")
+    
+    # Фоновая отправка уведомлений из notification_outbox (отправляет
+    # только клиент, владеющий арендой диспетчера)
+    try:
+        from utils.notification_dispatcher import notification_dispatcher
+        if notification_dispatcher.start():
+            logging.info("Notification dispatcher started")
+    except Exception as e:
+        logging.error(f"Notification dispatcher not started: {str(e)}")
+    
     app = QApplication(sys.argv)
     logging.info("QApplication created")
     
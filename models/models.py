@@ -1,6 +1,6 @@
 import datetime
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Enum, Text, Index, text, event, inspect
+from sqlalchemy.orm import relationship, Session
 import enum
 from database.connection import Base
 
@@ -196,6 +196,317 @@ class MaterialEntry(Base):
     grade_ref = relationship("MaterialGrade", back_populates="material_entries")
     type_ref = relationship("ProductType", back_populates="material_entries")
     sizes = relationship("MaterialSize", back_populates="material_entry", cascade="all, delete-orphan")
+    
+    # Индексы для частых фильтров списков и API (только неудаленные записи)
+    __table_args__ = (
+        Index("ix_material_entries_status_created", "status", "created_at",
+              sqlite_where=text("is_deleted = 0")),
+        Index("ix_material_entries_supplier_created", "supplier_id", "created_at",
+              sqlite_where=text("is_deleted = 0")),
+        Index("ix_material_entries_grade_created", "material_grade", "created_at",
+              sqlite_where=text("is_deleted = 0")),
+        Index("ix_material_entries_created", "created_at",
+              sqlite_where=text("is_deleted = 0")),
+        Index("ix_material_entries_updated", "updated_at"),
+        Index("ix_material_entries_melt_number", "melt_number"),
+        Index("ix_material_entries_batch_number", "batch_number"),
+    )
+
+class MaterialStatusHistory(Base):
+    """История переходов статусов материала"""
+    __tablename__ = "material_status_history"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    material_entry_id = Column(Integer, ForeignKey("material_entries.id"), nullable=False)
+    from_status = Column(String(30), nullable=True)  # None - материал только что создан
+    to_status = Column(String(30), nullable=False)
+    changed_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    changed_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    
+    # Отношения
+    material_entry = relationship("MaterialEntry")
+    changed_by_user = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_status_history_material_changed", "material_entry_id", "changed_at"),
+        Index("ix_status_history_to_status_changed", "to_status", "changed_at"),
+    )
+
+@event.listens_for(MaterialEntry.status, "set", active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    """
+    active_history: прежний статус загружается и при присваивании после
+    commit (атрибут уже expired), иначе переход записался бы без from_status
+    """
+    return value
+
+@event.listens_for(Session, "before_flush")
+def record_status_transitions(session, flush_context, instances):
+    """
+    Записывает переход в material_status_history при каждом изменении
+    MaterialEntry.status.
+    
+    Пользователь берется из session.info["user_id"] (см.
+    database.connection.set_session_user), для новых материалов без него -
+    из created_by_id.
+    """
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, MaterialEntry):
+            continue
+        
+        user_id = session.info.get("user_id")
+        
+        if obj in session.new:
+            session.add(MaterialStatusHistory(
+                material_entry=obj,
+                from_status=None,
+                to_status=obj.status or MaterialStatus.RECEIVED.value,
+                changed_by_id=user_id or obj.created_by_id
+            ))
+            continue
+        
+        history = inspect(obj).attrs.status.history
+        if not history.added:
+            continue
+        old_status = history.deleted[0] if history.deleted else None
+        new_status = history.added[0]
+        if new_status is None or new_status == old_status:
+            continue
+        
+        session.add(MaterialStatusHistory(
+            material_entry_id=obj.id,
+            from_status=old_status,
+            to_status=new_status,
+            changed_by_id=user_id
+        ))
+
+class DailyMaterialRollup(Base):
+    """
+    Ежедневная сводка материалов: количество и суммарный объем по дню
+    поступления, поставщику, марке, виду проката и текущему статусу.
+    Поддерживается обработчиком update_material_rollup, сверяется
+    ночной задачей utils.material_rollup.rebuild_rollup.
+    """
+    __tablename__ = "daily_material_rollup"
+    
+    day = Column(Date, primary_key=True)  # Дата created_at материала
+    supplier_id = Column(Integer, primary_key=True)
+    material_grade = Column(String(50), primary_key=True)
+    material_type = Column(String(20), primary_key=True)
+    status = Column(String(30), primary_key=True)
+    materials_count = Column(Integer, nullable=False, default=0)
+    quantity_sum = Column(Float, nullable=False, default=0)
+    last_created_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_daily_rollup_supplier_day", "supplier_id", "day"),
+    )
+
+ROLLUP_UPSERT_SQL = text("""
+    INSERT INTO daily_material_rollup
+        (day, supplier_id, material_grade, material_type, status,
+         materials_count, quantity_sum, last_created_at)
+    VALUES (:day, :supplier_id, :material_grade, :material_type, :status,
+            :delta, :quantity, :created_at)
+    ON CONFLICT (day, supplier_id, material_grade, material_type, status) DO UPDATE SET
+        materials_count = materials_count + excluded.materials_count,
+        quantity_sum = quantity_sum + excluded.quantity_sum,
+        last_created_at = MAX(COALESCE(last_created_at, excluded.last_created_at), excluded.last_created_at)
+""")
+
+ROLLUP_FIELDS = ("created_at", "supplier_id", "material_grade", "material_type", "status", "quantity", "is_deleted")
+
+def _rollup_values(obj, previous=False):
+    """Значения полей сводки для материала (до или после изменения)"""
+    state = inspect(obj)
+    values = {}
+    for field in ROLLUP_FIELDS:
+        if previous:
+            history = state.attrs[field].history
+            if history.deleted:
+                values[field] = history.deleted[0]
+                continue
+        values[field] = getattr(obj, field)
+    return values
+
+def _rollup_row(values, delta):
+    """Параметры ROLLUP_UPSERT_SQL или None, если материал не учитывается"""
+    if values["is_deleted"] or values["created_at"] is None:
+        return None
+    return {
+        "day": values["created_at"].date(),
+        "supplier_id": values["supplier_id"],
+        "material_grade": values["material_grade"],
+        "material_type": values["material_type"],
+        "status": values["status"] or MaterialStatus.RECEIVED.value,
+        "delta": delta,
+        "quantity": delta * (values["quantity"] or 0),
+        "created_at": values["created_at"],
+    }
+
+@event.listens_for(Session, "after_flush")
+def update_material_rollup(session, flush_context):
+    """
+    Инкрементально обновляет daily_material_rollup при добавлении,
+    изменении (статус, поставщик, марка, объем, удаление) и удалении материалов
+    в той же транзакции, что и сами изменения.
+    """
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, MaterialEntry):
+            rows.append(_rollup_row(_rollup_values(obj), 1))
+    
+    for obj in session.dirty:
+        if not isinstance(obj, MaterialEntry):
+            continue
+        old_values = _rollup_values(obj, previous=True)
+        new_values = _rollup_values(obj)
+        if old_values == new_values:
+            continue
+        rows.append(_rollup_row(old_values, -1))
+        rows.append(_rollup_row(new_values, 1))
+    
+    for obj in session.deleted:
+        if isinstance(obj, MaterialEntry):
+            rows.append(_rollup_row(_rollup_values(obj, previous=True), -1))
+    
+    rows = [row for row in rows if row is not None]
+    if rows:
+        session.connection().execute(ROLLUP_UPSERT_SQL, rows)
+
+class DataVersion(Base):
+    """Счетчик изменений таблицы для условных GET-запросов API"""
+    __tablename__ = "data_versions"
+    
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+DATA_VERSION_BUMP_SQL = text("""
+    INSERT INTO data_versions (table_name, version, updated_at)
+    VALUES (:table_name, 1, :updated_at)
+    ON CONFLICT (table_name) DO UPDATE SET
+        version = version + 1,
+        updated_at = excluded.updated_at
+""")
+
+def bump_data_versions(connection, table_names):
+    """Увеличить счетчики изменений таблиц (для изменений в обход ORM)"""
+    now = datetime.datetime.utcnow()
+    rows = [{"table_name": name, "updated_at": now} for name in sorted(table_names)]
+    if rows:
+        connection.execute(DATA_VERSION_BUMP_SQL, rows)
+
+@event.listens_for(Session, "after_flush")
+def track_data_versions(session, flush_context):
+    """
+    Увеличивает счетчики изменений таблиц, затронутых flush, в той же
+    транзакции. По ним API определяет, изменились ли данные, не выполняя
+    тяжелых запросов.
+    """
+    tables = set()
+    for obj in list(session.new) + list(session.deleted):
+        tables.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            tables.add(obj.__table__.name)
+    tables.discard(DataVersion.__tablename__)
+    if tables:
+        bump_data_versions(session.connection(), tables)
+
+class NotificationOutbox(Base):
+    """
+    Исходящие уведомления (transactional outbox)
+    
+    Сообщение записывается в той же транзакции, что и событие (например,
+    смена статуса), и отправляется фоновым диспетчером
+    utils.notification_dispatcher с повторами при ошибках сети.
+    """
+    __tablename__ = "notification_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String(20), nullable=False, default="telegram")
+    chat_id = Column(String(50), nullable=True)  # None - общий чат (TELEGRAM_CHAT_ID)
+    event_type = Column(String(50), nullable=False)
+    message = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)  # Когда диспетчер взял запись в отправку
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next", "status", "next_attempt_at"),
+    )
+
+class DispatcherLease(Base):
+    """
+    Аренда роли фонового процесса (например, диспетчера уведомлений)
+    
+    Роль выполняет только владелец аренды (holder), продлевающий ее до
+    истечения expires_at; остальные процессы ждут, пока она освободится
+    или истечет.
+    """
+    __tablename__ = "dispatcher_leases"
+    
+    name = Column(String(50), primary_key=True)
+    holder = Column(String(100), nullable=False)  # хост:pid:случайный суффикс
+    expires_at = Column(DateTime, nullable=False)
+
+class NotificationDigestEvent(Base):
+    """
+    Событие, ожидающее отправки получателю в составе дайджеста
+    
+    События одного получателя копятся в течение окна NOTIFY_DIGEST_WINDOW
+    (и на время его тихих часов), затем utils.notification_digest сводит
+    их в одно сообщение в notification_outbox.
+    """
+    __tablename__ = "notification_digest_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(String(50), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    event_type = Column(String(50), nullable=False)  # status_change, new_material, test_result
+    material_id = Column(Integer, nullable=True)
+    to_status = Column(String(30), nullable=True)
+    summary = Column(String(300), nullable=False)  # Строка события в дайджесте
+    message = Column(Text, nullable=False)  # Полное сообщение, если событие окажется единственным
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_notification_digest_events_chat", "chat_id", "id"),
+    )
+
+class NotificationPreference(Base):
+    """Настройки уведомлений пользователя: тихие часы (местное время, "ЧЧ:ММ")"""
+    __tablename__ = "notification_preferences"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    quiet_hours_start = Column(String(5), nullable=True)  # Например, "22:00"
+    quiet_hours_end = Column(String(5), nullable=True)    # Например, "07:00"
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class ChangeLog(Base):
+    """
+    Журнал изменений строк (change data capture)
+
+    Заполняется триггерами SQLite (scripts/migrations/add_change_log.py),
+    поэтому учитывает и изменения в обход ORM. Клиенты читают только записи
+    после последнего прочитанного seq (utils.change_log).
+    """
+    __tablename__ = "change_log"
+
+    # AUTOINCREMENT: номера не повторяются и после очистки старых записей
+    seq = Column(Integer, primary_key=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    op = Column(String(1), nullable=False)  # I - вставка, U - изменение, D - удаление
+    detail = Column(String(30), nullable=True)  # Новый статус материала, "completed" для испытания
+    changed_at = Column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))  # UTC
+
+    __table_args__ = {"sqlite_autoincrement": True}
 
 class QCCheck(Base):
     __tablename__ = "qc_checks"
@@ -246,6 +557,10 @@ class QCCheck(Base):
     # Отношения
     material_entry = relationship("MaterialEntry", back_populates="qc_check")
     checked_by_user = relationship("User", back_populates="qc_checks")
+    
+    __table_args__ = (
+        Index("ix_qc_checks_material_entry", "material_entry_id"),
+    )
 
 class SampleRequest(Base):
     __tablename__ = "sample_requests"
@@ -287,6 +602,12 @@ class SampleRequest(Base):
     created_by_user = relationship("User", back_populates="sample_requests", foreign_keys=[created_by_id])
     manufactured_by_user = relationship("User", foreign_keys=[manufactured_by_id], overlaps="manufactured_sample_requests")
     samples = relationship("Sample", back_populates="sample_request", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_sample_requests_material_entry", "material_entry_id"),
+        Index("ix_sample_requests_created", "created_at",
+              sqlite_where=text("is_deleted = 0")),
+    )
 
 class Sample(Base):
     """Модель для хранения информации об отдельных образцах"""
@@ -373,4 +694,9 @@ class LabTest(Base):
     material_entry = relationship("MaterialEntry", back_populates="lab_tests")
     performed_by_user = relationship("User", back_populates="lab_tests")
     test_type_ref = relationship("TestType", back_populates="lab_tests")
-    test_samples = relationship("LabTestSample", back_populates="lab_test", cascade="all, delete-orphan") 
\ No newline at end of file
+    test_samples = relationship("LabTestSample", back_populates="lab_test", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_lab_tests_material_entry", "material_entry_id"),
+        Index("ix_lab_tests_completed", "completed_at"),
+    ) 
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+Замер времени проверки пароля bcrypt при разной стоимости (cost factor)
+
+Помогает выбрать BCRYPT_ROUNDS для тонких клиентов: проверка пароля
+при входе занимает примерно столько же, сколько показано здесь.
+
+Запуск:
+    python scripts/benchmark_bcrypt.py --rounds 10 11 12 13 --repeat 5
+"""
+import argparse
+import statistics
+import time
+
+import bcrypt
+
+def measure(rounds, repeat):
+    """Время checkpw (в мс) для хеша с указанной стоимостью"""
+    password = b"benchmark-password"
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        bcrypt.checkpw(password, hashed)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки пароля bcrypt")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13],
+                        help="Значения cost factor")
+    parser.add_argument("--repeat", type=int, default=5, help="Количество проверок на каждое значение")
+    args = parser.parse_args()
+
+    print(f"{'cost':>4}  {'median, мс':>10}  {'min, мс':>8}  {'max, мс':>8}")
+    for rounds in args.rounds:
+        timings = measure(rounds, args.repeat)
+        print(f"{rounds:>4}  {statistics.median(timings):>10.1f}  {min(timings):>8.1f}  {max(timings):>8.1f}")
+
+if __name__ == "__main__":
+    main()
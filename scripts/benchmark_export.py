@@ -0,0 +1,145 @@
+"""
+Замер пикового потребления памяти потоковой выгрузки аналитического отчета
+
+Создает временную базу с заданным числом материалов (отдельным
+процессом), затем прогоняет выгрузку (web-app/backend/report_export.py)
+каждого формата в новом процессе и печатает время, объем, пик памяти
+Python (tracemalloc) и прирост пикового RSS за время выгрузки.
+ru_maxrss накопительный, поэтому заполнение базы и другие форматы в
+одном процессе скрыли бы рост памяти.
+
+В прирост RSS входят страницы файла базы, прочитанные через mmap, и кэш
+страниц SQLite: в профиле wal они растут до mmap_size + cache_size
+(database/connection.py) и не зависят от выгрузки. С DB_PROFILE=legacy
+(без mmap, кэш 2 МБ) прирост RSS показывает только память выгрузки.
+
+Запуск:
+    python scripts/benchmark_export.py --rows 1000000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import resource
+import tempfile
+import tracemalloc
+import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def peak_rss_mb():
+    """Пиковый RSS процесса в МБ (ru_maxrss в КБ на Linux, в байтах на macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def seed(engine, rows, batch_size=50000):
+    """Заполнить базу материалами в обход ORM"""
+    from sqlalchemy import text
+    now = datetime.datetime.now()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, password_hash, full_name, role) "
+                          "VALUES (1, 'bench', '-', 'Benchmark', 'admin')"))
+        conn.execute(text("INSERT INTO suppliers (id, name) VALUES (1, 'Поставщик 1'), (2, 'Поставщик 2')"))
+    for offset in range(0, rows, batch_size):
+        batch = [{
+            "material_grade": f"09Г2С-{i % 50}",
+            "material_type": "sheet",
+            "quantity": 1.0,
+            "certificate_number": f"C-{i}",
+            "melt_number": f"M-{i}",
+            "batch_number": f"B-{i}",
+            "supplier_id": i % 2 + 1,
+            "created_by_id": 1,
+            "status": "received",
+            "is_deleted": False,
+            "created_at": now - datetime.timedelta(seconds=i),
+            "updated_at": now,
+        } for i in range(offset, min(offset + batch_size, rows))]
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO material_entries (material_grade, material_type, quantity, certificate_number, "
+                "melt_number, batch_number, supplier_id, created_by_id, status, is_deleted, created_at, updated_at) "
+                "VALUES (:material_grade, :material_type, :quantity, :certificate_number, :melt_number, "
+                ":batch_number, :supplier_id, :created_by_id, :status, :is_deleted, :created_at, :updated_at)"
+            ), batch)
+
+def setup_paths(db_path):
+    """База выбирается при импорте database.connection"""
+    os.environ["DATABASE_PATH"] = db_path
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, os.path.join(ROOT_DIR, "web-app", "backend"))
+
+def run_seed(db_path, rows):
+    """Шаг --seed: создать схему и заполнить базу"""
+    setup_paths(db_path)
+    from database.connection import Base, engine
+    import models.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    seed(engine, rows)
+    engine.dispose()
+
+def run_measure(db_path, format):
+    """Шаг --measure: одна выгрузка в свежем процессе, результат - строка JSON"""
+    setup_paths(db_path)
+    from database.connection import engine
+    import models.models  # noqa: F401
+    from report_export import generate_export
+
+    # Пик после импортов и подключения - точка отсчета
+    with engine.connect():
+        pass
+    baseline = peak_rss_mb()
+
+    start_date = datetime.datetime.now() - datetime.timedelta(days=3650)
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in generate_export(format, start_date, 3650))
+    elapsed = time.perf_counter() - started
+    heap_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    print(json.dumps({"size": size, "elapsed": elapsed, "baseline": baseline,
+                      "peak": peak_rss_mb(), "heap_peak": heap_peak}))
+    engine.dispose()
+
+def run_step(*args):
+    """Запустить этот же скрипт с аргументами args в отдельном процессе"""
+    return subprocess.run([sys.executable, os.path.abspath(__file__), *args],
+                          check=True, stdout=subprocess.PIPE, text=True).stdout
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк потоковой выгрузки отчета")
+    parser.add_argument("--rows", type=int, default=1000000, help="Количество материалов")
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--seed", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--measure", metavar="FORMAT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        return run_seed(args.db, args.rows)
+    if args.measure:
+        return run_measure(args.db, args.measure)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "benchmark.db")
+        # Родительский процесс ничего не выгружает, ему нужен только список форматов
+        setup_paths(db_path)
+        from report_export import EXPORT_MEDIA_TYPES
+
+        started = time.perf_counter()
+        run_step("--seed", "--db", db_path, "--rows", str(args.rows))
+        print(f"Материалов: {args.rows}, заполнение {time.perf_counter() - started:.1f} с, "
+              f"база {os.path.getsize(db_path) / (1024 * 1024):.0f} МБ, "
+              f"профиль {os.getenv('DB_PROFILE', 'wal')}")
+
+        for format in EXPORT_MEDIA_TYPES:
+            result = json.loads(run_step("--measure", format, "--db", db_path).splitlines()[-1])
+            print(f"{format:7} {result['size'] / (1024 * 1024):8.1f} МБ за {result['elapsed']:6.1f} с, "
+                  f"пик Python {result['heap_peak']:.1f} МБ, "
+                  f"RSS до выгрузки {result['baseline']:.1f} МБ, "
+                  f"прирост пика RSS {result['peak'] - result['baseline']:+.1f} МБ")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Проверка числа SQL-запросов в эндпоинтах статистики аналитического API
+
+Создает временную базу с материалами в разных статусах за текущий и
+предыдущий период и вызывает обработчики /statistics и /kpi/dashboard
+(web-app/backend/analytics_api.py) с сессией, считая выполненные
+SQL-запросы. Каждый вызов должен укладываться в один запрос
+(aggregate_status_buckets); иначе скрипт завершается с кодом 1.
+
+Запуск:
+    python scripts/check_analytics_queries.py --rows 200
+"""
+import os
+import sys
+import asyncio
+import argparse
+import tempfile
+import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+MAX_STATEMENTS = 1
+
+def seed(engine, rows):
+    """Материалы во всех статусах за последние 60 дней"""
+    from sqlalchemy import text
+    from models.models import MaterialStatus
+    statuses = [status.value for status in MaterialStatus]
+    now = datetime.datetime.now()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, password_hash, full_name, role) "
+                          "VALUES (1, 'check', '-', 'Проверка', 'admin')"))
+        conn.execute(text("INSERT INTO suppliers (id, name) VALUES (1, 'Поставщик 1'), (2, 'Поставщик 2')"))
+        conn.execute(text(
+            "INSERT INTO material_entries (material_grade, material_type, quantity, certificate_number, "
+            "melt_number, batch_number, supplier_id, created_by_id, status, is_deleted, created_at, updated_at) "
+            "VALUES (:grade, 'sheet', 1, :cert, :melt, :batch, :supplier_id, 1, :status, :is_deleted, "
+            ":created_at, :created_at)"
+        ), [{
+            "grade": f"09Г2С-{i % 5}",
+            "cert": f"C-{i}",
+            "melt": f"M-{i}",
+            "batch": f"B-{i}",
+            "supplier_id": i % 2 + 1,
+            "status": statuses[i % len(statuses)],
+            "is_deleted": i % 17 == 0,
+            "created_at": now - datetime.timedelta(hours=i * 60 * 24 / rows),
+        } for i in range(rows)])
+
+def calls():
+    """Вызовы обработчиков с разными параметрами: имя -> функция(db)"""
+    from analytics_api import get_statistics, get_kpi_dashboard
+
+    return {
+        "statistics": lambda db: get_statistics(days=30, supplier_id=None, material_grade=None, db=db),
+        "statistics_filtered": lambda db: get_statistics(days=30, supplier_id=1, material_grade="09Г2С", db=db),
+        "statistics_all_time": lambda db: get_statistics(days=0, supplier_id=None, material_grade=None, db=db),
+        "kpi_dashboard": lambda db: get_kpi_dashboard(days=30, db=db),
+    }
+
+def count_statements(engine, session_factory, call):
+    """Число SQL-запросов одного вызова обработчика"""
+    from sqlalchemy import event
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    db = session_factory()
+    try:
+        asyncio.run(call(db))
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+def main():
+    parser = argparse.ArgumentParser(description="Число SQL-запросов в эндпоинтах статистики")
+    parser.add_argument("--rows", type=int, default=200, help="Количество материалов")
+    parser.add_argument("--verbose", action="store_true", help="Печатать текст запросов")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # База выбирается при импорте database.connection
+        os.environ["DATABASE_PATH"] = os.path.join(tmp_dir, "analytics.db")
+        sys.path.insert(0, ROOT_DIR)
+        sys.path.insert(0, os.path.join(ROOT_DIR, "web-app", "backend"))
+
+        from database.connection import Base, SessionLocal, engine
+        import models.models  # noqa: F401
+
+        Base.metadata.create_all(bind=engine)
+        seed(engine, args.rows)
+
+        results = {name: count_statements(engine, SessionLocal, call) for name, call in calls().items()}
+        engine.dispose()
+
+    failed = False
+    print(f"{'вызов':<22}  {'запросов':>8}")
+    for name, statements in results.items():
+        mark = "" if len(statements) <= MAX_STATEMENTS else f"  <-- больше {MAX_STATEMENTS}"
+        failed = failed or bool(mark)
+        print(f"{name:<22}  {len(statements):>8}{mark}")
+        if args.verbose or mark:
+            for statement in statements:
+                print("    " + " ".join(statement.split()))
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Проверка числа SQL-запросов в загрузчиках списков (database/queries.py)
+
+Создает временную базу, заполняет ее N и затем 2N записями и для каждого
+загрузчика считает выполненные SQL-запросы, обращаясь к тем же связанным
+записям, что и вкладки. Число запросов не должно зависеть от количества
+строк; при росте (N+1) скрипт завершается с кодом 1.
+
+Запуск:
+    python scripts/check_loader_queries.py --rows 50
+"""
+import os
+import sys
+import argparse
+import tempfile
+import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PAGE_SIZE = 200
+
+def seed(engine, rows, start):
+    """Добавить rows материалов с заявками, образцами и испытаниями"""
+    from sqlalchemy import text
+    now = datetime.datetime.now()
+    with engine.begin() as conn:
+        if start == 0:
+            conn.execute(text("INSERT INTO users (id, username, password_hash, full_name, role) "
+                              "VALUES (1, 'check', '-', 'Проверка', 'admin')"))
+            conn.execute(text("INSERT INTO test_types (id, name, code) VALUES (1, 'Растяжение', 'T1')"))
+        for i in range(start, start + rows):
+            material_id = i + 1
+            conn.execute(text("INSERT INTO suppliers (id, name) VALUES (:id, :name)"),
+                         {"id": material_id, "name": f"Поставщик {material_id}"})
+            conn.execute(text(
+                "INSERT INTO material_entries (id, material_grade, material_type, quantity, certificate_number, "
+                "melt_number, batch_number, supplier_id, created_by_id, status, is_deleted, created_at, updated_at) "
+                "VALUES (:id, '09Г2С', 'rod', 1, :cert, :melt, :batch, :id, 1, 'testing', 0, :created_at, :created_at)"
+            ), {"id": material_id, "cert": f"C-{i}", "melt": f"M-{i}", "batch": f"B-{i}",
+                "created_at": now - datetime.timedelta(seconds=i)})
+            conn.execute(text("INSERT INTO material_sizes (material_entry_id, length, quantity, is_deleted) "
+                              "VALUES (:id, 1000, 2, 0)"), {"id": material_id})
+            conn.execute(text(
+                "INSERT INTO sample_requests (id, material_entry_id, created_by_id, sample_size, sample_unit, "
+                "is_collected, is_sent_to_lab, is_deleted, created_at) "
+                "VALUES (:id, :id, 1, 1, 'шт', :collected, 0, 0, :created_at)"
+            ), {"id": material_id, "collected": i % 2, "created_at": now})
+            conn.execute(text(
+                "INSERT INTO samples (id, sample_request_id, created_by_id, sample_code, sample_type, status, "
+                "is_deleted) VALUES (:id, 1, 1, :code, 'Растяжение', 'prepared', 0)"
+            ), {"id": material_id, "code": f"S-{i}"})
+            conn.execute(text(
+                "INSERT INTO lab_tests (id, material_entry_id, performed_by_id, test_type, test_type_id, "
+                "is_deleted, performed_at) VALUES (:id, 1, 1, 'mechanical_tensile', 1, 0, :performed_at)"
+            ), {"id": material_id, "performed_at": now})
+
+def loaders():
+    """Загрузчики и обращения к связанным записям, как во вкладках"""
+    from database.queries import (keyset_page, materials_query, sample_requests_query, lab_tests_query,
+                                  material_sample_requests, material_lab_tests, material_samples,
+                                  changes_since)
+    from models.models import MaterialEntry
+
+    def warehouse(db):
+        materials, _ = keyset_page(materials_query(db, with_sizes=True), MaterialEntry, None, PAGE_SIZE)
+        for material in materials:
+            material.supplier and material.supplier.name
+            sum(size.length * size.quantity for size in material.sizes)
+        return len(materials)
+
+    def warehouse_changes(db):
+        since = datetime.datetime(2000, 1, 1)
+        materials, _, _ = changes_since(db, materials_query(db, with_sizes=True), MaterialEntry, since)
+        for material in materials:
+            material.supplier and material.supplier.name
+            sum(size.length * size.quantity for size in material.sizes)
+        return len(materials)
+
+    def qc_and_lab_pending(db):
+        materials, _ = keyset_page(materials_query(db), MaterialEntry, None, PAGE_SIZE)
+        for material in materials:
+            material.supplier and material.supplier.name
+        return len(materials)
+
+    def lab_sample_requests(db):
+        requests = sample_requests_query(db).all()
+        for request in requests:
+            request.material_entry and request.material_entry.batch_number
+        return len(requests)
+
+    def lab_test_results(db):
+        tests = lab_tests_query(db).all()
+        for test in tests:
+            test.material_entry and test.material_entry.batch_number
+        return len(tests)
+
+    def production_completed(db):
+        requests = sample_requests_query(db, require_material=True, with_creator=True).all()
+        for request in requests:
+            request.material_entry.material_grade
+            request.created_by_user and request.created_by_user.full_name
+        return len(requests)
+
+    def material_details(db):
+        requests = material_sample_requests(db, 1)
+        for request in requests:
+            request.created_by_user and request.created_by_user.full_name
+        tests = material_lab_tests(db, 1)
+        for test in tests:
+            test.test_type_ref and test.test_type_ref.name
+            test.performed_by_user and test.performed_by_user.full_name
+        return len(requests) + len(tests)
+
+    def test_samples(db):
+        return len(material_samples(db, 1, ["prepared", "testing", "tested"]))
+
+    return [warehouse, warehouse_changes, qc_and_lab_pending, lab_sample_requests, lab_test_results,
+            production_completed, material_details, test_samples]
+
+def count_statements(engine, session_factory, loader):
+    """Число SQL-запросов и строк одного вызова загрузчика"""
+    from sqlalchemy import event
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    db = session_factory()
+    try:
+        rows = loader(db)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements), rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Число SQL-запросов в загрузчиках списков")
+    parser.add_argument("--rows", type=int, default=50, help="Количество записей на первом шаге")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # База выбирается при импорте database.connection
+        os.environ["DATABASE_PATH"] = os.path.join(tmp_dir, "loaders.db")
+        sys.path.insert(0, ROOT_DIR)
+
+        from database.connection import Base, SessionLocal, engine
+        import models.models  # noqa: F401
+
+        Base.metadata.create_all(bind=engine)
+
+        seed(engine, args.rows, 0)
+        first = {loader.__name__: count_statements(engine, SessionLocal, loader) for loader in loaders()}
+        seed(engine, args.rows, args.rows)
+        second = {loader.__name__: count_statements(engine, SessionLocal, loader) for loader in loaders()}
+
+    failed = False
+    print(f"{'загрузчик':<22}  {'строк':>11}  {'запросов':>9}")
+    for name, (statements, rows) in first.items():
+        statements_2, rows_2 = second[name]
+        mark = "" if statements == statements_2 else "  <-- зависит от числа строк"
+        failed = failed or bool(mark)
+        print(f"{name:<22}  {rows:>5}/{rows_2:<5}  {statements:>4}/{statements_2:<4}{mark}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
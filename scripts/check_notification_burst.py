@@ -0,0 +1,118 @@
+"""
+Проверка объединения уведомлений в дайджесты (utils/notification_digest.py)
+
+Создает временную базу с пользователями ОТК и склада, переводит партию
+материалов в статус "Ожидает проверки ОТК", часть из них затем отклоняет
+(повторные переходы) и отправляет накопленное через диспетчер уведомлений
+с подставным ботом, который только считает сообщения. Один из
+пользователей ОТК находится в тихих часах.
+
+Без дайджестов каждый получатель получил бы по сообщению на событие; с
+дайджестами - не больше одного сообщения за пачку, а в тихие часы ни
+одного. Иначе скрипт завершается с кодом 1.
+
+Запуск:
+    python scripts/check_notification_burst.py --materials 40 --rejected 10
+"""
+import os
+import sys
+import asyncio
+import argparse
+import tempfile
+import datetime
+from collections import Counter
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Пользователи: (id, роль, telegram_id); пользователь 3 - в тихих часах
+USERS = [(1, "qc", "1001"), (2, "qc", "1002"), (3, "qc", "1003"), (4, "warehouse", "2001")]
+QUIET_USER_ID = 3
+
+class FakeBot:
+    """Подставной бот: запоминает сообщения вместо отправки"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.messages.append((str(chat_id), text))
+
+def seed(engine, materials):
+    from sqlalchemy import text
+    now = datetime.datetime.now()
+    quiet_start = (now - datetime.timedelta(hours=1)).strftime("%H:%M")
+    quiet_end = (now + datetime.timedelta(hours=1)).strftime("%H:%M")
+    with engine.begin() as conn:
+        for user_id, role, telegram_id in USERS:
+            conn.execute(text("INSERT INTO users (id, username, password_hash, full_name, role, telegram_id, "
+                              "is_active) VALUES (:id, :username, '-', :username, :role, :telegram_id, 1)"),
+                         {"id": user_id, "username": f"user{user_id}", "role": role, "telegram_id": telegram_id})
+        conn.execute(text("INSERT INTO notification_preferences (user_id, quiet_hours_start, quiet_hours_end) "
+                          "VALUES (:id, :start, :end)"), {"id": QUIET_USER_ID, "start": quiet_start, "end": quiet_end})
+        conn.execute(text("INSERT INTO suppliers (id, name) VALUES (1, 'Поставщик')"))
+        for i in range(materials):
+            conn.execute(text(
+                "INSERT INTO material_entries (id, material_grade, material_type, quantity, certificate_number, "
+                "melt_number, batch_number, supplier_id, created_by_id, status, is_deleted, created_at, updated_at) "
+                "VALUES (:id, '09Г2С', 'rod', 1, :cert, :melt, 'B-1', 1, 4, 'received', 0, :now, :now)"
+            ), {"id": i + 1, "cert": f"C-{i}", "melt": f"M-{i}", "now": now})
+
+def main():
+    parser = argparse.ArgumentParser(description="Сообщения на получателя при пачке событий")
+    parser.add_argument("--materials", type=int, default=40, help="Материалов в пачке")
+    parser.add_argument("--rejected", type=int, default=10, help="Из них повторно переведены в 'Отклонен'")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # База и окно дайджеста выбираются при импорте модулей
+        os.environ["DATABASE_PATH"] = os.path.join(tmp_dir, "notifications.db")
+        os.environ.setdefault("TELEGRAM_BOT_TOKEN", "check")
+        os.environ["NOTIFY_DISPATCHER"] = "off"
+        sys.path.insert(0, ROOT_DIR)
+
+        from sqlalchemy import text
+        from database.connection import Base, engine
+        from models.models import MaterialStatus
+        from utils.notifications import NotificationService
+        from utils.notification_dispatcher import NotificationDispatcher
+
+        Base.metadata.create_all(bind=engine)
+        seed(engine, args.materials)
+
+        service = NotificationService()
+        for material_id in range(1, args.materials + 1):
+            service.notify_status_change(material_id, MaterialStatus.RECEIVED.value,
+                                         MaterialStatus.QC_CHECK_PENDING.value)
+        for material_id in range(1, args.rejected + 1):
+            service.notify_status_change(material_id, MaterialStatus.QC_CHECK_PENDING.value,
+                                         MaterialStatus.REJECTED.value)
+
+        with engine.connect() as conn:
+            events = Counter(dict(conn.execute(text(
+                "SELECT chat_id, COUNT(*) FROM notification_digest_events GROUP BY chat_id"
+            )).fetchall()))
+
+        bot = FakeBot()
+        dispatcher = NotificationDispatcher(bot_token="check", chat_interval=0, global_rate=0)
+        asyncio.run(dispatcher.drain(bot, force_digests=True))
+        messages = Counter(chat_id for chat_id, _ in bot.messages)
+
+        with engine.connect() as conn:
+            held = conn.execute(text("SELECT COUNT(*) FROM notification_digest_events")).scalar()
+
+    failed = False
+    print(f"{'получатель':<12}  {'событий':>8}  {'сообщений':>10}")
+    for user_id, role, chat_id in USERS:
+        quiet = user_id == QUIET_USER_ID
+        expected = 0 if quiet else min(events[chat_id], 1)
+        mark = "" if messages[chat_id] == expected else f"  <-- ожидалось {expected}"
+        failed = failed or bool(mark)
+        print(f"{chat_id:<12}  {events[chat_id]:>8}  {messages[chat_id]:>10}"
+              f"{'  (тихие часы)' if quiet else ''}{mark}")
+    print(f"Всего: событий {sum(events.values())}, сообщений {len(bot.messages)}, "
+          f"отложено до конца тихих часов {held}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
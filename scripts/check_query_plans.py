@@ -0,0 +1,58 @@
+"""
+Проверка планов частых запросов (HOT_QUERIES) на полное сканирование
+
+Создает временную базу по текущим моделям, выполняет миграцию индексов
+(scripts/migrations/add_hot_indexes.py) и строит EXPLAIN QUERY PLAN для
+каждого запроса из HOT_QUERIES. Если хотя бы один запрос выполняется
+сканированием таблицы или индекса, скрипт завершается с кодом 1.
+
+Запуск:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --db data/materials.db
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def check(db_path, create_schema):
+    """Планы запросов с полным сканированием для базы db_path"""
+    # База выбирается при импорте database.connection
+    os.environ["DATABASE_PATH"] = db_path
+    sys.path.insert(0, ROOT_DIR)
+
+    from database.connection import Base, engine
+    from scripts.migrations.add_hot_indexes import run_migration, check_query_plans
+
+    try:
+        if create_schema:
+            Base.metadata.create_all(bind=engine)
+            run_migration()
+        return check_query_plans()
+    finally:
+        engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Планы частых запросов без полного сканирования")
+    parser.add_argument("--db", help="Проверить существующую базу вместо временной")
+    args = parser.parse_args()
+
+    if args.db:
+        full_scans = check(os.path.abspath(args.db), create_schema=False)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            full_scans = check(os.path.join(tmp_dir, "plans.db"), create_schema=True)
+
+    for name, details in full_scans.items():
+        print(f"{name}: полное сканирование")
+        for detail in details:
+            print(f"    {detail}")
+    if not full_scans:
+        print("Все частые запросы используют индексы")
+
+    sys.exit(1 if full_scans else 0)
+
+if __name__ == "__main__":
+    main()
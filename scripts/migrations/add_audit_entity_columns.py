@@ -0,0 +1,164 @@
+"""
+Migration script to add structured entity columns to audit_log and backfill
+them from the existing details strings
+"""
+import ast
+import json
+import re
+from sqlalchemy import text
+from database.connection import engine
+from utils.audit import AuditLog, to_json
+from scripts.migrations.add_status_history import STATUS_CHANGE_PATTERN
+
+DEFAULT_BATCH_SIZE = 5000
+
+NEW_COLUMNS = {
+    "entity_type": "VARCHAR(50)",
+    "entity_id": "INTEGER",
+    "old_value": "TEXT",
+    "new_value": "TEXT",
+}
+
+# Формат записей log_material_action / log_qc_action / log_lab_action
+MATERIAL_DETAILS_PATTERN = re.compile(
+    r"^Material ID: (\d+)(?:, Sample ID: (\d+))?(?:, (QC |Test )?Data: (.*))?$",
+    re.DOTALL
+)
+MATERIAL_ID_PATTERN = re.compile(r"^Material ID: (\d+)\b")
+
+def run_migration(progress=None):
+    """Run the migration to add, index and backfill the audit entity columns"""
+    AuditLog.__table__.create(bind=engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(audit_log)"))}
+        for name, column_type in NEW_COLUMNS.items():
+            if name not in columns:
+                conn.execute(text(f"ALTER TABLE audit_log ADD COLUMN {name} {column_type}"))
+
+    for index in AuditLog.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    backfill_audit_entities(progress=progress)
+    return True
+
+def _parse_payload(raw):
+    """Данные из details: str(dict) в старых записях, JSON в новых"""
+    try:
+        return ast.literal_eval(raw)
+    except Exception:
+        pass
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+def parse_details(action, details):
+    """
+    Structured values for one audit row
+
+    Returns:
+        dict: entity_type, entity_id, old_value, new_value (JSON) or None
+              if the row does not refer to a material
+    """
+    if not details:
+        return None
+
+    if action == "status_change":
+        match = STATUS_CHANGE_PATTERN.match(details)
+        if match:
+            old_status = match.group(2) if match.group(2) not in ("", "None") else None
+            return {
+                "entity_type": "material",
+                "entity_id": int(match.group(1)),
+                "old_value": to_json(old_status),
+                "new_value": to_json(match.group(3)),
+            }
+
+    match = MATERIAL_DETAILS_PATTERN.match(details)
+    if match:
+        sample_id, data_kind, data = match.group(2), match.group(3), match.group(4)
+        if data_kind == "Test " or sample_id:
+            # log_lab_action: {"sample_id": ..., "test_data": ...}
+            new_value = {}
+            if sample_id:
+                new_value["sample_id"] = int(sample_id)
+            if data:
+                new_value["test_data"] = _parse_payload(data)
+        else:
+            new_value = _parse_payload(data) if data else None
+        return {
+            "entity_type": "material",
+            "entity_id": int(match.group(1)),
+            "old_value": None,
+            "new_value": to_json(new_value or None),
+        }
+
+    match = MATERIAL_ID_PATTERN.match(details)
+    if match:
+        return {"entity_type": "material", "entity_id": int(match.group(1)),
+                "old_value": None, "new_value": None}
+    return None
+
+def backfill_audit_entities(batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Fill the entity columns of existing audit rows from their details.
+
+    Rows are processed in id-ordered batches, one transaction and one
+    executemany per batch. Only rows with entity_type IS NULL are touched,
+    so the job can be re-run safely.
+
+    Args:
+        batch_size: Number of audit rows processed per transaction
+        progress: Callback progress(table_name, processed, total)
+
+    Returns:
+        int: Number of updated rows
+    """
+    updated = 0
+    processed = 0
+    last_id = 0
+
+    with engine.connect() as conn:
+        total = conn.execute(text("SELECT COUNT(*) FROM audit_log WHERE entity_type IS NULL")).scalar()
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, action, details FROM audit_log "
+                    "WHERE entity_type IS NULL AND id > :last_id "
+                    "ORDER BY id LIMIT :batch_size"
+                ),
+                {"last_id": last_id, "batch_size": batch_size}
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            processed += len(rows)
+
+            values = []
+            for row_id, action, details in rows:
+                parsed = parse_details(action, details)
+                if parsed:
+                    parsed["id"] = row_id
+                    values.append(parsed)
+
+            if values:
+                conn.execute(
+                    text(
+                        "UPDATE audit_log SET entity_type = :entity_type, entity_id = :entity_id, "
+                        "old_value = :old_value, new_value = :new_value WHERE id = :id"
+                    ),
+                    values
+                )
+                updated += len(values)
+
+        if progress:
+            progress("audit_log", processed, total)
+
+    return updated
+
+if __name__ == "__main__":
+    run_migration(progress=lambda table_name, done, total: print(f"{table_name}: {done}/{total}"))
+    print("Audit entity columns backfill completed")
@@ -0,0 +1,72 @@
+"""
+Migration script to create the audit_log_fts full-text index (FTS5) and the
+triggers that keep it in sync with audit_log
+"""
+import logging
+from sqlalchemy import text
+from database.connection import engine
+from utils.audit import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Внешнее содержимое: текст хранится только в audit_log, индекс - в audit_log_fts.
+# remove_diacritics 0: не склеивать "й" с "и"
+AUDIT_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS audit_log_fts USING fts5(
+        action, details,
+        content='audit_log', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 0'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS audit_log_fts_ai AFTER INSERT ON audit_log BEGIN
+        INSERT INTO audit_log_fts(rowid, action, details) VALUES (new.id, new.action, new.details);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS audit_log_fts_ad AFTER DELETE ON audit_log BEGIN
+        INSERT INTO audit_log_fts(audit_log_fts, rowid, action, details)
+        VALUES ('delete', old.id, old.action, old.details);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS audit_log_fts_au AFTER UPDATE OF action, details ON audit_log BEGIN
+        INSERT INTO audit_log_fts(audit_log_fts, rowid, action, details)
+        VALUES ('delete', old.id, old.action, old.details);
+        INSERT INTO audit_log_fts(rowid, action, details) VALUES (new.id, new.action, new.details);
+    END
+    """,
+]
+
+def fts5_available(conn):
+    """Check that the SQLite build includes FTS5"""
+    return bool(conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+def run_migration(progress=None):
+    """Run the migration to create and fill the audit full-text index"""
+    AuditLog.__table__.create(bind=engine, checkfirst=True)
+    for index in AuditLog.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        if not fts5_available(conn):
+            logger.warning("SQLite is built without FTS5, audit search falls back to LIKE")
+            return False
+
+        exists = conn.execute(
+            text("SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='audit_log_fts'")
+        ).scalar()
+        for statement in AUDIT_FTS_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            # Индексируем уже существующие записи
+            conn.execute(text("INSERT INTO audit_log_fts(audit_log_fts) VALUES('rebuild')"))
+
+    if progress:
+        progress("audit_log_fts", 1, 1)
+    return True
+
+if __name__ == "__main__":
+    run_migration()
+    print("Audit full-text index created")
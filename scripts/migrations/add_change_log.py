@@ -0,0 +1,69 @@
+"""
+Migration script to create the change_log table and the triggers that fill
+it on every insert, update and delete of the watched tables
+"""
+import logging
+from sqlalchemy import text
+from database.connection import engine
+from models.models import ChangeLog
+
+logger = logging.getLogger(__name__)
+
+# Отслеживаемые таблицы: выражение detail для изменения (None - без detail)
+WATCHED_TABLES = {
+    # Новый статус, только если он изменился
+    "material_entries": "CASE WHEN old.status IS NOT new.status THEN new.status END",
+    # Испытание завершено этим изменением
+    "lab_tests": "CASE WHEN old.completed_at IS NULL AND new.completed_at IS NOT NULL THEN 'completed' END",
+    "sample_requests": None,
+    "samples": None,
+    "qc_checks": None,
+}
+
+# detail при вставке
+INSERT_DETAILS = {
+    "lab_tests": "CASE WHEN new.completed_at IS NOT NULL THEN 'completed' END",
+}
+
+def change_log_ddl(table):
+    """CREATE TRIGGER для одной отслеживаемой таблицы"""
+    update_detail = WATCHED_TABLES[table] or "NULL"
+    insert_detail = INSERT_DETAILS.get(table, "NULL")
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS change_log_{table}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO change_log(table_name, row_id, op, detail) VALUES ('{table}', new.id, 'I', {insert_detail});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS change_log_{table}_au AFTER UPDATE ON {table} BEGIN
+            INSERT INTO change_log(table_name, row_id, op, detail) VALUES ('{table}', new.id, 'U', {update_detail});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS change_log_{table}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO change_log(table_name, row_id, op) VALUES ('{table}', old.id, 'D');
+        END
+        """,
+    ]
+
+def run_migration(progress=None):
+    """Run the migration to create change_log and its triggers"""
+    ChangeLog.__table__.create(bind=engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        existing = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))}
+        for table in WATCHED_TABLES:
+            if table not in existing:
+                logger.warning(f"Table {table} does not exist, change_log triggers skipped")
+                continue
+            for statement in change_log_ddl(table):
+                conn.execute(text(statement))
+
+    if progress:
+        progress("change_log", 1, 1)
+    return True
+
+if __name__ == "__main__":
+    run_migration()
+    print("Change log triggers created")
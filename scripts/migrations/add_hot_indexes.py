@@ -0,0 +1,118 @@
+"""
+Migration script to create indexes for the hot filters of material_entries,
+sample_requests, lab_tests and qc_checks
+"""
+from sqlalchemy import text
+from database.connection import engine
+from models.models import MaterialEntry, QCCheck, SampleRequest, LabTest
+
+INDEXED_TABLES = [MaterialEntry, QCCheck, SampleRequest, LabTest]
+
+# Запросы списков и API, которые не должны выполняться полным сканированием.
+# Условие "is_deleted = 0" записано так же, как его формирует SQLAlchemy
+# для MaterialEntry.is_deleted == False, иначе частичный индекс не применяется.
+HOT_QUERIES = {
+    "materials_by_status": (
+        "SELECT id FROM material_entries WHERE is_deleted = 0 AND status = :status "
+        "ORDER BY created_at DESC"
+    ),
+    "materials_by_period": (
+        "SELECT id FROM material_entries WHERE is_deleted = 0 AND created_at >= :start"
+    ),
+    "materials_by_supplier": (
+        "SELECT id FROM material_entries WHERE is_deleted = 0 AND supplier_id = :supplier_id "
+        "AND created_at >= :start"
+    ),
+    "materials_by_grade": (
+        "SELECT id FROM material_entries WHERE is_deleted = 0 AND material_grade = :grade "
+        "AND created_at >= :start"
+    ),
+    "materials_updated_since": (
+        "SELECT id FROM material_entries WHERE updated_at >= :since"
+    ),
+    "materials_by_melt": (
+        "SELECT id FROM material_entries WHERE melt_number = :melt_number"
+    ),
+    "materials_by_batch": (
+        "SELECT id FROM material_entries WHERE batch_number = :batch_number"
+    ),
+    "qc_check_by_material": (
+        "SELECT id FROM qc_checks WHERE material_entry_id = :material_id"
+    ),
+    "sample_requests_by_material": (
+        "SELECT id FROM sample_requests WHERE material_entry_id = :material_id"
+    ),
+    "lab_tests_by_material": (
+        "SELECT id FROM lab_tests WHERE material_entry_id = :material_id"
+    ),
+    "lab_tests_completed_since": (
+        "SELECT id FROM lab_tests WHERE completed_at >= :since"
+    ),
+}
+
+def run_migration():
+    """Run the migration to create missing indexes on existing tables"""
+    for model in INDEXED_TABLES:
+        for index in model.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # Обновляем статистику планировщика для новых индексов
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+
+    return True
+
+def check_query_plans():
+    """
+    Run EXPLAIN QUERY PLAN for HOT_QUERIES.
+
+    Plans are built without the ANALYZE statistics (sqlite_stat1), so the
+    result depends on the available indexes rather than on the current
+    number of rows: on a nearly empty table SQLite rightly prefers a scan
+    even when the index exists.
+
+    Returns:
+        dict: Query name -> plan details for every query that falls back
+              to a full table scan (empty dict if all queries use indexes)
+    """
+    full_scans = {}
+    with engine.connect() as conn:
+        has_statistics = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )).first() is not None
+        try:
+            if has_statistics:
+                # Removed only inside this transaction; reload the planner's copy
+                conn.execute(text("DELETE FROM sqlite_stat1"))
+                conn.execute(text("ANALYZE sqlite_master"))
+            for name, sql in HOT_QUERIES.items():
+                # Значения параметров не влияют на выбор индекса
+                params = {key: None for key in _param_names(sql)}
+                plan = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+                details = [row[-1] for row in plan]
+                # "SCAN ... USING INDEX" is a full pass over the index - also a scan
+                if any(detail.startswith("SCAN") for detail in details):
+                    full_scans[name] = details
+        finally:
+            conn.rollback()
+            if has_statistics:
+                conn.execute(text("ANALYZE sqlite_master"))
+                conn.rollback()
+
+    return full_scans
+
+def _param_names(sql):
+    """Names of :named parameters in a SQL string"""
+    return [part[1:].rstrip(",)") for part in sql.split() if part.startswith(":")]
+
+if __name__ == "__main__":
+    import sys
+
+    run_migration()
+    problems = check_query_plans()
+    for name, details in problems.items():
+        print(f"Full scan in {name}: {details}")
+    if not problems:
+        print("All hot queries use indexes")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,114 @@
+"""
+Migration script to create material_status_history and backfill it from
+audit_log "status_change" rows
+"""
+import re
+from sqlalchemy import text
+from database.connection import engine
+from models.models import MaterialStatusHistory
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Формат записи utils.audit.log_status_change
+STATUS_CHANGE_PATTERN = re.compile(
+    r"^Material ID: (\d+), Old Status: (.*?), New Status: (.*)$"
+)
+
+def run_migration(progress=None):
+    """Run the migration to create and backfill the status history table"""
+    MaterialStatusHistory.__table__.create(bind=engine, checkfirst=True)
+    backfill_status_history(progress=progress)
+    return True
+
+def backfill_status_history(batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Reconstruct status history from the audit log.
+
+    audit_log rows are read in id-ordered batches and inserted with one
+    executemany per batch; transitions already present (same material and
+    timestamp) are skipped, so the job can be re-run safely. Materials
+    without an initial history row get one at their created_at.
+
+    Args:
+        batch_size: Number of audit rows processed per transaction
+        progress: Callback progress(table_name, processed, total)
+
+    Returns:
+        int: Number of inserted history rows
+    """
+    inserted = 0
+    processed = 0
+    last_id = 0
+
+    with engine.connect() as conn:
+        has_audit_log = conn.execute(
+            text("SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='audit_log'")
+        ).scalar()
+        total = conn.execute(
+            text("SELECT COUNT(*) FROM audit_log WHERE action = 'status_change'")
+        ).scalar() if has_audit_log else 0
+
+    while has_audit_log:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, user_id, details, timestamp FROM audit_log "
+                    "WHERE action = 'status_change' AND id > :last_id "
+                    "ORDER BY id LIMIT :batch_size"
+                ),
+                {"last_id": last_id, "batch_size": batch_size}
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            processed += len(rows)
+
+            transitions = []
+            for _, user_id, details, timestamp in rows:
+                match = STATUS_CHANGE_PATTERN.match(details or "")
+                if not match:
+                    continue
+                transitions.append({
+                    "material_entry_id": int(match.group(1)),
+                    "from_status": match.group(2) if match.group(2) not in ("", "None") else None,
+                    "to_status": match.group(3),
+                    "changed_by_id": user_id,
+                    "changed_at": timestamp,
+                })
+
+            if transitions:
+                result = conn.execute(
+                    text(
+                        "INSERT INTO material_status_history "
+                        "(material_entry_id, from_status, to_status, changed_by_id, changed_at) "
+                        "SELECT :material_entry_id, :from_status, :to_status, :changed_by_id, :changed_at "
+                        "WHERE NOT EXISTS (SELECT 1 FROM material_status_history "
+                        "WHERE material_entry_id = :material_entry_id AND changed_at = :changed_at)"
+                    ),
+                    transitions
+                )
+                inserted += max(result.rowcount, 0)
+
+        if progress:
+            progress("material_status_history", processed, total)
+
+    # Начальная запись для материалов, созданных до появления истории
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            "INSERT INTO material_status_history "
+            "(material_entry_id, from_status, to_status, changed_by_id, changed_at) "
+            "SELECT m.id, NULL, "
+            "COALESCE((SELECT h.from_status FROM material_status_history h "
+            "          WHERE h.material_entry_id = m.id ORDER BY h.changed_at LIMIT 1), m.status, 'received'), "
+            "m.created_by_id, COALESCE(m.created_at, CURRENT_TIMESTAMP) "
+            "FROM material_entries m "
+            "WHERE NOT EXISTS (SELECT 1 FROM material_status_history h "
+            "                  WHERE h.material_entry_id = m.id AND h.from_status IS NULL)"
+        ))
+        inserted += max(result.rowcount, 0)
+
+    return inserted
+
+if __name__ == "__main__":
+    run_migration(progress=lambda table_name, done, total: print(f"{table_name}: {done}/{total}"))
+    print("Status history backfill completed")
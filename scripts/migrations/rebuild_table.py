@@ -0,0 +1,92 @@
+"""
+Batched, resumable rebuild of a table to the current model schema
+"""
+import logging
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+from database.connection import engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+def _log_progress(table_name, copied, total):
+    """Default progress callback"""
+    logger.info(f"Rebuilding {table_name}: {copied}/{total} rows")
+
+def rebuild_table(table, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Rebuild a table to the schema declared in its model.
+
+    Rows are copied into "<table>_rebuild" in batches ordered by id, each batch
+    in its own transaction, so an interrupted rebuild continues from the last
+    copied id on the next run. The final swap (drop + rename) is a single
+    transaction, after which the model indexes are recreated.
+
+    Args:
+        table: SQLAlchemy Table (e.g. QCCheck.__table__)
+        batch_size: Number of rows copied per transaction
+        progress: Callback progress(table_name, copied, total)
+    """
+    progress = progress or _log_progress
+    name = table.name
+    rebuild_name = f"{name}_rebuild"
+
+    with engine.connect() as conn:
+        existing = {row[0] for row in conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table'")
+        )}
+        old_columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({name})"))}
+
+    if name not in existing:
+        # Таблица уже переименована на предыдущем запуске или еще не создана
+        if rebuild_name in existing:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {rebuild_name} RENAME TO {name}"))
+        else:
+            table.create(bind=engine, checkfirst=True)
+        _create_indexes(table)
+        return
+
+    copy_columns = ", ".join(column.name for column in table.columns if column.name in old_columns)
+
+    if rebuild_name not in existing:
+        ddl = str(CreateTable(table).compile(dialect=engine.dialect)).strip()
+        ddl = ddl.replace(f"CREATE TABLE {name} ", f"CREATE TABLE {rebuild_name} ", 1)
+        with engine.begin() as conn:
+            conn.execute(text(ddl))
+
+    with engine.connect() as conn:
+        total = conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+        copied = conn.execute(text(f"SELECT COUNT(*) FROM {rebuild_name}")).scalar()
+        last_id = conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {rebuild_name}")).scalar()
+
+    progress(name, copied, total)
+    while True:
+        with engine.begin() as conn:
+            result = conn.execute(
+                text(
+                    f"INSERT INTO {rebuild_name} ({copy_columns}) "
+                    f"SELECT {copy_columns} FROM {name} WHERE id > :last_id "
+                    f"ORDER BY id LIMIT :batch_size"
+                ),
+                {"last_id": last_id, "batch_size": batch_size}
+            )
+            if result.rowcount == 0:
+                break
+            copied += result.rowcount
+            last_id = conn.execute(text(f"SELECT MAX(id) FROM {rebuild_name}")).scalar()
+        progress(name, copied, total)
+
+    with engine.begin() as conn:
+        # pysqlite не открывает транзакцию перед DDL, открываем ее явно
+        conn.exec_driver_sql("BEGIN")
+        conn.execute(text(f"DROP TABLE {name}"))
+        conn.execute(text(f"ALTER TABLE {rebuild_name} RENAME TO {name}"))
+
+    _create_indexes(table)
+
+def _create_indexes(table):
+    """Create the model indexes of a rebuilt table"""
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
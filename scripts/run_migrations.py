@@ -1,94 +1,209 @@
 """
 Скрипт для выполнения миграций базы данных
+
+Примененные миграции записываются в таблицу schema_version. Если все
+миграции из MIGRATIONS уже применены, запуск сводится к одному запросу
+номера версии.
+
+Новая миграция добавляется в конец MIGRATIONS со следующим номером.
+Миграции должны быть идемпотентными: на базе, созданной через create_all,
+они выполняются поверх уже актуальной схемы.
 """
 import os
 import sys
+import logging
 import datetime
 
 # Добавляем корневую директорию проекта в sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database.connection import Base, engine, SessionLocal
-from sqlalchemy import inspect, text
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 from models.models import *  # Импортируем все модели
 from scripts.migrations.update_sample_requests import run_migration as update_sample_requests
 from scripts.migrations.add_samples_tables import run_migration as add_samples_tables
+from scripts.migrations.add_hot_indexes import run_migration as add_hot_indexes
+from scripts.migrations.add_status_history import run_migration as add_status_history
+from scripts.migrations.add_audit_entity_columns import run_migration as add_audit_entity_columns
+from scripts.migrations.add_audit_fts import run_migration as add_audit_fts
+from scripts.migrations.add_change_log import run_migration as add_change_log
+from scripts.migrations.rebuild_table import rebuild_table
+
+logger = logging.getLogger(__name__)
 
-def run_migrations():
-    """Выполнить миграции базы данных"""
-    inspector = inspect(engine)
-    
-    # Получаем список существующих таблиц
-    existing_tables = inspector.get_table_names()
-    print(f"Существующие таблицы: {existing_tables}")
-    
-    # Создаем все таблицы, которых еще нет
+CHEM_COLUMNS = {'chem_c', 'chem_si', 'chem_mn', 'chem_s', 'chem_p', 'chem_cr',
+                'chem_ni', 'chem_cu', 'chem_ti', 'chem_al', 'chem_mo', 'chem_v', 'chem_nb'}
+
+def _initial_schema(progress):
+    """Создать все таблицы, которых еще нет"""
     Base.metadata.create_all(bind=engine)
-    print("Созданы все таблицы, указанные в моделях")
-    
-    # Проверяем наличие столбцов в таблице qc_checks
-    if 'qc_checks' in existing_tables:
-        columns = {col['name'] for col in inspector.get_columns('qc_checks')}
-        print(f"Столбцы в таблице qc_checks: {columns}")
-        
-        # Проверяем наличие столбцов для химического состава
-        chem_columns = {'chem_c', 'chem_si', 'chem_mn', 'chem_s', 'chem_p', 'chem_cr', 
-                      'chem_ni', 'chem_cu', 'chem_ti', 'chem_al', 'chem_mo', 'chem_v', 'chem_nb'}
-        
-        missing_columns = chem_columns - columns
-        if missing_columns:
-            print(f"Отсутствующие столбцы: {missing_columns}")
-            print("Требуется обновление структуры таблицы.")
-            
-            try:
-                # В SQLite ALTER TABLE добавляет только один столбец за операцию
-                # Поэтому нам нужно создать новую таблицу и скопировать данные
-                backup_table_name = f"qc_checks_backup_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                print(f"Создаем резервную копию таблицы: {backup_table_name}")
-                
-                # Создаем новую таблицу с обновленной схемой
-                print("Пересоздаем таблицу с новой схемой...")
-                
-                # Используем правильный метод для выполнения SQL-запросов
-                with engine.connect() as connection:
-                    connection.execute(text(f"ALTER TABLE qc_checks RENAME TO {backup_table_name}"))
-                
-                # Создаем новую таблицу с правильной схемой
-                Base.metadata.create_all(bind=engine)
-                
-                # Копируем данные из старой таблицы в новую
-                copy_columns = columns - missing_columns
-                columns_str = ", ".join(copy_columns)
-                
-                with engine.connect() as connection:
-                    connection.execute(text(f"INSERT INTO qc_checks ({columns_str}) SELECT {columns_str} FROM {backup_table_name}"))
-                    connection.commit()
-                
-                print("Миграция данных успешно выполнена!")
-            except Exception as e:
-                print(f"Ошибка при обновлении таблицы: {str(e)}")
-                print("Рекомендуется удалить базу данных и запустить программу заново.")
-    
-    # Обновляем таблицу sample_requests
-    print("Обновляем таблицу sample_requests...")
+
+def _qc_checks_chem_columns(progress):
+    """Перестроить qc_checks, если нет столбцов химического состава"""
+    with engine.connect() as conn:
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(qc_checks)"))}
+        interrupted = conn.execute(
+            text("SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='qc_checks_rebuild'")
+        ).scalar()
+    if CHEM_COLUMNS - columns or interrupted:
+        rebuild_table(QCCheck.__table__, progress=progress)
+
+def _qc_and_material_edit_columns(progress):
+    """Столбцы замечаний ОТК и запросов на редактирование"""
+    from database.migrate_db import migrate_database
+    migrate_database()
+
+def _sample_requests_fields(progress):
+    """Поля места отбора и изготовления образцов"""
     update_sample_requests()
-    print("Обновление таблицы sample_requests завершено")
-    
-    # Добавляем таблицы samples и lab_test_samples
-    print("Добавляем таблицы для образцов...")
+
+def _samples_tables(progress):
+    """Таблицы samples и lab_test_samples"""
     add_samples_tables()
-    print("Добавление таблиц для образцов завершено")
-    
+
+def _hot_indexes(progress):
+    """Индексы для частых фильтров"""
+    add_hot_indexes()
+
+def _status_history(progress):
+    """История статусов материалов с заполнением из журнала аудита"""
+    add_status_history(progress=progress)
+
+def _daily_material_rollup(progress):
+    """Ежедневная сводка материалов"""
+    from utils.material_rollup import rebuild_rollup
+    DailyMaterialRollup.__table__.create(bind=engine, checkfirst=True)
+    # rebuild_rollup отмечает пересчет в data_versions
+    DataVersion.__table__.create(bind=engine, checkfirst=True)
+    rebuild_rollup()
+
+def _data_versions(progress):
+    """Счетчики изменений таблиц для условных GET-запросов API"""
+    DataVersion.__table__.create(bind=engine, checkfirst=True)
+
+def _audit_entity_columns(progress):
+    """Структурированные столбцы журнала аудита с заполнением из details"""
+    add_audit_entity_columns(progress=progress)
+
+def _audit_fts(progress):
+    """Полнотекстовый индекс журнала аудита"""
+    add_audit_fts(progress=progress)
+
+def _notification_outbox(progress):
+    """Очередь исходящих уведомлений"""
+    NotificationOutbox.__table__.create(bind=engine, checkfirst=True)
+
+def _notification_digests(progress):
+    """События дайджестов уведомлений и тихие часы пользователей"""
+    NotificationDigestEvent.__table__.create(bind=engine, checkfirst=True)
+    NotificationPreference.__table__.create(bind=engine, checkfirst=True)
+
+def _change_log(progress):
+    """Журнал изменений строк, заполняемый триггерами"""
+    add_change_log(progress=progress)
+
+def _dispatcher_leases(progress):
+    """Аренда роли единственного диспетчера уведомлений"""
+    DispatcherLease.__table__.create(bind=engine, checkfirst=True)
+
+# Упорядоченный реестр миграций: (версия, название, функция)
+MIGRATIONS = [
+    (1, "initial_schema", _initial_schema),
+    (2, "qc_checks_chem_columns", _qc_checks_chem_columns),
+    (3, "qc_and_material_edit_columns", _qc_and_material_edit_columns),
+    (4, "sample_requests_fields", _sample_requests_fields),
+    (5, "samples_tables", _samples_tables),
+    (6, "hot_indexes", _hot_indexes),
+    (7, "status_history", _status_history),
+    (8, "daily_material_rollup", _daily_material_rollup),
+    (9, "data_versions", _data_versions),
+    (10, "audit_entity_columns", _audit_entity_columns),
+    (11, "audit_fts", _audit_fts),
+    (12, "notification_outbox", _notification_outbox),
+    (13, "notification_digests", _notification_digests),
+    (14, "change_log", _change_log),
+    (15, "dispatcher_leases", _dispatcher_leases),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version():
+    """
+    Получить текущую версию схемы
+
+    Returns:
+        int: Номер последней примененной миграции, 0 если таблица
+             schema_version есть, но пуста, None если ее нет
+    """
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+    except OperationalError:
+        return None
+
+def _log_progress(table_name, copied, total):
+    """Вывод прогресса перестроения таблицы"""
+    logger.info(f"Migrating {table_name}: {copied}/{total} rows")
+
+def run_migrations(progress=None):
+    """
+    Выполнить недостающие миграции базы данных
+
+    Args:
+        progress: Функция progress(table_name, copied, total) для отчета
+                  о перестроении больших таблиц
+
+    Returns:
+        bool: True, если схема актуальна
+    """
+    current_version = get_schema_version()
+    if current_version is not None and current_version >= LATEST_VERSION:
+        return True
+
+    progress = progress or _log_progress
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR(100) NOT NULL, "
+            "applied_at DATETIME NOT NULL)"
+        ))
+
+    current_version = current_version or 0
+    for version, name, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        logger.info(f"Applying migration {version}/{LATEST_VERSION}: {name}")
+        try:
+            migration(progress)
+        except Exception as e:
+            logger.error(f"Migration {version} ({name}) failed: {str(e)}")
+            return False
+
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT OR REPLACE INTO schema_version (version, name, applied_at) "
+                     "VALUES (:version, :name, :applied_at)"),
+                {"version": version, "name": name, "applied_at": datetime.datetime.utcnow()}
+            )
+
     return True
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("Запуск миграции базы данных...")
-    success = run_migrations()
+    print(f"Текущая версия схемы: {get_schema_version()}, последняя: {LATEST_VERSION}")
+    success = run_migrations(
+        progress=lambda table_name, copied, total: print(f"{table_name}: {copied}/{total}")
+    )
     if success:
         print("Миграция успешно завершена.")
     else:
         print("Ошибка при выполнении миграций.")
-    
+
     # Проверяем наличие пользователя admin
     db = SessionLocal()
     admin = db.query(User).filter(User.username == 'admin').first()
@@ -108,4 +223,4 @@ if __name__ == "__main__":
         db.commit()
         print("Пользователь admin создан!")
     else:
-        print("Пользователь admin уже существует.") 
\ No newline at end of file
+        print("Пользователь admin уже существует.")
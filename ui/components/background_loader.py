@@ -0,0 +1,191 @@
+"""
+Фоновая загрузка данных для вкладок ППСД
+
+Запрос выполняется в рабочем потоке (QThread) со своей сессией, в интерфейс
+возвращаются только простые данные (кортежи, GridRow) через сигналы.
+Новая загрузка отменяет предыдущую: ее SQL-запрос прерывается
+(sqlite3.Connection.interrupt), а результат, если он все же успел прийти,
+отбрасывается.
+"""
+
+import threading
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+from PySide6.QtWidgets import QApplication, QProgressBar
+
+from database.connection import SessionLocal
+
+# Индикатор показывается, только если загрузка длится дольше этого времени
+INDICATOR_DELAY_MS = 150
+
+class LoadWorker(QThread):
+    """
+    Рабочий поток одной загрузки
+
+    Функция загрузки вызывается как load_fn(db, *args) и должна вернуть
+    данные, не привязанные к сессии (объекты ORM после закрытия сессии
+    использовать нельзя).
+    """
+
+    loaded = Signal(object, object)  # поток, результат
+    failed = Signal(object, str)     # поток, сообщение об ошибке
+
+    def __init__(self, load_fn, args, on_result, on_error=None):
+        super().__init__()
+        self.load_fn = load_fn
+        self.args = args
+        self.on_result = on_result
+        self.on_error = on_error
+        self.is_cancelled = False
+        self._lock = threading.Lock()
+        self._dbapi_connection = None
+
+    def cancel(self):
+        """Отмена загрузки: прерываем выполняющийся SQL-запрос"""
+        self.is_cancelled = True
+        with self._lock:
+            if self._dbapi_connection is not None:
+                try:
+                    self._dbapi_connection.interrupt()
+                except Exception:
+                    pass
+
+    def run(self):
+        db = SessionLocal()
+        try:
+            with self._lock:
+                if self.is_cancelled:
+                    return
+                self._dbapi_connection = db.connection().connection.dbapi_connection
+            result = self.load_fn(db, *self.args)
+            if not self.is_cancelled:
+                self.loaded.emit(self, result)
+        except Exception as e:
+            # После отмены ошибка "interrupted" ожидаема
+            if not self.is_cancelled:
+                self.failed.emit(self, str(e))
+        finally:
+            with self._lock:
+                self._dbapi_connection = None
+            db.close()
+
+class BackgroundLoader(QObject):
+    """
+    Загрузчик данных вкладки: одна активная загрузка, новая отменяет старую
+
+    Пример:
+        self.loader = BackgroundLoader(self)
+        self.loader.load(fetch_users, on_result=self.fill_users_table,
+                         on_error=self.on_users_load_failed)
+    """
+
+    busy_changed = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._current = None
+        self._workers = set()  # Потоки, которые еще не завершились (в т.ч. отмененные)
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+
+    @property
+    def is_busy(self):
+        return self._current is not None
+
+    def load(self, load_fn, *args, on_result, on_error=None):
+        """
+        Запустить загрузку load_fn(db, *args) в фоне
+
+        Args:
+            load_fn: Функция загрузки, выполняется в рабочем потоке
+            on_result: Обработчик результата (в потоке интерфейса)
+            on_error: Обработчик ошибки on_error(message) (в потоке интерфейса)
+        """
+        was_busy = self.is_busy
+        self.cancel(notify=False)
+
+        worker = LoadWorker(load_fn, args, on_result, on_error)
+        worker.loaded.connect(self._on_loaded)
+        worker.failed.connect(self._on_failed)
+        worker.finished.connect(self._on_finished)
+        self._current = worker
+        self._workers.add(worker)
+        worker.start()
+
+        if not was_busy:
+            self.busy_changed.emit(True)
+
+    def cancel(self, notify=True):
+        """Отменить текущую загрузку (ее результат не будет доставлен)"""
+        worker = self._current
+        if worker is None:
+            return
+        self._current = None
+        worker.cancel()
+        if notify:
+            self.busy_changed.emit(False)
+
+    def shutdown(self, timeout_ms=2000):
+        """Отменить все загрузки и дождаться завершения потоков (при выходе)"""
+        self.cancel()
+        for worker in list(self._workers):
+            worker.cancel()
+            worker.wait(timeout_ms)
+
+    def _on_loaded(self, worker, result):
+        if worker is not self._current or worker.is_cancelled:
+            return  # Устаревший результат
+        self._current = None
+        self.busy_changed.emit(False)
+        worker.on_result(result)
+
+    def _on_failed(self, worker, message):
+        if worker is not self._current or worker.is_cancelled:
+            return
+        self._current = None
+        self.busy_changed.emit(False)
+        if worker.on_error:
+            worker.on_error(message)
+
+    def _on_finished(self):
+        worker = self.sender()
+        self._workers.discard(worker)
+        if worker is self._current:
+            # Поток завершился без результата (например, отменен до старта)
+            self._current = None
+            self.busy_changed.emit(False)
+        worker.deleteLater()
+
+class LoadingIndicator(QProgressBar):
+    """
+    Неблокирующий индикатор загрузки (бегущая полоса)
+
+    Показывается, если загрузка длится дольше INDICATOR_DELAY_MS,
+    и не мешает работе с таблицей.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRange(0, 0)
+        self.setTextVisible(False)
+        self.setMaximumHeight(4)
+        self.hide()
+        self._busy_count = 0
+        self._show_timer = QTimer(self)
+        self._show_timer.setSingleShot(True)
+        self._show_timer.setInterval(INDICATOR_DELAY_MS)
+        self._show_timer.timeout.connect(self.show)
+
+    def attach(self, loader):
+        """Отслеживать загрузчик (можно подключить несколько)"""
+        loader.busy_changed.connect(self.set_busy)
+
+    def set_busy(self, busy):
+        self._busy_count = max(0, self._busy_count + (1 if busy else -1))
+        if self._busy_count:
+            if not self.isVisible() and not self._show_timer.isActive():
+                self._show_timer.start()
+        else:
+            self._show_timer.stop()
+            self.hide()
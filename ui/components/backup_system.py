@@ -88,6 +88,13 @@ class BackupWorker(QThread):
         # Путь к базе данных
         db_path = "database/ppsd.db"
         if os.path.exists(db_path):
+            # В режиме WAL часть зафиксированных данных находится в ppsd.db-wal,
+            # переносим их в основной файл перед копированием
+            connection = sqlite3.connect(db_path)
+            try:
+                connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                connection.close()
             backup_zip.write(db_path, "database/ppsd.db")
     
     def backup_documents(self, backup_zip):
@@ -407,6 +414,10 @@ class BackupSystemWidget(QWidget):
             # Восстанавливаем базу данных
             if os.path.exists(f"{extract_path}/database/ppsd.db"):
                 shutil.copy2(f"{extract_path}/database/ppsd.db", "database/ppsd.db")
+                # Журнал WAL от текущей базы не должен применяться к восстановленной
+                for suffix in ("-wal", "-shm"):
+                    if os.path.exists(f"database/ppsd.db{suffix}"):
+                        os.remove(f"database/ppsd.db{suffix}")
             
             # Восстанавливаем документы
             if os.path.exists(f"{extract_path}/docs_storage"):
@@ -0,0 +1,420 @@
+"""
+Таблица с постраничной подгрузкой строк из базы данных для ППСД
+
+Модель хранит только загруженные строки и подгружает следующую страницу,
+когда пользователь прокручивает таблицу до конца (canFetchMore/fetchMore).
+Запросы выполняются в фоновом потоке (ui.components.background_loader).
+Страницы выбираются по ключу (created_at, id) (database.queries.keyset_page),
+поэтому стоимость запроса не зависит от глубины прокрутки.
+
+После редактирования таблица не перечитывается целиком: refresh_changed()
+запрашивает только записи, измененные после последней отметки updated_at
+(database.queries.changes_since), и заменяет, вставляет или удаляет
+соответствующие строки, сохраняя выделение и положение прокрутки.
+"""
+
+from collections import namedtuple
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Signal
+from PySide6.QtGui import QBrush, QColor
+from PySide6.QtWidgets import QTableView, QAbstractItemView, QHeaderView
+
+from ui.components.background_loader import BackgroundLoader
+
+DEFAULT_PAGE_SIZE = 200
+
+# Роль для сортировки по исходному значению (дата, число), а не по тексту
+SortRole = Qt.UserRole + 1
+
+# Строка таблицы. Только простые типы, без объектов ORM и Qt:
+#   key - идентификатор записи (возвращается по Qt.UserRole)
+#   values - отображаемые значения колонок
+#   tooltips - подсказки колонок (или None)
+#   colors - цвет фона колонок в виде (r, g, b) (или None)
+#   sort_keys - значения для сортировки колонок (или None)
+#   order_key - ключ порядка запроса (created_at, id), нужен для вставки новых
+#               строк при инкрементном обновлении (или None)
+GridRow = namedtuple("GridRow", ["key", "values", "tooltips", "colors", "sort_keys", "order_key"],
+                     defaults=(None, None, None, None))
+
+def _order_value(order_key):
+    """
+    Ключ (created_at, id) для сравнения в порядке запроса: created_at
+    может быть None, такие записи идут после всех дат (как NULL при DESC)
+    """
+    created_at, key_id = order_key
+    return (created_at is not None, created_at, key_id)
+
+class LazyTableModel(QAbstractTableModel):
+    """
+    Модель таблицы с подгрузкой страниц
+
+    Функции загрузки вызываются в рабочем потоке с отдельной сессией и
+    должны возвращать готовые GridRow, а не объекты ORM.
+
+    Args:
+        headers: Заголовки колонок
+        fetch_page: Функция fetch_page(db, filters, cursor, limit) -> (список GridRow, курсор или None)
+        count_rows: Функция count_rows(db, filters) -> общее число строк (необязательно)
+        fetch_changes: Функция fetch_changes(db, filters, since) -> (список GridRow измененных
+            записей, подходящих под фильтры; ключи всех измененных записей; новая отметка)
+            или None, если изменений слишком много (необязательно, без нее
+            refresh_changed() перезагружает таблицу)
+        page_size: Количество строк в странице
+    """
+
+    # Загружено строк, всего строк (-1, если неизвестно)
+    rows_loaded = Signal(int, int)
+    load_failed = Signal(str)
+    # Инкрементное обновление: перед изменением строк и после него (загружено, всего)
+    patch_started = Signal()
+    rows_patched = Signal(int, int)
+
+    def __init__(self, headers, fetch_page, count_rows=None, fetch_changes=None,
+                 page_size=DEFAULT_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.fetch_page = fetch_page
+        self.count_rows = count_rows
+        self.fetch_changes = fetch_changes
+        self.page_size = page_size
+        self.filters = {}
+        self.total_rows = -1
+        self._rows = []
+        self._cursor = None
+        self._has_more = False
+        self._watermark = None
+        self._refresh_pending = False
+        self.loader = BackgroundLoader(self)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and 0 <= section < len(self.headers):
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            return row.values[column]
+        if role == Qt.UserRole:
+            return row.key
+        if role == Qt.ToolTipRole and row.tooltips:
+            return row.tooltips[column]
+        if role == Qt.BackgroundRole and row.colors and row.colors[column]:
+            return QBrush(QColor(*row.colors[column]))
+        if role == SortRole:
+            if row.sort_keys and row.sort_keys[column] is not None:
+                return row.sort_keys[column]
+            return row.values[column]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more and not self.loader.is_busy
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._has_more or self.loader.is_busy:
+            return
+        self._start_load(with_count=False)
+
+    def _start_load(self, with_count):
+        """Запустить загрузку следующей страницы в фоне"""
+        self.loader.load(
+            self._load_page, dict(self.filters), self._cursor, with_count,
+            on_result=self._on_page_loaded, on_error=self._on_load_failed
+        )
+
+    def _load_page(self, db, filters, cursor, with_count):
+        """Выполняется в рабочем потоке"""
+        watermark = None
+        if with_count and self.fetch_changes:
+            # Отметка берется до чтения страницы: изменения между запросами
+            # придут при следующем refresh_changed()
+            _, _, watermark = self.fetch_changes(db, filters, None)
+        total = self.count_rows(db, filters) if with_count and self.count_rows else None
+        rows, next_cursor = self.fetch_page(db, filters, cursor, self.page_size)
+        return rows, next_cursor, total, watermark
+
+    def _on_page_loaded(self, result):
+        rows, next_cursor, total, watermark = result
+        if total is not None:
+            self.total_rows = total
+        if watermark is not None:
+            self._watermark = watermark
+        self._append_rows(rows, next_cursor)
+        if self._refresh_pending:
+            self.refresh_changed()
+
+    def _on_load_failed(self, message):
+        self._has_more = False
+        self._refresh_pending = False
+        self.load_failed.emit(message)
+
+    def _append_rows(self, rows, next_cursor):
+        """Добавить загруженную страницу в конец модели"""
+        self._cursor = next_cursor
+        self._has_more = next_cursor is not None
+        if rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+        self.rows_loaded.emit(len(self._rows), self.total_rows)
+
+    def reload(self, filters=None):
+        """
+        Сбросить загруженные строки и загрузить первую страницу
+
+        Незавершенная загрузка (например, по прежним фильтрам) отменяется.
+
+        Args:
+            filters: Новые фильтры (None - оставить текущие)
+        """
+        if filters is not None:
+            self.filters = dict(filters)
+
+        self.loader.cancel()
+        self.beginResetModel()
+        self._rows = []
+        self._cursor = None
+        self._has_more = False
+        self.endResetModel()
+
+        self.total_rows = -1
+        self._watermark = None
+        self._refresh_pending = False
+        self._start_load(with_count=True)
+
+    def refresh_changed(self):
+        """
+        Обновить строки записей, измененных после последней загрузки
+
+        Измененные строки заменяются на месте, новые вставляются в пределах
+        загруженных страниц, удаленные и переставшие подходить под фильтры
+        убираются. Если отметки нет (пустая таблица, нет fetch_changes) или
+        изменений слишком много, таблица перезагружается.
+        """
+        if self.fetch_changes is None or self._watermark is None:
+            self.reload()
+            return
+        if self.loader.is_busy:
+            # Идет загрузка страницы: обновимся сразу после нее
+            self._refresh_pending = True
+            return
+        self._refresh_pending = False
+        self.loader.load(
+            self._load_changes, dict(self.filters), self._watermark,
+            on_result=self._on_changes_loaded, on_error=self._on_load_failed
+        )
+
+    def _load_changes(self, db, filters, since):
+        """Выполняется в рабочем потоке"""
+        changes = self.fetch_changes(db, filters, since)
+        if changes is None:
+            return None, None
+        total = self.count_rows(db, filters) if self.count_rows else None
+        return changes, total
+
+    def _on_changes_loaded(self, result):
+        changes, total = result
+        if changes is None:
+            self.reload()
+            return
+        rows, changed_keys, watermark = changes
+        self._watermark = watermark
+        if total is not None:
+            self.total_rows = total
+        if changed_keys:
+            self.patch_started.emit()
+            self._apply_changes(rows, changed_keys)
+        self.rows_patched.emit(len(self._rows), self.total_rows)
+
+    def _apply_changes(self, rows, changed_keys):
+        """Заменить, удалить и вставить строки измененных записей"""
+        fresh = {row.key: row for row in rows}
+        last_column = len(self.headers) - 1
+
+        for position in reversed(range(len(self._rows))):
+            row = self._rows[position]
+            if row.key not in changed_keys:
+                continue
+            new_row = fresh.get(row.key)
+            if new_row is not None and new_row.order_key == row.order_key:
+                # Запись осталась на месте - меняем только данные строки
+                self._rows[position] = new_row
+                self.dataChanged.emit(self.index(position, 0), self.index(position, last_column))
+                del fresh[row.key]
+            else:
+                # Запись удалена, не подходит под фильтры или сменила место
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self._rows[position]
+                self.endRemoveRows()
+
+        for new_row in fresh.values():
+            if new_row.order_key is None:
+                continue
+            if self._has_more and not _order_value(new_row.order_key) > _order_value(self._cursor):
+                continue  # Придет со следующей страницей
+            position = self._insert_position(new_row.order_key)
+            self.beginInsertRows(QModelIndex(), position, position)
+            self._rows.insert(position, new_row)
+            self.endInsertRows()
+
+    def _insert_position(self, order_key):
+        """Позиция строки в порядке запроса (order_key по убыванию)"""
+        value = _order_value(order_key)
+        for position, row in enumerate(self._rows):
+            if row.order_key is not None and _order_value(row.order_key) < value:
+                return position
+        return len(self._rows)
+
+    def key_at(self, row):
+        """Идентификатор записи в строке модели"""
+        if 0 <= row < len(self._rows):
+            return self._rows[row].key
+        return None
+
+    def row_for_key(self, key):
+        """Номер строки модели по идентификатору записи (-1, если не загружена)"""
+        for row, item in enumerate(self._rows):
+            if item.key == key:
+                return row
+        return -1
+
+class LazySortFilterProxyModel(QSortFilterProxyModel):
+    """
+    Сортировка загруженных строк по SortRole
+
+    Фильтры передаются в запрос к базе (LazyTableModel.reload), поэтому
+    прокси только сортирует и пропускает все строки.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSortRole(SortRole)
+        self.setSortCaseSensitivity(Qt.CaseInsensitive)
+        self.setDynamicSortFilter(True)
+
+    def lessThan(self, left, right):
+        left_value = left.data(SortRole)
+        right_value = right.data(SortRole)
+        # Пустые значения - в конце при сортировке по возрастанию
+        if left_value is None or right_value is None:
+            return left_value is not None
+        try:
+            return left_value < right_value
+        except TypeError:
+            return str(left_value) < str(right_value)
+
+class LazyTableView(QTableView):
+    """
+    Представление для LazyTableModel с сортировкой загруженных строк
+
+    Выделяется строка целиком; идентификатор выбранной записи возвращает
+    selected_key(), двойной клик по строке - сигнал key_activated.
+    """
+
+    key_activated = Signal(object)
+
+    def __init__(self, source_model, parent=None):
+        super().__init__(parent)
+        self.source_model = source_model
+        self.proxy_model = LazySortFilterProxyModel(self)
+        self.proxy_model.setSourceModel(source_model)
+        self.setModel(self.proxy_model)
+
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.setAlternatingRowColors(False)
+        # Без сортировки по умолчанию: строки идут в порядке запроса
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.setSortingEnabled(True)
+        self.doubleClicked.connect(self._on_double_clicked)
+
+        # Инкрементное обновление не должно сдвигать прокрутку
+        self._scroll_anchor = None
+        source_model.patch_started.connect(self._remember_scroll_anchor)
+        source_model.rows_patched.connect(self._restore_scroll_anchor)
+
+    def columnCount(self):
+        """Количество колонок (совместимость с функциями стилей для QTableWidget)"""
+        return self.source_model.columnCount()
+
+    def rowCount(self):
+        """Количество загруженных строк"""
+        return self.proxy_model.rowCount()
+
+    def key_at(self, view_row):
+        """Идентификатор записи в строке представления"""
+        source_index = self.proxy_model.mapToSource(self.proxy_model.index(view_row, 0))
+        return self.source_model.key_at(source_index.row())
+
+    def selected_key(self):
+        """Идентификатор выбранной записи или None"""
+        rows = self.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.key_at(rows[0].row())
+
+    def select_key(self, key):
+        """Выделить строку записи, если она загружена"""
+        source_row = self.source_model.row_for_key(key)
+        if source_row < 0:
+            return False
+        view_index = self.proxy_model.mapFromSource(self.source_model.index(source_row, 0))
+        self.selectRow(view_index.row())
+        return True
+
+    def fit_columns(self, min_widths=None, max_width=300, stretch_column=None):
+        """
+        Подогнать ширину колонок под загруженные строки
+
+        Args:
+            min_widths: Минимальная ширина по номерам колонок
+            max_width: Максимальная ширина колонки
+            stretch_column: Колонка, растягиваемая на свободное место
+        """
+        min_widths = min_widths or {}
+        self.resizeColumnsToContents()
+        for col in range(self.columnCount()):
+            current_width = self.columnWidth(col)
+            min_width = min_widths.get(col, 60)
+            if current_width < min_width:
+                self.setColumnWidth(col, min_width)
+            elif current_width > max_width:
+                self.setColumnWidth(col, max_width)
+        if stretch_column is not None:
+            self.horizontalHeader().setSectionResizeMode(stretch_column, QHeaderView.ResizeMode.Stretch)
+
+    def _remember_scroll_anchor(self):
+        """Запомнить верхнюю видимую запись (если таблица прокручена)"""
+        self._scroll_anchor = None
+        if self.verticalScrollBar().value() > 0:
+            top_row = self.rowAt(0)
+            if top_row >= 0:
+                self._scroll_anchor = self.key_at(top_row)
+
+    def _restore_scroll_anchor(self, loaded=0, total=0):
+        """Вернуть запомненную запись наверх видимой области"""
+        key, self._scroll_anchor = self._scroll_anchor, None
+        if key is None:
+            return
+        source_row = self.source_model.row_for_key(key)
+        if source_row < 0:
+            return
+        view_index = self.proxy_model.mapFromSource(self.source_model.index(source_row, 0))
+        self.scrollTo(view_index, QAbstractItemView.ScrollHint.PositionAtTop)
+
+    def _on_double_clicked(self, index):
+        key = self.key_at(index.row())
+        if key is not None:
+            self.key_activated.emit(key)
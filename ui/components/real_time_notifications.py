@@ -3,112 +3,197 @@
 Отслеживает изменения в базе данных и показывает уведомления
 """
 
+import os
+import json
+import time
+import socket
+import http.client
+from urllib.parse import urlsplit
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QScrollArea, QFrame
-from PySide6.QtCore import QTimer, Signal, QThread, pyqtSignal
+from PySide6.QtCore import QTimer, Signal, QThread
 from PySide6.QtGui import QFont, QPixmap
 from datetime import datetime, timedelta
-from database.connection import SessionLocal
-from models.models import MaterialEntry, Sample, LabTest, QCCheck, MaterialStatus
+from sqlalchemy import text
+from database.connection import engine
+from models.models import MaterialStatus
 from ui.themes import theme_manager
 from ui.icons.icon_provider import IconProvider
 from ui.notifications import notification_manager
-from sqlalchemy import desc
+from utils.change_log import OP_INSERT, ChangeLogReader, latest_seq
+
+# Подписка на события API (GET /events); пустое значение - только опрос базы
+CHANGE_EVENTS_URL = os.getenv("CHANGE_EVENTS_URL", "http://localhost:8000/events")
+# Через сколько секунд без подписки пробовать подключиться снова
+PUSH_RETRY_INTERVAL = int(os.getenv("PUSH_RETRY_INTERVAL", "60"))
+# Сервер шлет heartbeat каждые 15 секунд; дольше тишины - обрыв
+PUSH_READ_TIMEOUT = 45
+# Интервал опроса PRAGMA data_version (без подписки) и проверки просроченных задач
+CHANGE_POLL_INTERVAL_MS = int(os.getenv("CHANGE_POLL_INTERVAL_MS", "1000"))
+URGENT_CHECK_INTERVAL = int(os.getenv("URGENT_CHECK_INTERVAL", "600"))  # секунды
 
 class DatabaseWatcher(QThread):
-    """Наблюдатель за изменениями в базе данных"""
+    """
+    Наблюдатель за изменениями в базе данных
+
+    События изменений получает подпиской на API (CHANGE_EVENTS_URL,
+    utils.change_events), чтобы база не опрашивалась каждым клиентом.
+    Пока подписка недоступна, сам читает журнал change_log
+    (utils.change_log) и раз в PUSH_RETRY_INTERVAL секунд пробует
+    подключиться снова; пропущенные события сервер досылает по номеру
+    последнего полученного. Просроченные задачи проверяются раз в
+    URGENT_CHECK_INTERVAL секунд.
+    """
     
     new_material = Signal(dict)
     status_changed = Signal(dict)
     test_completed = Signal(dict)
     urgent_notification = Signal(str, str)  # title, message
+    changes_received = Signal(list)  # все события пачки (для обновления экранов)
+    push_connected = Signal(bool)  # подписка установлена / потеряна
     
-    def __init__(self):
+    def __init__(self, poll_interval_ms: int = CHANGE_POLL_INTERVAL_MS,
+                 urgent_interval: int = URGENT_CHECK_INTERVAL,
+                 push_url: str = CHANGE_EVENTS_URL):
         super().__init__()
         self.running = True
-        self.last_check = datetime.now()
-        self.known_materials = set()
-        self.known_tests = set()
+        self.poll_interval_ms = poll_interval_ms
+        self.urgent_interval = urgent_interval
+        self.push_url = push_url
+        self.last_seq = None  # Последняя полученная запись change_log
+        self.next_urgent_check = 0.0
+        self.next_push_attempt = 0.0
+        self._push_connection = None
     
     def run(self):
         """Основной цикл наблюдения"""
         while self.running:
             try:
-                self.check_database_changes()
-                self.msleep(5000)  # Проверяем каждые 5 секунд
+                if self.last_seq is None:
+                    # Показываем только изменения, сделанные после запуска
+                    with engine.connect() as conn:
+                        self.last_seq = latest_seq(conn)
+                if self.push_url and time.monotonic() >= self.next_push_attempt:
+                    self.next_push_attempt = time.monotonic() + PUSH_RETRY_INTERVAL
+                    self.listen()
+                if self.running:
+                    self.watch()
             except Exception as e:
                 print(f"Ошибка в DatabaseWatcher: {e}")
                 self.msleep(10000)  # Ждем 10 секунд при ошибке
     
-    def check_database_changes(self):
-        """Проверка изменений в базе данных"""
-        db = SessionLocal()
+    def listen(self):
+        """Получать события подпиской на API, пока соединение не оборвется"""
+        parts = urlsplit(self.push_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(parts.hostname, parts.port, timeout=PUSH_READ_TIMEOUT)
+        query = f"{parts.query}&" if parts.query else ""
+        try:
+            connection.request("GET", f"{parts.path or '/'}?{query}since={self.last_seq}",
+                               headers={"Accept": "text/event-stream"})
+            response = connection.getresponse()
+            if response.status != 200:
+                print(f"Подписка на события недоступна: HTTP {response.status}")
+                connection.close()
+                return
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            return  # API не запущен - работаем опросом
+        
+        self._push_connection = connection
+        self.push_connected.emit(True)
         try:
-            current_time = datetime.now()
-            
-            # Проверяем новые материалы
-            new_materials = db.query(MaterialEntry).filter(
-                MaterialEntry.created_at >= self.last_check,
-                MaterialEntry.is_deleted == False
-            ).all()
-            
-            for material in new_materials:
-                if material.id not in self.known_materials:
-                    self.known_materials.add(material.id)
-                    self.new_material.emit({
-                        'id': material.id,
-                        'grade': material.material_grade,
-                        'batch': material.batch_number,
-                        'supplier': material.supplier_id
-                    })
-            
-            # Проверяем изменения статусов
-            materials_with_status_changes = db.query(MaterialEntry).filter(
-                MaterialEntry.updated_at >= self.last_check,
-                MaterialEntry.is_deleted == False
-            ).all()
-            
-            for material in materials_with_status_changes:
-                if material.id in self.known_materials:
-                    self.status_changed.emit({
-                        'id': material.id,
-                        'grade': material.material_grade,
-                        'status': material.status,
-                        'batch': material.batch_number
-                    })
-            
-            # Проверяем завершенные испытания
-            completed_tests = db.query(LabTest).filter(
-                LabTest.completed_at >= self.last_check,
-                LabTest.completed_at != None
-            ).all()
-            
-            for test in completed_tests:
-                if test.id not in self.known_tests:
-                    self.known_tests.add(test.id)
-                    self.test_completed.emit({
-                        'id': test.id,
-                        'sample_id': test.sample_id,
-                        'passed': test.is_passed,
-                        'test_type': test.test_type_id
-                    })
-            
-            # Проверяем критические ситуации
-            self.check_urgent_situations(db)
-            
-            self.last_check = current_time
-            
+            data_lines = []
+            while self.running:
+                line = response.readline()
+                if not line:
+                    break  # Сервер закрыл поток
+                line = line.decode("utf-8").rstrip("\r\n")
+                if line:
+                    if line.startswith("data:"):
+                        data_lines.append(line[5:].lstrip(" "))
+                    continue
+                # Пустая строка завершает событие (или heartbeat)
+                if data_lines:
+                    self.dispatch_events([json.loads("\n".join(data_lines))])
+                    data_lines = []
+                self.check_urgent_if_due()
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            if self.running:
+                print(f"Подписка на события прервана: {e}")
         finally:
-            db.close()
+            self._push_connection = None
+            connection.close()
+            self.push_connected.emit(False)
+    
+    def watch(self):
+        """Опрос журнала на одном соединении, пока не пора снова пробовать подписку"""
+        with engine.connect() as conn:
+            reader = ChangeLogReader(conn, self.last_seq)
+            while self.running:
+                if self.push_url and time.monotonic() >= self.next_push_attempt:
+                    return
+                self.dispatch_events(reader.poll())
+                self.check_urgent_if_due(conn)
+                conn.rollback()  # Не держим транзакцию чтения между опросами
+                self.msleep(self.poll_interval_ms)
+    
+    def dispatch_events(self, events):
+        """Разослать сигналы по событиям журнала (utils.change_log.load_change_events)"""
+        if not events:
+            return
+        self.last_seq = max(self.last_seq or 0, events[-1]["seq"])
+        self.changes_received.emit(events)
+        
+        new_materials, changed_materials, completed_tests = {}, {}, {}
+        for event in events:
+            data = event["data"]
+            if not data:
+                continue
+            if event["table"] == "material_entries":
+                target = new_materials if event["op"] == OP_INSERT else changed_materials
+                target[data["id"]] = data
+            elif event["table"] == "lab_tests":
+                completed_tests[data["id"]] = data
+        
+        for material in new_materials.values():
+            self.new_material.emit({
+                'id': material['id'],
+                'grade': material['grade'],
+                'batch': material['batch'],
+                'supplier': material['supplier']
+            })
+        
+        for material in changed_materials.values():
+            self.status_changed.emit({
+                'id': material['id'],
+                'grade': material['grade'],
+                'status': material['status'],
+                'batch': material['batch']
+            })
+        
+        for test in completed_tests.values():
+            self.test_completed.emit(test)
+    
+    def check_urgent_if_due(self, conn=None):
+        """Проверить просроченные задачи, если прошло URGENT_CHECK_INTERVAL секунд"""
+        if time.monotonic() < self.next_urgent_check:
+            return
+        self.next_urgent_check = time.monotonic() + self.urgent_interval
+        if conn is not None:
+            self.check_urgent_situations(conn)
+            return
+        with engine.connect() as conn:
+            self.check_urgent_situations(conn)
     
-    def check_urgent_situations(self, db):
+    def check_urgent_situations(self, conn):
         """Проверка критических ситуаций"""
         # Материалы, ожидающие проверки более 3 дней
-        three_days_ago = datetime.now() - timedelta(days=3)
-        overdue_materials = db.query(MaterialEntry).filter(
-            MaterialEntry.status == MaterialStatus.QC_CHECK_PENDING.value,
-            MaterialEntry.created_at <= three_days_ago,
-            MaterialEntry.is_deleted == False
-        ).count()
+        three_days_ago = datetime.utcnow() - timedelta(days=3)
+        overdue_materials = conn.execute(
+            text("SELECT COUNT(*) FROM material_entries "
+                 "WHERE status = :status AND created_at <= :cutoff AND is_deleted = 0"),
+            {"status": MaterialStatus.QC_CHECK_PENDING.value, "cutoff": three_days_ago}
+        ).scalar()
         
         if overdue_materials > 0:
             self.urgent_notification.emit(
@@ -117,10 +202,11 @@ class DatabaseWatcher(QThread):
             )
         
         # Испытания, превысившие срок
-        overdue_tests = db.query(LabTest).filter(
-            LabTest.started_at <= three_days_ago,
-            LabTest.completed_at == None
-        ).count()
+        overdue_tests = conn.execute(
+            text("SELECT COUNT(*) FROM lab_tests "
+                 "WHERE performed_at <= :cutoff AND completed_at IS NULL AND is_deleted = 0"),
+            {"cutoff": three_days_ago}
+        ).scalar()
         
         if overdue_tests > 0:
             self.urgent_notification.emit(
@@ -131,6 +217,22 @@ class DatabaseWatcher(QThread):
     def stop(self):
         """Остановить наблюдение"""
         self.running = False
+        connection = self._push_connection
+        if connection is not None and connection.sock is not None:
+            try:
+                # Прерываем ожидающее чтение подписки
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+_database_watcher = None
+
+def get_database_watcher() -> DatabaseWatcher:
+    """Общий наблюдатель для панели уведомлений и дашборда (запускается вызывающим)"""
+    global _database_watcher
+    if _database_watcher is None:
+        _database_watcher = DatabaseWatcher()
+    return _database_watcher
 
 class NotificationWidget(QFrame):
     """Виджет уведомления в панели"""
@@ -226,7 +328,7 @@ class RealTimeNotificationPanel(QWidget):
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.watcher = DatabaseWatcher()
+        self.watcher = get_database_watcher()
         self.init_ui()
         self.setup_connections()
         self.start_watching()
@@ -12,6 +12,15 @@ from datetime import datetime, timedelta
 from ui.themes import theme_manager
 from ui.icons.icon_provider import IconProvider
 from ui.styles import apply_button_style
+from utils.material_rollup import get_status_totals
+
+try:
+    from ui.components.real_time_notifications import get_database_watcher
+except ImportError:
+    get_database_watcher = None
+
+# Задержка обновления после события изменений: пачка изменений - одно обновление
+CHANGE_REFRESH_DELAY_MS = 1000
 
 try:
     from ui.components.charts import MetricsPanel, BarChart, DonutChart
@@ -300,17 +309,45 @@ class Dashboard(QWidget):
         return layout
     
     def setup_timer(self):
-        """Настройка таймера для автообновления"""
-        self.update_timer = QTimer()
+        """
+        Настройка автообновления
+
+        Метрики обновляются по событиям изменений наблюдателя; опрос раз
+        в 30 секунд работает, только пока подписка на события недоступна.
+        """
+        self.update_timer = QTimer(self)
         self.update_timer.timeout.connect(self.load_metrics)
         self.update_timer.start(30000)  # Обновление каждые 30 секунд
+        
+        self.change_refresh_timer = QTimer(self)
+        self.change_refresh_timer.setSingleShot(True)
+        self.change_refresh_timer.timeout.connect(self.load_metrics)
+        
+        if get_database_watcher:
+            watcher = get_database_watcher()
+            watcher.changes_received.connect(self.on_changes_received)
+            watcher.push_connected.connect(self.on_push_connected)
+            watcher.start()
+    
+    def on_changes_received(self, events):
+        """Отложенное обновление метрик после изменений в базе"""
+        if not self.change_refresh_timer.isActive():
+            self.change_refresh_timer.start(CHANGE_REFRESH_DELAY_MS)
+    
+    def on_push_connected(self, connected):
+        """Опрос по таймеру нужен, только пока подписка на события недоступна"""
+        if connected:
+            self.update_timer.stop()
+        else:
+            self.update_timer.start(30000)
     
     def load_metrics(self):
         """Загрузка метрик из базы данных"""
         try:
             with SessionLocal() as session:
-                # Общие метрики
-                total_materials = session.query(MaterialEntry).count()
+                # Общие метрики (из ежедневной сводки вместо полного сканирования)
+                status_totals = get_status_totals(session)
+                total_materials = sum(status_totals.values())
                 self.metric_cards['total_materials'].update_value(str(total_materials))
                 
                 active_samples = session.query(Sample).filter(
@@ -333,15 +370,12 @@ class Dashboard(QWidget):
                 
                 # Метрики по статусам
                 for status in ['RECEIVED', 'QC_CHECK_PENDING', 'QC_CHECKED', 'TESTING', 'APPROVED']:
-                    count = session.query(MaterialEntry).filter(MaterialEntry.status == status).count()
+                    count = status_totals.get(MaterialStatus[status].value, 0)
                     if f'status_{status}' in self.metric_cards:
                         self.metric_cards[f'status_{status}'].update_value(str(count))
                 
                 # Активность за сегодня
-                today_materials = session.query(MaterialEntry).filter(
-                    MaterialEntry.created_at >= today_start
-                ).count()
-                self.metric_cards['today_materials'].update_value(str(today_materials))
+                self.metric_cards['today_materials'].update_value(str(today_entries))
                 
                 today_samples = session.query(Sample).filter(
                     Sample.created_at >= today_start
@@ -5,7 +5,6 @@ from PySide6.QtCore import Qt, QDate
 from PySide6.QtGui import QFont
 from database.connection import SessionLocal
 from models.models import User
-from sqlalchemy import text
 from datetime import datetime, timedelta
 
 class AuditLogDialog(QDialog):
@@ -15,6 +14,11 @@ class AuditLogDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("Журнал действий пользователей")
         self.setMinimumSize(900, 600)
+        self.current_filters = {}
+        self.current_order = "relevance"
+        self.next_cursor = None
+        self.current_archive = None
+        self.pending_archives = []
         self.init_ui()
         self.load_audit_log()
     
@@ -52,8 +56,16 @@ class AuditLogDialog(QDialog):
         filter_layout.addWidget(QLabel("Поиск:"))
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Поиск по действию или деталям...")
+        self.search_input.returnPressed.connect(self.load_audit_log)
         filter_layout.addWidget(self.search_input)
         
+        # Порядок результатов поиска
+        self.order_filter = QComboBox()
+        self.order_filter.addItem("По релевантности", "relevance")
+        self.order_filter.addItem("По времени", "time")
+        self.order_filter.setToolTip("Порядок записей при поиске")
+        filter_layout.addWidget(self.order_filter)
+        
         # Кнопка фильтрации
         self.filter_btn = QPushButton("Фильтровать")
         self.filter_btn.clicked.connect(self.load_audit_log)
@@ -90,6 +102,11 @@ class AuditLogDialog(QDialog):
         self.refresh_btn.clicked.connect(self.load_audit_log)
         button_layout.addWidget(self.refresh_btn)
         
+        self.more_btn = QPushButton("Показать еще")
+        self.more_btn.setEnabled(False)
+        self.more_btn.clicked.connect(self.load_next_page)
+        button_layout.addWidget(self.more_btn)
+        
         self.export_btn = QPushButton("Экспорт в Excel")
         self.export_btn.clicked.connect(self.export_to_excel)
         button_layout.addWidget(self.export_btn)
@@ -113,76 +130,97 @@ class AuditLogDialog(QDialog):
             db.close()
     
     def load_audit_log(self):
-        """Загрузка журнала аудита"""
-        db = SessionLocal()
+        """Загрузка журнала аудита (первая страница)"""
         try:
             # Создаем таблицу audit_log если её нет
             from database.init_db import create_audit_log_table
             from database.connection import engine
             create_audit_log_table(engine)
             
-            # Формируем запрос с фильтрами
-            date_from = self.date_from.date().toPython()
-            date_to = self.date_to.date().toPython()
-            date_to = datetime.combine(date_to, datetime.max.time())  # До конца дня
+            # Дожидаемся записи действий, еще стоящих в очереди аудита
+            from utils.audit import flush_audit_log
+            flush_audit_log(timeout=1.0)
             
-            query = """
-                SELECT a.timestamp, u.full_name, u.username, a.action, a.details, a.id
-                FROM audit_log a
-                LEFT JOIN users u ON a.user_id = u.id
-                WHERE a.timestamp BETWEEN :date_from AND :date_to
-            """
-            
-            params = {
-                'date_from': date_from,
-                'date_to': date_to
+            # Фильтры фиксируются до следующего нажатия "Фильтровать"
+            date_to = self.date_to.date().toPython()
+            self.current_filters = {
+                'search': self.search_input.text().strip() or None,
+                'date_from': self.date_from.date().toPython(),
+                'date_to': datetime.combine(date_to, datetime.max.time()),  # До конца дня
+                'user_id': self.user_filter.currentData(),
             }
+            self.current_order = self.order_filter.currentData()
+            self.next_cursor = None
             
-            # Фильтр по пользователю
-            selected_user_id = self.user_filter.currentData()
-            if selected_user_id:
-                query += " AND a.user_id = :user_id"
-                params['user_id'] = selected_user_id
-            
-            # Фильтр по тексту
-            search_text = self.search_input.text().strip()
-            if search_text:
-                query += " AND (a.action LIKE :search OR a.details LIKE :search)"
-                params['search'] = f"%{search_text}%"
+            # После рабочей базы показываются архивы месяцев, попадающих в период
+            from utils.audit_archive import archive_months_in_range
+            self.current_archive = None
+            self.pending_archives = archive_months_in_range(
+                self.current_filters['date_from'], self.current_filters['date_to']
+            )
             
-            query += " ORDER BY a.timestamp DESC LIMIT 1000"
-            
-            result = db.execute(text(query), params).fetchall()
+            self.audit_table.setRowCount(0)
+            self.load_next_page()
+        except Exception as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить журнал аудита:\n{str(e)}")
+    
+    def load_next_page(self):
+        """Догрузка следующей страницы журнала (по ключу последней записи)"""
+        from utils.audit import fetch_audit_page
+        from utils.audit_archive import fetch_archive_page
+        
+        try:
+            if self.current_archive:
+                entries, self.next_cursor = fetch_archive_page(
+                    self.current_archive, cursor=self.next_cursor, **self.current_filters
+                )
+            else:
+                entries, self.next_cursor = fetch_audit_page(
+                    cursor=self.next_cursor, order=self.current_order, **self.current_filters
+                )
+        except Exception as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить журнал аудита:\n{str(e)}")
+            return
+        
+        source = f"архив {self.current_archive}" if self.current_archive else None
+        has_more = self.next_cursor is not None
+        if not has_more and self.pending_archives:
+            # Следующая страница - из следующего архива
+            self.current_archive = self.pending_archives.pop(0)
+            has_more = True
+        
+        start_row = self.audit_table.rowCount()
+        self.audit_table.setRowCount(start_row + len(entries))
+        
+        for offset, entry in enumerate(entries):
+            row_idx = start_row + offset
+            timestamp = entry['timestamp']
             
-            # Заполняем таблицу
-            self.audit_table.setRowCount(len(result))
+            # Форматируем время
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
             
-            for row_idx, record in enumerate(result):
-                timestamp, full_name, username, action, details, log_id = record
-                
-                # Форматируем время
-                if isinstance(timestamp, str):
-                    timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                
-                # Заполняем ячейки
-                self.audit_table.setItem(row_idx, 0, QTableWidgetItem(
-                    timestamp.strftime('%d.%m.%Y %H:%M:%S') if timestamp else ""
-                ))
-                
-                user_display = full_name or username or "Неизвестен"
-                self.audit_table.setItem(row_idx, 1, QTableWidgetItem(user_display))
-                
-                self.audit_table.setItem(row_idx, 2, QTableWidgetItem(action or ""))
-                self.audit_table.setItem(row_idx, 3, QTableWidgetItem(details or ""))
-                self.audit_table.setItem(row_idx, 4, QTableWidgetItem(str(log_id)))
+            # Заполняем ячейки
+            self.audit_table.setItem(row_idx, 0, QTableWidgetItem(
+                timestamp.strftime('%d.%m.%Y %H:%M:%S') if timestamp else ""
+            ))
+            self.audit_table.setItem(row_idx, 1, QTableWidgetItem(entry['user_name'] or "Неизвестен"))
+            self.audit_table.setItem(row_idx, 2, QTableWidgetItem(entry['action'] or ""))
             
-            # Обновляем статистику
-            self.stats_label.setText(f"Показано записей: {len(result)} (максимум 1000)")
+            # При поиске показываем фрагмент с найденными словами («...»)
+            details_item = QTableWidgetItem(entry['snippet'] or entry['details'] or "")
+            details_item.setToolTip(entry['details'] or "")
+            self.audit_table.setItem(row_idx, 3, details_item)
             
-        except Exception as e:
-            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить журнал аудита:\n{str(e)}")
-        finally:
-            db.close()
+            self.audit_table.setItem(row_idx, 4, QTableWidgetItem(str(entry['id'])))
+        
+        # Обновляем статистику
+        ranked = self.current_filters['search'] and self.current_order == "relevance" and not source
+        order = "по релевантности" if ranked else "по времени"
+        more = ", есть еще записи" if has_more else ""
+        source = f", {source}" if source else ""
+        self.stats_label.setText(f"Показано записей: {self.audit_table.rowCount()} ({order}{source}{more})")
+        self.more_btn.setEnabled(has_more)
     
     def export_to_excel(self):
         """Экспорт журнала в Excel"""
@@ -6,8 +6,8 @@ from PySide6.QtGui import QFont
 from database.connection import SessionLocal
 from models.models import MaterialEntry, MaterialStatus, Supplier, User
 from utils.status_manager import StatusManager
-from utils.telegram_bot import (send_qc_approval_notification, send_qc_rejection_notification,
-                               send_lab_test_failure_notification, send_final_acceptance_notification)
+from utils.notification_outbox import (enqueue_qc_approval, enqueue_qc_rejection,
+                                      enqueue_lab_test_failure, enqueue_final_acceptance)
 from utils.material_utils import get_status_display_name
 from datetime import datetime
 
@@ -284,7 +284,6 @@ class StatusChangeDialog(QDialog):
                 prev_status = material.status
                 material.status = selected_status
                 material.last_status_change = datetime.now()
-                material.last_status_change_by_id = self.user.id
                 
                 # Сохраняем комментарий
                 if comment:
@@ -348,34 +347,13 @@ class StatusChangeDialog(QDialog):
                             f"Результаты испытаний: {lab_issues_text}"
                         )
                 
+                # Уведомления записываются в outbox в той же транзакции, что и смена
+                # статуса; отправляет их фоновый диспетчер (utils.notification_dispatcher)
+                self.enqueue_notifications(db, material, prev_status, selected_status, comment)
+                
                 # Сохраняем изменения
                 db.commit()
                 
-                # Отправляем уведомления (если настроены)
-                try:
-                    # Обрабатываем ключевые переходы статусов
-                    if prev_status == MaterialStatus.PENDING_QC.value and selected_status == MaterialStatus.QC_PASSED.value:
-                        # Уведомление об успешной проверке ОТК
-                        send_qc_approval_notification(material)
-                    
-                    elif prev_status == MaterialStatus.PENDING_QC.value and selected_status == MaterialStatus.QC_FAILED.value:
-                        # Уведомление о непрохождении проверки ОТК
-                        send_qc_rejection_notification(material, comment)
-                    
-                    elif prev_status == MaterialStatus.LAB_TESTING.value:
-                        # Проверяем есть ли замечания лаборатории в комментарии
-                        comment = self.comment_edit.toPlainText().strip().lower()
-                        if any(word in comment for word in ['брак', 'не соответств', 'отклон', 'дефект']):
-                            # Брак лаборатории
-                            send_lab_test_failure_notification(material, comment)
-                    
-                    elif selected_status == MaterialStatus.READY_FOR_USE.value:
-                        # Финальное одобрение
-                        send_final_acceptance_notification(material)
-                        
-                except Exception as e:
-                    print(f"Ошибка отправки уведомления: {e}")
-                
                 QMessageBox.information(
                     self, 
                     "Статус изменен", 
@@ -388,6 +366,32 @@ class StatusChangeDialog(QDialog):
             finally:
                 db.close()
     
+    def enqueue_notifications(self, db, material, prev_status, new_status, comment):
+        """Поставить уведомления о ключевых переходах статусов в очередь (если настроены)"""
+        try:
+            if prev_status == MaterialStatus.PENDING_QC.value and new_status == MaterialStatus.QC_PASSED.value:
+                # Уведомление об успешной проверке ОТК
+                enqueue_qc_approval(db, material, self.user.full_name)
+            
+            elif prev_status == MaterialStatus.PENDING_QC.value and new_status == MaterialStatus.QC_FAILED.value:
+                # Уведомление о непрохождении проверки ОТК
+                enqueue_qc_rejection(db, material, self.user.full_name, comment)
+            
+            elif prev_status == MaterialStatus.LAB_TESTING.value:
+                # Проверяем есть ли замечания лаборатории в комментарии
+                lowered = comment.lower()
+                if any(word in lowered for word in ['брак', 'не соответств', 'отклон', 'дефект']):
+                    # Брак лаборатории
+                    enqueue_lab_test_failure(db, material, self.user.full_name, comment)
+            
+            elif new_status == MaterialStatus.READY_FOR_USE.value:
+                # Финальное одобрение
+                enqueue_final_acceptance(db, material, self.user.full_name)
+        
+        except Exception as e:
+            # Смена статуса важнее уведомления
+            print(f"Ошибка подготовки уведомления: {e}")
+    
     def exec(self):
         """Запуск диалога с проверкой доступности материала"""
         if not self.material:
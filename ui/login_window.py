@@ -5,7 +5,7 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                              QMessageBox, QFrame, QComboBox, QSizePolicy)
 from PySide6.QtGui import QFont, QIcon, QPixmap
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThread, Signal
 
 from database.connection import SessionLocal
 from utils.auth import authenticate_user
@@ -18,10 +18,46 @@ from ui.styles import apply_button_style, apply_input_style, apply_combobox_styl
 # Настройка логирования для входа
 login_logger = logging.getLogger('login')
 
+class AuthWorker(QThread):
+    """Проверка пароля (bcrypt) в отдельном потоке, чтобы не блокировать окно"""
+    
+    finished_auth = Signal(object, str)  # user или None, текст ошибки
+    
+    def __init__(self, username, password):
+        super().__init__()
+        self.username = username
+        self.password = password
+    
+    def run(self):
+        db = SessionLocal()
+        try:
+            login_logger.info(f"Подключение к базе данных установлено")
+            
+            # Сначала проверим, есть ли пользователь в базе
+            user_exists = db.query(User).filter(User.username == self.username).first()
+            if not user_exists:
+                login_logger.warning(f"Пользователь '{self.username}' не найден в базе данных")
+            else:
+                login_logger.info(f"Пользователь '{self.username}' найден. Роль: {user_exists.role}, Активен: {user_exists.is_active}")
+            
+            user = authenticate_user(db, self.username, self.password)
+            if user:
+                # Объект передается в поток интерфейса отдельно от сессии
+                db.expunge(user)
+            self.finished_auth.emit(user, "")
+        except Exception as e:
+            login_logger.error(f"Исключение при входе: {str(e)}", exc_info=True)
+            self.finished_auth.emit(None, str(e))
+        finally:
+            db.close()
+            login_logger.info("Подключение к базе данных закрыто")
+
 class LoginWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         
+        self.auth_worker = None
+        
         # Window properties с гибкими размерами
         self.setWindowTitle("ППСД - Вход в систему")
         self.setMinimumSize(450, 350)
@@ -160,6 +196,9 @@ class LoginWindow(QMainWindow):
 
     def login(self):
         """Handle login button click"""
+        if self.auth_worker is not None and self.auth_worker.isRunning():
+            return
+        
         username = self.username_input.text().strip()
         password = self.password_input.text()
         
@@ -173,23 +212,30 @@ class LoginWindow(QMainWindow):
             notification_manager.show_warning(error_msg, parent_widget=self)
             return
         
-        # Authenticate user
-        db = SessionLocal()
+        # Authenticate user in background thread
+        self.set_login_in_progress(True)
+        self.auth_worker = AuthWorker(username, password)
+        self.auth_worker.finished_auth.connect(self.on_auth_finished)
+        self.auth_worker.start()
+    
+    def set_login_in_progress(self, in_progress):
+        """Блокировка формы на время проверки пароля"""
+        self.login_button.setText("Проверка..." if in_progress else "Войти")
+        for widget in (self.login_button, self.test_login_button, self.username_input, self.password_input):
+            widget.setEnabled(not in_progress)
+    
+    def on_auth_finished(self, user, error):
+        """Результат проверки пароля из AuthWorker"""
+        username = self.auth_worker.username
+        self.set_login_in_progress(False)
+        
+        if error:
+            error_msg = f"Ошибка при входе в систему: {error}"
+            print(f"[LOGIN] Критическая ошибка: {error}")
+            notification_manager.show_error(error_msg, parent_widget=self)
+            return
+        
         try:
-            login_logger.info(f"Подключение к базе данных установлено")
-            print(f"[LOGIN] Подключение к базе данных установлено")
-            
-            # Сначала проверим, есть ли пользователь в базе
-            user_exists = db.query(User).filter(User.username == username).first()
-            if not user_exists:
-                login_logger.warning(f"Пользователь '{username}' не найден в базе данных")
-                print(f"[LOGIN] Пользователь '{username}' не найден в базе данных")
-            else:
-                login_logger.info(f"Пользователь '{username}' найден. Роль: {user_exists.role}, Активен: {user_exists.is_active}")
-                print(f"[LOGIN] Пользователь '{username}' найден. Роль: {user_exists.role}, Активен: {user_exists.is_active}")
-            
-            user = authenticate_user(db, username, password)
-            
             if user:
                 # Login successful
                 success_msg = f"Добро пожаловать, {user.full_name}!"
@@ -217,10 +263,6 @@ class LoginWindow(QMainWindow):
             login_logger.error(f"Исключение при входе: {str(e)}", exc_info=True)
             print(f"[LOGIN] Критическая ошибка: {str(e)}")
             notification_manager.show_error(error_msg, parent_widget=self)
-        finally:
-            db.close()
-            login_logger.info("Подключение к базе данных закрыто")
-            print(f"[LOGIN] Подключение к базе данных закрыто")
 
     def test_login(self):
         """Войти как тестовый пользователь (без пароля) с выбранной ролью"""
@@ -7,7 +7,7 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PySide6.QtGui import QFont, QIcon, QAction
 from PySide6.QtCore import Qt, QSize
 
-from database.connection import SessionLocal
+from database.connection import SessionLocal, set_session_user
 from models.models import UserRole
 from ui.tabs.warehouse_tab import WarehouseTab
 from ui.tabs.qc_tab import QCTab
@@ -37,6 +37,8 @@ class MainWindow(QMainWindow):
         self.setStatusBar(self.status_bar)
         
         self.user = user
+        # Переходы статусов в сессиях этого окна записываются от его имени
+        set_session_user(user.id)
         self.init_ui()
         
     def init_ui(self):
@@ -278,6 +280,8 @@ class MainWindow(QMainWindow):
                                      QMessageBox.StandardButton.No)
         
         if reply == QMessageBox.StandardButton.Yes:
+            set_session_user(None)
+            
             # Import here to avoid circular imports
             from ui.login_window import LoginWindow
             
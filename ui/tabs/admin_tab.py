@@ -6,7 +6,6 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushB
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QFont
 
-from database.connection import SessionLocal
 from models.models import User, UserRole
 from utils.auth import create_user, update_user
 from sqlalchemy import desc
@@ -14,12 +13,15 @@ from ui.themes import theme_manager
 from ui.styles import (apply_button_style, apply_input_style, apply_combobox_style, 
                        apply_table_style, refresh_table_style)
 from ui.icons.icon_provider import IconProvider
+from ui.components.background_loader import BackgroundLoader, LoadingIndicator
 
 class AdminTab(QWidget):
     def __init__(self, user, parent=None):
         super().__init__(parent)
         self.user = user
         self.parent = parent
+        # Загрузчик таблицы пользователей (запрос в фоновом потоке)
+        self.users_loader = BackgroundLoader(self)
         self.init_ui()
     
     def refresh_styles(self):
@@ -163,6 +165,11 @@ class AdminTab(QWidget):
         self.users_table.cellDoubleClicked.connect(self.show_edit_user_dialog)
         
         table_layout.addWidget(self.users_table)
+
+        # Индикатор фоновой загрузки
+        self.users_loading_indicator = LoadingIndicator()
+        self.users_loading_indicator.attach(self.users_loader)
+        table_layout.addWidget(self.users_loading_indicator)
         
         # Add table status row
         status_layout = QHBoxLayout()
@@ -308,51 +315,56 @@ class AdminTab(QWidget):
         layout.addWidget(table_container, 1)  # 1 = stretch factor
     
     def load_users(self):
-        """Load users from database"""
+        """Load users from database (в фоновом потоке)"""
         self.users_status_label.setText("Загрузка данных...")
-        db = SessionLocal()
-        try:
-            users = db.query(User).order_by(User.username).all()
-            
-            # Clear table
-            self.users_table.setRowCount(0)
-            
-            # Add users to table
-            for row, user in enumerate(users):
-                self.users_table.insertRow(row)
-                
-                # Set data
-                self.users_table.setItem(row, 0, QTableWidgetItem(str(user.id)))
-                self.users_table.setItem(row, 1, QTableWidgetItem(user.username))
-                self.users_table.setItem(row, 2, QTableWidgetItem(user.full_name))
-                
-                # Role
-                role_display = {
-                    UserRole.ADMIN.value: "Администратор",
-                    UserRole.WAREHOUSE.value: "Кладовщик",
-                    UserRole.QC.value: "Сотрудник ОТК",
-                    UserRole.LAB.value: "Инженер ЦЗЛ",
-                    UserRole.PRODUCTION.value: "Производство"
-                }.get(user.role, user.role)
-                self.users_table.setItem(row, 3, QTableWidgetItem(role_display))
-                
+        self.users_loader.load(self.fetch_users, on_result=self.fill_users_table,
+                               on_error=self.on_users_load_failed)
+    
+    def fetch_users(self, db):
+        """
+        Строки таблицы пользователей (выполняется в рабочем потоке)
+        
+        Returns:
+            list: Кортежи значений колонок таблицы
+        """
+        role_display = {
+            UserRole.ADMIN.value: "Администратор",
+            UserRole.WAREHOUSE.value: "Кладовщик",
+            UserRole.QC.value: "Сотрудник ОТК",
+            UserRole.LAB.value: "Инженер ЦЗЛ",
+            UserRole.PRODUCTION.value: "Производство"
+        }
+        return [
+            (
+                str(user.id),
+                user.username,
+                user.full_name,
+                role_display.get(user.role, user.role),
                 # Active status
-                self.users_table.setItem(row, 4, QTableWidgetItem("Да" if user.is_active else "Нет"))
-                
+                "Да" if user.is_active else "Нет",
                 # Permissions
-                self.users_table.setItem(row, 5, QTableWidgetItem("Да" if user.can_edit else "Нет"))
-                self.users_table.setItem(row, 6, QTableWidgetItem("Да" if user.can_delete else "Нет"))
-            
-            # Update status
-            self.parent.status_bar.showMessage(f"Загружено {len(users)} пользователей")
-            self.users_status_label.setText("Данные загружены")
-            self.users_count_label.setText(f"Пользователей: {len(users)}")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке пользователей: {str(e)}")
-            self.users_status_label.setText("Ошибка загрузки")
-        finally:
-            db.close()
+                "Да" if user.can_edit else "Нет",
+                "Да" if user.can_delete else "Нет",
+            )
+            for user in db.query(User).order_by(User.username).all()
+        ]
+    
+    def fill_users_table(self, rows):
+        """Заполнить таблицу пользователей загруженными строками"""
+        self.users_table.setRowCount(0)
+        for row, values in enumerate(rows):
+            self.users_table.insertRow(row)
+            for col, value in enumerate(values):
+                self.users_table.setItem(row, col, QTableWidgetItem(value))
+        
+        # Update status
+        self.parent.status_bar.showMessage(f"Загружено {len(rows)} пользователей")
+        self.users_status_label.setText("Данные загружены")
+        self.users_count_label.setText(f"Пользователей: {len(rows)}")
+    
+    def on_users_load_failed(self, message):
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке пользователей: {message}")
+        self.users_status_label.setText("Ошибка загрузки")
     
     def filter_users(self):
         """Filter users by search text"""
@@ -7,12 +7,13 @@ from PySide6.QtCore import Qt, QDate, QDateTime
 from PySide6.QtGui import QFont, QColor, QBrush, QIcon, QPixmap, QTextDocument
 
 from database.connection import SessionLocal
-from models.models import MaterialEntry, SampleRequest, LabTest, MaterialStatus, TestType, Supplier, User, QCCheck, Sample, LabTestSample
+from models.models import MaterialEntry, SampleRequest, LabTest, MaterialStatus, TestType, Supplier, QCCheck, Sample, LabTestSample
 import os
 import datetime
 import shutil
 from ui.tabs.sample_management_dialog import SampleManagementDialog
 from ui.styles import apply_table_style
+from database.queries import material_sample_requests, material_lab_tests, material_samples, linked_sample_ids
 
 class MaterialDetailsDialog(QDialog):
     """Dialog to show details of a material pending lab check"""
@@ -420,10 +421,7 @@ class MaterialDetailsDialog(QDialog):
                 widget.deleteLater()
         
         # Get sample requests
-        requests = db.query(SampleRequest).filter(
-            SampleRequest.material_entry_id == self.material_id,
-            SampleRequest.is_deleted == False
-        ).order_by(SampleRequest.created_at.desc()).all()
+        requests = material_sample_requests(db, self.material_id)
         
         if not requests:
             self.samples_layout.addWidget(QLabel("Нет запросов на пробы"))
@@ -461,7 +459,7 @@ class MaterialDetailsDialog(QDialog):
             request_layout.addRow("Статус:", status_label)
             
             # Created by
-            creator = db.query(User).filter(User.id == request.created_by_id).first()
+            creator = request.created_by_user
             creator_name = creator.full_name if creator else "Неизвестно"
             request_layout.addRow("Создал:", QLabel(creator_name))
             
@@ -495,10 +493,7 @@ class MaterialDetailsDialog(QDialog):
                 widget.deleteLater()
         
         # Get test results
-        tests = db.query(LabTest).filter(
-            LabTest.material_entry_id == self.material_id,
-            LabTest.is_deleted == False
-        ).order_by(LabTest.performed_at.desc()).all()
+        tests = material_lab_tests(db, self.material_id)
         
         if not tests:
             self.tests_layout.addWidget(QLabel("Нет результатов испытаний"))
@@ -513,7 +508,7 @@ class MaterialDetailsDialog(QDialog):
             # Test type
             test_type = ""
             if test.test_type_id:
-                test_type_obj = db.query(TestType).filter(TestType.id == test.test_type_id).first()
+                test_type_obj = test.test_type_ref
                 if test_type_obj:
                     test_type = test_type_obj.name
             else:
@@ -537,7 +532,7 @@ class MaterialDetailsDialog(QDialog):
             test_layout.addRow("Статус:", QLabel(status))
             
             # Performed by
-            performer = db.query(User).filter(User.id == test.performed_by_id).first()
+            performer = test.performed_by_user
             performer_name = performer.full_name if performer else "Неизвестно"
             test_layout.addRow("Выполнил:", QLabel(performer_name))
             
@@ -1542,70 +1537,56 @@ class TestResultDialog(QDialog):
             # Очищаем таблицу
             self.samples_table.setRowCount(0)
             
-            # Получаем все заявки на пробы для данного материала
-            sample_requests = db.query(SampleRequest).filter(
-                SampleRequest.material_entry_id == self.material_id,
-                SampleRequest.is_deleted == False
-            ).all()
+            # Образцы по всем заявкам материала (только подготовленные) одним запросом
+            samples = material_samples(db, self.material_id, ["prepared", "testing", "tested"])
+            
+            # Если редактируем существующий тест, отмечаем уже связанные образцы
+            linked_ids = linked_sample_ids(db, self.test_id) if self.test_id else set()
             
-            # Получаем все образцы для этих заявок
             row = 0
-            for request in sample_requests:
-                samples = db.query(Sample).filter(
-                    Sample.sample_request_id == request.id,
-                    Sample.is_deleted == False,
-                    Sample.status.in_(["prepared", "testing", "tested"])  # Только подготовленные образцы
-                ).all()
+            for sample in samples:
+                self.samples_table.insertRow(row)
+                
+                # Чекбокс для выбора
+                checkbox = QCheckBox()
+                checkbox.setData(Qt.UserRole, sample.id)
+                
+                if sample.id in linked_ids:
+                    checkbox.setChecked(True)
+                
+                self.samples_table.setCellWidget(row, 0, checkbox)
+                
+                # Код образца
+                self.samples_table.setItem(row, 1, QTableWidgetItem(sample.sample_code))
+                
+                # Тип образца
+                self.samples_table.setItem(row, 2, QTableWidgetItem(sample.sample_type))
+                
+                # Размеры
+                sizes = []
+                if sample.length:
+                    sizes.append(f"L={sample.length}")
+                if sample.width:
+                    sizes.append(f"W={sample.width}")
+                if sample.thickness:
+                    sizes.append(f"T={sample.thickness}")
+                if sample.diameter:
+                    sizes.append(f"Ø={sample.diameter}")
+                
+                self.samples_table.setItem(row, 3, QTableWidgetItem(" × ".join(sizes)))
+                
+                # Статус
+                status_map = {
+                    "created": "Создан",
+                    "prepared": "Подготовлен",
+                    "testing": "Испытывается",
+                    "tested": "Испытан",
+                    "archived": "В архиве"
+                }
+                self.samples_table.setItem(row, 4, QTableWidgetItem(status_map.get(sample.status, sample.status)))
+                
+                row += 1
                 
-                for sample in samples:
-                    self.samples_table.insertRow(row)
-                    
-                    # Чекбокс для выбора
-                    checkbox = QCheckBox()
-                    checkbox.setData(Qt.UserRole, sample.id)
-                    
-                    # Если редактируем существующий тест, отмечаем уже связанные образцы
-                    if self.test_id:
-                        existing_link = db.query(LabTestSample).filter(
-                            LabTestSample.lab_test_id == self.test_id,
-                            LabTestSample.sample_id == sample.id
-                        ).first()
-                        if existing_link:
-                            checkbox.setChecked(True)
-                    
-                    self.samples_table.setCellWidget(row, 0, checkbox)
-                    
-                    # Код образца
-                    self.samples_table.setItem(row, 1, QTableWidgetItem(sample.sample_code))
-                    
-                    # Тип образца
-                    self.samples_table.setItem(row, 2, QTableWidgetItem(sample.sample_type))
-                    
-                    # Размеры
-                    sizes = []
-                    if sample.length:
-                        sizes.append(f"L={sample.length}")
-                    if sample.width:
-                        sizes.append(f"W={sample.width}")
-                    if sample.thickness:
-                        sizes.append(f"T={sample.thickness}")
-                    if sample.diameter:
-                        sizes.append(f"Ø={sample.diameter}")
-                    
-                    self.samples_table.setItem(row, 3, QTableWidgetItem(" × ".join(sizes)))
-                    
-                    # Статус
-                    status_map = {
-                        "created": "Создан",
-                        "prepared": "Подготовлен",
-                        "testing": "Испытывается",
-                        "tested": "Испытан",
-                        "archived": "В архиве"
-                    }
-                    self.samples_table.setItem(row, 4, QTableWidgetItem(status_map.get(sample.status, sample.status)))
-                    
-                    row += 1
-                    
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке образцов: {str(e)}")
         finally:
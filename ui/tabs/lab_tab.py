@@ -4,12 +4,12 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushB
                              QGroupBox, QCheckBox, QTabWidget, QDialog, QDialogButtonBox,
                              QTextEdit, QDateTimeEdit, QInputDialog, QScrollArea,
                              QSplitter, QFrame)
-from PySide6.QtCore import Qt, QDateTime
+from PySide6.QtCore import Qt, QDateTime, QTimer
 from PySide6.QtGui import QFont, QColor, QBrush, QIcon
 
 from database.connection import SessionLocal
 from models.models import MaterialEntry, QCCheck, MaterialStatus, Supplier, SampleRequest, LabTest, User, TestType
-from sqlalchemy import desc
+from sqlalchemy import desc, func, or_
 import datetime
 import os
 import shutil
@@ -17,13 +17,67 @@ from ui.icons.icon_provider import IconProvider
 from ui.tabs.lab_dialogs import MaterialDetailsDialog, SampleRequestDialog, TestResultDialog
 from ui.tabs.lab_test_detail import LabTestDetailDialog
 from ui.tabs.sample_management_dialog import SampleManagementDialog
+from ui.components.lazy_table import LazyTableModel, LazyTableView, GridRow
+from ui.components.background_loader import BackgroundLoader, LoadingIndicator
+from database.queries import (keyset_page, materials_query, materials_count_query, changes_since,
+                              sample_requests_query, lab_tests_query)
 from utils.material_utils import clean_material_grade, get_material_type_display, get_status_display_name
 
+PENDING_MATERIALS_HEADERS = ["Марка материала", "Тип", "Размер", "Плавка", "Поставщик", "Статус", ""]
+
+# Материалы в процессе лабораторной проверки
+LAB_STATUSES = [
+    MaterialStatus.LAB_CHECK_PENDING.value,
+    MaterialStatus.SAMPLES_REQUESTED.value,
+    MaterialStatus.SAMPLES_COLLECTED.value,
+    MaterialStatus.TESTING.value,
+    MaterialStatus.TESTING_COMPLETED.value
+]
+
+STATUS_ICONS = {
+    MaterialStatus.LAB_CHECK_PENDING.value: "🔍",  # Лупа - ожидает проверки
+    MaterialStatus.SAMPLES_REQUESTED.value: "📋",  # Запрошены пробы
+    MaterialStatus.SAMPLES_COLLECTED.value: "✂️",  # Пробы отобраны
+    MaterialStatus.TESTING.value: "🧪",            # На испытаниях
+    MaterialStatus.TESTING_COMPLETED.value: "✓",   # Испытания завершены
+}
+
+STATUS_ROW_COLORS = {
+    MaterialStatus.LAB_CHECK_PENDING.value: (200, 200, 255),  # Light blue
+    MaterialStatus.SAMPLES_REQUESTED.value: (255, 255, 160),  # Light yellow
+    MaterialStatus.SAMPLES_COLLECTED.value: (255, 220, 160),  # Light orange
+    MaterialStatus.TESTING.value: (160, 255, 255),            # Light cyan
+    MaterialStatus.TESTING_COMPLETED.value: (200, 255, 200),  # Light green
+}
+
+# Названия видов испытаний в таблице результатов
+TEST_TYPE_DISPLAY = {
+    "mechanical_tensile": "Механический (растяж.)",
+    "mechanical_hardness": "Механический (тверд.)",
+    "mechanical_impact": "Механический (удар)",
+    "chemical_spectral": "Химический (спектр)",
+    "chemical_carbon": "Химический (углерод)",
+    "chemical_elements": "Химический (элементы)",
+    "metallographic_macro": "Метал. (макро)",
+    "metallographic_micro": "Метал. (микро)",
+    "metallographic_grain": "Метал. (зерно)"
+}
+
+FILTER_DELAY_MS = 300
+
 class LabTab(QWidget):
     def __init__(self, user, parent=None):
         super().__init__(parent)
         self.user = user
         self.parent = parent
+        # Поиск материалов выполняется в базе, поэтому запрос откладывается до паузы в наборе
+        self.pending_filter_timer = QTimer(self)
+        self.pending_filter_timer.setSingleShot(True)
+        self.pending_filter_timer.setInterval(FILTER_DELAY_MS)
+        self.pending_filter_timer.timeout.connect(self.load_pending_materials)
+        # Загрузчики таблиц заявок и испытаний (запросы в фоновом потоке)
+        self.requests_loader = BackgroundLoader(self)
+        self.tests_loader = BackgroundLoader(self)
         self.init_ui()
         
     def init_ui(self):
@@ -115,12 +169,15 @@ class LabTab(QWidget):
         
         layout.addLayout(toolbar_layout)
         
-        # Create materials table
-        self.pending_materials_table = QTableWidget()
-        self.pending_materials_table.setColumnCount(7)
-        self.pending_materials_table.setHorizontalHeaderLabels([
-            "Марка материала", "Тип", "Размер", "Плавка", "Поставщик", "Статус", ""
-        ])
+        # Create materials table: строки подгружаются страницами при прокрутке
+        self.pending_materials_model = LazyTableModel(
+            PENDING_MATERIALS_HEADERS, self.fetch_pending_materials_page,
+            count_rows=self.count_pending_materials, fetch_changes=self.fetch_pending_material_changes
+        )
+        self.pending_materials_model.rows_loaded.connect(self.on_pending_materials_loaded)
+        self.pending_materials_model.rows_patched.connect(self.on_pending_materials_loaded)
+        self.pending_materials_model.load_failed.connect(self.on_pending_materials_load_failed)
+        self.pending_materials_table = LazyTableView(self.pending_materials_model)
         
         # Set column widths
         header = self.pending_materials_table.horizontalHeader()
@@ -129,9 +186,14 @@ class LabTab(QWidget):
         header.setSectionResizeMode(6, QHeaderView.ResizeToContents)  # Колонка под иконки
         
         # Connect double click
-        self.pending_materials_table.cellDoubleClicked.connect(self.show_verification_form)
+        self.pending_materials_table.key_activated.connect(self.show_verification_form)
         
         layout.addWidget(self.pending_materials_table)
+
+        # Индикатор фоновой загрузки
+        self.pending_loading_indicator = LoadingIndicator()
+        self.pending_loading_indicator.attach(self.pending_materials_model.loader)
+        layout.addWidget(self.pending_loading_indicator)
         
         # Add filter hint
         hint_label = QLabel("Цветовые индикаторы: ")
@@ -211,6 +273,11 @@ class LabTab(QWidget):
         self.sample_requests_table.cellDoubleClicked.connect(self.show_sample_request_form)
         
         layout.addWidget(self.sample_requests_table)
+
+        # Индикатор фоновой загрузки
+        self.requests_loading_indicator = LoadingIndicator()
+        self.requests_loading_indicator.attach(self.requests_loader)
+        layout.addWidget(self.requests_loading_indicator)
         
         # Load requests
         self.load_sample_requests()
@@ -261,118 +328,108 @@ class LabTab(QWidget):
         self.test_results_table.cellDoubleClicked.connect(self.show_test_result_form)
         
         layout.addWidget(self.test_results_table)
+
+        # Индикатор фоновой загрузки
+        self.tests_loading_indicator = LoadingIndicator()
+        self.tests_loading_indicator.attach(self.tests_loader)
+        layout.addWidget(self.tests_loading_indicator)
         
         # Load test results
         self.load_test_results()
     
+    def pending_filters(self):
+        """Фильтры таблицы материалов: статус и строка поиска"""
+        filters = {}
+        status_filter = self.pending_status_filter.currentData() if hasattr(self, 'pending_status_filter') else ""
+        if status_filter:
+            filters['status'] = status_filter
+        search_text = self.pending_search_input.text().strip() if hasattr(self, 'pending_search_input') else ""
+        if search_text:
+            filters['search'] = search_text
+        return filters
+    
+    def filter_pending_query(self, query, filters):
+        """Apply pending materials filters to a query over MaterialEntry"""
+        # Применяем фильтр по статусу, если выбран
+        if 'status' in filters:
+            query = query.filter(MaterialEntry.status == filters['status'])
+        else:
+            # Если не выбран конкретный статус, показываем все материалы в процессе лабораторной проверки
+            query = query.filter(MaterialEntry.status.in_(LAB_STATUSES))
+        
+        if 'search' in filters:
+            text = f"%{filters['search']}%"
+            query = query.filter(
+                or_(
+                    MaterialEntry.material_grade.ilike(text),
+                    MaterialEntry.batch_number.ilike(text),
+                    MaterialEntry.melt_number.ilike(text),
+                    Supplier.name.ilike(text)
+                )
+            )
+        
+        return query
+    
+    def fetch_pending_materials_page(self, db, filters, cursor, limit):
+        """Страница материалов, ожидающих проверки (новые первыми, в фоновом потоке)"""
+        query = self.filter_pending_query(materials_query(db), filters)
+        materials, next_cursor = keyset_page(query, MaterialEntry, cursor, limit)
+        return [self.pending_material_row(material) for material in materials], next_cursor
+    
+    def count_pending_materials(self, db, filters):
+        """Количество материалов, подходящих под фильтры"""
+        query = materials_count_query(db, func.count(MaterialEntry.id), join_supplier='search' in filters)
+        return self.filter_pending_query(query, filters).scalar()
+    
+    def fetch_pending_material_changes(self, db, filters, since):
+        """Материалы, измененные после отметки since (в фоновом потоке)"""
+        query = self.filter_pending_query(materials_query(db), filters)
+        changes = changes_since(db, query, MaterialEntry, since)
+        if changes is None:
+            return None
+        materials, changed_ids, watermark = changes
+        return [self.pending_material_row(material) for material in materials], changed_ids, watermark
+    
+    def pending_material_row(self, material):
+        """Строка таблицы для материала, ожидающего проверки"""
+        # Размер (диаметр/толщина)
+        size_text = ""
+        if material.diameter:
+            size_text = f"Ø{material.diameter} мм"
+        elif material.thickness:
+            size_text = f"{material.thickness}×{material.width}×{material.length} мм"
+        
+        values = (
+            clean_material_grade(material.material_grade),  # Material grade - очищаем от стандарта
+            get_material_type_display(material.material_type),
+            size_text,
+            material.melt_number,
+            material.supplier.name if material.supplier else "Неизвестно",
+            get_status_display_name(material.status),
+            STATUS_ICONS.get(material.status, "")  # Иконка состояния
+        )
+        
+        # Color row by status
+        row_color = STATUS_ROW_COLORS.get(material.status)
+        return GridRow(material.id, values, colors=(row_color,) * len(PENDING_MATERIALS_HEADERS),
+                       order_key=(material.created_at, material.id))
+    
     def load_pending_materials(self):
         """Load materials pending verification"""
-        try:
-            db = SessionLocal()
-            
-            # Фильтр по статусу
-            status_filter = self.pending_status_filter.currentData() if hasattr(self, 'pending_status_filter') else ""
-            
-            # Get materials that need verification
-            query = db.query(MaterialEntry).filter(
-                MaterialEntry.is_deleted == False
-            )
-            
-            # Применяем фильтр по статусу, если выбран
-            if status_filter:
-                query = query.filter(MaterialEntry.status == status_filter)
-            else:
-                # Если не выбран конкретный статус, показываем все материалы в процессе лабораторной проверки
-                query = query.filter(
-                    MaterialEntry.status.in_([
-                        MaterialStatus.LAB_CHECK_PENDING.value,
-                        MaterialStatus.SAMPLES_REQUESTED.value,
-                        MaterialStatus.SAMPLES_COLLECTED.value,
-                        MaterialStatus.TESTING.value,
-                        MaterialStatus.TESTING_COMPLETED.value
-                    ])
-                )
-            
-            # Получаем все подходящие материалы
-            materials = query.order_by(desc(MaterialEntry.created_at)).all()
-            
-            # Clear table
-            self.pending_materials_table.setRowCount(0)
-            
-            # Add materials to table
-            for row, material in enumerate(materials):
-                self.pending_materials_table.insertRow(row)
-                
-                # Material grade - очищаем от стандарта
-                clean_grade = clean_material_grade(material.material_grade)
-                grade_item = QTableWidgetItem(clean_grade)
-                grade_item.setData(Qt.UserRole, material.id)  # Store ID in user role
-                self.pending_materials_table.setItem(row, 0, grade_item)
-                
-                # Material type
-                type_display = get_material_type_display(material.material_type)
-                self.pending_materials_table.setItem(row, 1, QTableWidgetItem(type_display))
-                
-                # Размер (диаметр/толщина)
-                size_text = ""
-                if material.diameter:
-                    size_text = f"Ø{material.diameter} мм"
-                elif material.thickness:
-                    size_text = f"{material.thickness}×{material.width}×{material.length} мм"
-                self.pending_materials_table.setItem(row, 2, QTableWidgetItem(size_text))
-                
-                # Melt number
-                self.pending_materials_table.setItem(row, 3, QTableWidgetItem(material.melt_number))
-                
-                # Supplier
-                supplier = db.query(Supplier).filter(Supplier.id == material.supplier_id).first()
-                supplier_name = supplier.name if supplier else "Неизвестно"
-                self.pending_materials_table.setItem(row, 4, QTableWidgetItem(supplier_name))
-                
-                # Status
-                status_text = get_status_display_name(material.status)
-                status_item = QTableWidgetItem(status_text)
-                self.pending_materials_table.setItem(row, 5, status_item)
-                
-                # Иконка состояния
-                icon_item = QTableWidgetItem("")
-                
-                # Устанавливаем иконку в зависимости от статуса
-                if material.status == MaterialStatus.LAB_CHECK_PENDING.value:
-                    icon_item.setText("🔍")  # Лупа - ожидает проверки
-                elif material.status == MaterialStatus.SAMPLES_REQUESTED.value:
-                    icon_item.setText("📋")  # Запрошены пробы
-                elif material.status == MaterialStatus.SAMPLES_COLLECTED.value:
-                    icon_item.setText("✂️")  # Пробы отобраны
-                elif material.status == MaterialStatus.TESTING.value:
-                    icon_item.setText("🧪")  # На испытаниях
-                elif material.status == MaterialStatus.TESTING_COMPLETED.value:
-                    icon_item.setText("✓")  # Испытания завершены
-                self.pending_materials_table.setItem(row, 6, icon_item)
-                
-                # Color row by status
-                row_color = None
-                if material.status == MaterialStatus.LAB_CHECK_PENDING.value:
-                    row_color = QColor(200, 200, 255)  # Light blue
-                elif material.status == MaterialStatus.SAMPLES_REQUESTED.value:
-                    row_color = QColor(255, 255, 160)  # Light yellow
-                elif material.status == MaterialStatus.SAMPLES_COLLECTED.value:
-                    row_color = QColor(255, 220, 160)  # Light orange
-                elif material.status == MaterialStatus.TESTING.value:
-                    row_color = QColor(160, 255, 255)  # Light cyan
-                elif material.status == MaterialStatus.TESTING_COMPLETED.value:
-                    row_color = QColor(200, 255, 200)  # Light green
-                
-                if row_color:
-                    self.color_row(self.pending_materials_table, row, row_color)
-            
-            # Update status
-            self.parent.status_bar.showMessage(f"Загружено {len(materials)} материалов")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке материалов: {str(e)}")
-        finally:
-            db.close()
+        self.pending_filter_timer.stop()
+        self.pending_materials_model.reload(self.pending_filters())
+    
+    def refresh_pending_materials(self):
+        """Обновить только измененные материалы (после проверки или назначения испытаний)"""
+        self.pending_materials_model.refresh_changed()
+    
+    def on_pending_materials_loaded(self, loaded, total):
+        """Update status bar after a page of materials is loaded"""
+        self.parent.status_bar.showMessage(f"Загружено {total} материалов")
+    
+    def on_pending_materials_load_failed(self, message):
+        """Ошибка загрузки материалов"""
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке материалов: {message}")
     
     def color_row(self, table, row, color):
         """Set background color for entire row"""
@@ -383,33 +440,10 @@ class LabTab(QWidget):
     
     def filter_pending_materials(self):
         """Filter materials by search text"""
-        search_text = self.pending_search_input.text().lower()
-        
-        for row in range(self.pending_materials_table.rowCount()):
-            show_row = True
-            
-            # Проверяем совпадение с поисковым запросом
-            if search_text:
-                match_found = False
-                
-                # Проверяем все столбцы кроме ID и иконки
-                for col in range(1, 6):
-                    item = self.pending_materials_table.item(row, col)
-                    if item and search_text in item.text().lower():
-                        match_found = True
-                        break
-                
-                if not match_found:
-                    show_row = False
-            
-            # Скрываем или показываем строку
-            self.pending_materials_table.setRowHidden(row, not show_row)
+        self.pending_filter_timer.start()
     
-    def show_verification_form(self, row, column):
+    def show_verification_form(self, material_id):
         """Show form to view/process material pending verification"""
-        # Get material ID from the first column's user role
-        material_id = self.pending_materials_table.item(row, 0).data(Qt.UserRole)
-        
         try:
             # Get session
             db = SessionLocal()
@@ -583,7 +617,7 @@ class LabTab(QWidget):
             verification_dialog.exec_()
             
             # Reload materials list after dialog
-            self.load_pending_materials()
+            self.refresh_pending_materials()
             
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось открыть форму проверки: {str(e)}")
@@ -598,67 +632,58 @@ class LabTab(QWidget):
             QMessageBox.critical(self, "Ошибка", f"Не удалось открыть форму создания теста: {str(e)}")
     
     def load_sample_requests(self):
-        """Load sample requests"""
-        try:
-            # Clear the current table
-            self.sample_requests_table.setRowCount(0)
-            
-            # Get session
-            db = SessionLocal()
-            
-            # Get status filter
-            status_filter = self.request_status_filter.currentData()
-            
-            # Build query
-            query = db.query(SampleRequest).filter(SampleRequest.is_deleted == False)
-            
-            if status_filter == "pending":
-                query = query.filter(SampleRequest.is_collected == False)
-            elif status_filter == "collected":
-                query = query.filter(SampleRequest.is_collected == True)
-            
-            # Execute query
-            requests = query.order_by(desc(SampleRequest.created_at)).all()
-            
-            # Populate table
-            for row, request in enumerate(requests):
-                self.sample_requests_table.insertRow(row)
-                
-                # Найдем информацию о материале
-                material = db.query(MaterialEntry).filter(
-                    MaterialEntry.id == request.material_entry_id
-                ).first()
-                
-                # Марка материала - очищаем от стандарта
-                if material:
-                    clean_grade = clean_material_grade(material.material_grade)
-                else:
-                    clean_grade = "Неизвестно"
-                material_item = QTableWidgetItem(clean_grade)
-                material_item.setData(Qt.UserRole, request.id)  # Store request ID
-                self.sample_requests_table.setItem(row, 0, material_item)
-                
-                # Партия
-                batch_number = material.batch_number if material else "Неизвестно"
-                self.sample_requests_table.setItem(row, 1, QTableWidgetItem(batch_number))
-                
-                # Размер пробы
-                sample_size = f"{request.sample_size} {request.sample_unit}"
-                self.sample_requests_table.setItem(row, 2, QTableWidgetItem(sample_size))
-                
-                # Отобрана
-                collected = "Да" if request.is_collected else "Нет"
-                self.sample_requests_table.setItem(row, 3, QTableWidgetItem(collected))
-                
-                # Отправлена
-                sent = "Да" if request.is_sent_to_lab else "Нет"
-                self.sample_requests_table.setItem(row, 4, QTableWidgetItem(sent))
-            
-            # Close session
-            db.close()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить заявки на пробы: {str(e)}")
+        """Load sample requests (в фоновом потоке)"""
+        self.requests_loader.load(
+            self.fetch_sample_requests, self.request_status_filter.currentData(),
+            on_result=self.fill_sample_requests_table,
+            on_error=lambda message: QMessageBox.critical(
+                self, "Ошибка", f"Не удалось загрузить заявки на пробы: {message}")
+        )
+    
+    def fetch_sample_requests(self, db, status_filter):
+        """
+        Строки таблицы заявок на пробы (выполняется в рабочем потоке)
+        
+        Returns:
+            list: Кортежи (ID заявки, марка, партия, размер пробы, отобрана, отправлена)
+        """
+        query = sample_requests_query(db)
+        
+        if status_filter == "pending":
+            query = query.filter(SampleRequest.is_collected == False)
+        elif status_filter == "collected":
+            query = query.filter(SampleRequest.is_collected == True)
+        
+        rows = []
+        for request in query.order_by(desc(SampleRequest.created_at)).all():
+            # Информация о материале загружена вместе с заявкой
+            material = request.material_entry
+            # Марка материала - очищаем от стандарта
+            clean_grade = clean_material_grade(material.material_grade) if material else "Неизвестно"
+            batch_number = material.batch_number if material else "Неизвестно"
+            rows.append((
+                request.id,
+                clean_grade,
+                batch_number,
+                f"{request.sample_size} {request.sample_unit}",
+                "Да" if request.is_collected else "Нет",
+                "Да" if request.is_sent_to_lab else "Нет",
+            ))
+        return rows
+    
+    def fill_sample_requests_table(self, rows):
+        """Заполнить таблицу заявок загруженными строками"""
+        self.sample_requests_table.setRowCount(0)
+        for row, (request_id, *values) in enumerate(rows):
+            self.sample_requests_table.insertRow(row)
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 0:
+                    item.setData(Qt.UserRole, request_id)  # Store request ID
+                self.sample_requests_table.setItem(row, col, item)
+        
+        # Поиск по тексту применяется к новым строкам
+        self.filter_sample_requests()
     
     def filter_sample_requests(self):
         """Filter sample requests by search text"""
@@ -698,103 +723,71 @@ class LabTab(QWidget):
         self.load_sample_requests()
     
     def load_test_results(self):
-        """Load test results"""
-        try:
-            # Clear the current table
-            self.test_results_table.setRowCount(0)
-            
-            # Get session
-            db = SessionLocal()
-            
-            # Get status filter
-            status_filter = self.test_status_filter.currentData()
-            
-            # Build query
-            query = db.query(LabTest).filter(LabTest.is_deleted == False)
-            
-            if status_filter == "in_progress":
-                query = query.filter(LabTest.is_passed == None)
-            elif status_filter == "completed":
-                query = query.filter(LabTest.is_passed != None)
-            
-            # Execute query
-            lab_tests = query.order_by(desc(LabTest.performed_at)).all()
-            
-            # Populate table
-            for row, test in enumerate(lab_tests):
-                self.test_results_table.insertRow(row)
-                
-                # Найдем информацию о материале
-                material = db.query(MaterialEntry).filter(
-                    MaterialEntry.id == test.material_entry_id
-                ).first()
-                
-                # Марка материала - очищаем от стандарта
-                if material:
-                    clean_grade = clean_material_grade(material.material_grade)
-                else:
-                    clean_grade = "Неизвестно"
-                grade_item = QTableWidgetItem(clean_grade)
-                grade_item.setData(Qt.UserRole, test.id)  # Store test ID
-                self.test_results_table.setItem(row, 0, grade_item)
-                
-                # Партия
-                batch_number = material.batch_number if material else "Неизвестно"
-                self.test_results_table.setItem(row, 1, QTableWidgetItem(batch_number))
-                
-                # Тип теста
-                test_type_display = {
-                    "mechanical_tensile": "Механический (растяж.)",
-                    "mechanical_hardness": "Механический (тверд.)",
-                    "mechanical_impact": "Механический (удар)",
-                    "chemical_spectral": "Химический (спектр)",
-                    "chemical_carbon": "Химический (углерод)",
-                    "chemical_elements": "Химический (элементы)",
-                    "metallographic_macro": "Метал. (макро)",
-                    "metallographic_micro": "Метал. (микро)",
-                    "metallographic_grain": "Метал. (зерно)"
-                }.get(test.test_type, test.test_type)
-                self.test_results_table.setItem(row, 2, QTableWidgetItem(test_type_display))
-                
-                # Результат
-                result_summary = "Нет данных"
-                if test.results:
-                    # Если результат длинный, показываем только первые 30 символов
-                    if len(test.results) > 30:
-                        result_summary = test.results[:30] + "..."
-                    else:
-                        result_summary = test.results
-                self.test_results_table.setItem(row, 3, QTableWidgetItem(result_summary))
-                
-                # Годен/Брак/В процессе + цвет и иконка
-                passed_item = QTableWidgetItem()
-                if test.is_passed is None:
-                    passed_item.setText("⏳ В процессе")
-                    passed_item.setBackground(QBrush(QColor(255, 255, 180)))  # Желтый
-                elif test.is_passed:
-                    passed_item.setText("✔ Годен")
-                    passed_item.setBackground(QBrush(QColor(200, 255, 200)))  # Зеленый
-                else:
-                    passed_item.setText("✖ Брак")
-                    passed_item.setBackground(QBrush(QColor(255, 200, 200)))  # Красный
-                self.test_results_table.setItem(row, 4, passed_item)
-                
-                # Цвет всей строки
-                row_color = None
-                if test.is_passed is None:
-                    row_color = QColor(255, 255, 180)
-                elif test.is_passed:
-                    row_color = QColor(220, 255, 220)
-                else:
-                    row_color = QColor(255, 220, 220)
-                if row_color:
-                    self.color_row(self.test_results_table, row, row_color)
-            
-            # Close session
-            db.close()
+        """Load test results (в фоновом потоке)"""
+        self.tests_loader.load(
+            self.fetch_test_results, self.test_status_filter.currentData(),
+            on_result=self.fill_test_results_table,
+            on_error=lambda message: QMessageBox.critical(
+                self, "Ошибка", f"Не удалось загрузить результаты испытаний: {message}")
+        )
+    
+    def fetch_test_results(self, db, status_filter):
+        """
+        Строки таблицы испытаний (выполняется в рабочем потоке)
+        
+        Returns:
+            list: Кортежи (ID испытания, значения колонок, цвет строки (r, g, b))
+        """
+        query = lab_tests_query(db)
+        
+        if status_filter == "in_progress":
+            query = query.filter(LabTest.is_passed == None)
+        elif status_filter == "completed":
+            query = query.filter(LabTest.is_passed != None)
+        
+        rows = []
+        for test in query.order_by(desc(LabTest.performed_at)).all():
+            # Информация о материале загружена вместе с испытанием
+            material = test.material_entry
+            
+            # Марка материала - очищаем от стандарта
+            clean_grade = clean_material_grade(material.material_grade) if material else "Неизвестно"
+            batch_number = material.batch_number if material else "Неизвестно"
+            
+            # Тип теста
+            test_type_display = TEST_TYPE_DISPLAY.get(test.test_type, test.test_type)
+            
+            # Результат: если длинный, показываем только первые 30 символов
+            result_summary = "Нет данных"
+            if test.results:
+                result_summary = test.results[:30] + "..." if len(test.results) > 30 else test.results
+            
+            # Годен/Брак/В процессе + цвет строки
+            if test.is_passed is None:
+                passed_text, row_color = "⏳ В процессе", (255, 255, 180)  # Желтый
+            elif test.is_passed:
+                passed_text, row_color = "✔ Годен", (220, 255, 220)  # Зеленый
+            else:
+                passed_text, row_color = "✖ Брак", (255, 220, 220)  # Красный
             
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить результаты испытаний: {str(e)}")
+            rows.append((test.id, (clean_grade, batch_number, test_type_display, result_summary, passed_text),
+                         row_color))
+        return rows
+    
+    def fill_test_results_table(self, rows):
+        """Заполнить таблицу испытаний загруженными строками"""
+        self.test_results_table.setRowCount(0)
+        for row, (test_id, values, row_color) in enumerate(rows):
+            self.test_results_table.insertRow(row)
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 0:
+                    item.setData(Qt.UserRole, test_id)  # Store test ID
+                self.test_results_table.setItem(row, col, item)
+            self.color_row(self.test_results_table, row, QColor(*row_color))
+        
+        # Поиск по тексту применяется к новым строкам
+        self.filter_test_results()
     
     def filter_test_results(self):
         """Filter test results by search text"""
@@ -907,7 +900,7 @@ class LabTab(QWidget):
                 dialog.accept()
                 
                 # Refresh materials list
-                self.load_pending_materials()
+                self.refresh_pending_materials()
                 self.load_test_results()
             else:
                 QMessageBox.warning(self, "Ошибка", "Материал не найден")
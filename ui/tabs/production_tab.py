@@ -10,6 +10,8 @@ from PySide6.QtGui import QFont, QColor, QBrush, QIcon
 from database.connection import SessionLocal
 from models.models import MaterialEntry, MaterialStatus, SampleRequest, User
 from sqlalchemy import desc
+from database.queries import sample_requests_query
+from ui.components.background_loader import BackgroundLoader, LoadingIndicator
 import datetime
 import os
 import shutil
@@ -21,6 +23,9 @@ class ProductionTab(QWidget):
         super().__init__(parent)
         self.user = user
         self.parent = parent
+        # Загрузчики таблиц (запросы в фоновом потоке)
+        self.pending_loader = BackgroundLoader(self)
+        self.completed_loader = BackgroundLoader(self)
         self.init_ui()
         
     def init_ui(self):
@@ -105,6 +110,11 @@ class ProductionTab(QWidget):
         self.pending_samples_table.cellDoubleClicked.connect(self.show_sample_details)
         
         layout.addWidget(self.pending_samples_table)
+
+        # Индикатор фоновой загрузки
+        self.pending_loading_indicator = LoadingIndicator()
+        self.pending_loading_indicator.attach(self.pending_loader)
+        layout.addWidget(self.pending_loading_indicator)
         
         # Load data
         self.load_pending_samples()
@@ -156,183 +166,147 @@ class ProductionTab(QWidget):
         self.completed_samples_table.cellDoubleClicked.connect(self.show_sample_details)
         
         layout.addWidget(self.completed_samples_table)
+
+        # Индикатор фоновой загрузки
+        self.completed_loading_indicator = LoadingIndicator()
+        self.completed_loading_indicator.attach(self.completed_loader)
+        layout.addWidget(self.completed_loading_indicator)
         
         # Load data
         self.load_completed_samples()
     
     def load_pending_samples(self):
-        """Load pending sample requests"""
-        try:
-            # Clear the table
-            self.pending_samples_table.setRowCount(0)
-            
-            # Get the session
-            db = SessionLocal()
-            
-            # Get status filter
-            status_filter = self.sample_status_filter.currentData()
-            
-            # Build query for sample requests
-            query = db.query(SampleRequest).filter(
-                SampleRequest.is_deleted == False
+        """Load pending sample requests (в фоновом потоке)"""
+        self.pending_loader.load(
+            self.fetch_pending_samples, self.sample_status_filter.currentData(),
+            on_result=self.fill_pending_samples_table,
+            on_error=lambda message: QMessageBox.critical(
+                self, "Ошибка", f"Ошибка при загрузке заявок: {message}")
+        )
+    
+    def fetch_pending_samples(self, db, status_filter):
+        """
+        Строки таблицы заявок на образцы (выполняется в рабочем потоке)
+        
+        Returns:
+            list: Кортежи (ID заявки, значения колонок, цвет строки (r, g, b) или None)
+        """
+        query = sample_requests_query(db, require_material=True)
+        
+        if status_filter == "processing":
+            # Show only samples that are not collected yet
+            query = query.filter(
+                SampleRequest.is_collected == False
             )
-            
-            if status_filter == "processing":
-                # Show only samples that are not collected yet
-                query = query.filter(
-                    SampleRequest.is_collected == False
-                )
-            
-            # Execute query
-            sample_requests = query.order_by(desc(SampleRequest.created_at)).all()
-            
-            # Populate table
-            for row, request in enumerate(sample_requests):
-                # Get material info
-                material = db.query(MaterialEntry).filter(
-                    MaterialEntry.id == request.material_entry_id
-                ).first()
-                
-                # Skip if material not found
-                if not material:
-                    continue
-                
-                self.pending_samples_table.insertRow(row)
-                
-                # Марка материала
-                material_grade = material.material_grade
-                grade_item = QTableWidgetItem(material_grade)
-                grade_item.setData(Qt.UserRole, request.id)  # Store request ID
-                self.pending_samples_table.setItem(row, 0, grade_item)
-                
-                # Партия
-                batch_number = material.batch_number or "Н/Д"
-                self.pending_samples_table.setItem(row, 1, QTableWidgetItem(batch_number))
-                
-                # Размер пробы
-                sample_size = f"{request.sample_size} {request.sample_unit}"
-                self.pending_samples_table.setItem(row, 2, QTableWidgetItem(sample_size))
-                
-                # Тип теста
-                test_types = []
-                if request.mechanical_test:
-                    test_types.append("Механические")
-                if request.chemical_test:
-                    test_types.append("Химические")
-                if request.metallographic_test:
-                    test_types.append("Металлография")
-                
-                test_type_str = ", ".join(test_types) if test_types else "Не указано"
-                self.pending_samples_table.setItem(row, 3, QTableWidgetItem(test_type_str))
-                
-                # Дата заявки
-                date_str = request.created_at.strftime("%d.%m.%Y %H:%M") if request.created_at else ""
-                self.pending_samples_table.setItem(row, 4, QTableWidgetItem(date_str))
-                
-                # Highlight the row based on request status
-                if not request.is_collected:
-                    self.color_row(self.pending_samples_table, row, QColor(255, 255, 180))  # Light yellow
-            
-            # Close session
-            db.close()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке заявок: {str(e)}")
+        
+        # Заявки без материала отсеяны запросом
+        rows = []
+        for request in query.order_by(desc(SampleRequest.created_at)).all():
+            material = request.material_entry
+            
+            # Тип теста
+            test_types = []
+            if request.mechanical_test:
+                test_types.append("Механические")
+            if request.chemical_test:
+                test_types.append("Химические")
+            if request.metallographic_test:
+                test_types.append("Металлография")
+            
+            values = (
+                material.material_grade,
+                material.batch_number or "Н/Д",
+                f"{request.sample_size} {request.sample_unit}",
+                ", ".join(test_types) if test_types else "Не указано",
+                request.created_at.strftime("%d.%m.%Y %H:%M") if request.created_at else "",
+            )
+            # Highlight the row based on request status
+            row_color = None if request.is_collected else (255, 255, 180)  # Light yellow
+            rows.append((request.id, values, row_color))
+        return rows
+    
+    def fill_pending_samples_table(self, rows):
+        """Заполнить таблицу заявок загруженными строками"""
+        self.fill_table(self.pending_samples_table, rows)
+        self.filter_pending_samples()
     
     def load_completed_samples(self):
-        """Load completed samples"""
-        try:
-            # Clear the table
-            self.completed_samples_table.setRowCount(0)
-            
-            # Get the session
-            db = SessionLocal()
-            
-            # Get date filter
-            date_filter = self.date_filter.currentData()
-            
-            # Build query for sample requests
-            query = db.query(SampleRequest).filter(
-                SampleRequest.is_deleted == False,
-                SampleRequest.is_collected == True
+        """Load completed samples (в фоновом потоке)"""
+        self.completed_loader.load(
+            self.fetch_completed_samples, self.date_filter.currentData(),
+            on_result=self.fill_completed_samples_table,
+            on_error=lambda message: QMessageBox.critical(
+                self, "Ошибка", f"Ошибка при загрузке образцов: {message}")
+        )
+    
+    def fetch_completed_samples(self, db, date_filter):
+        """
+        Строки таблицы изготовленных образцов (выполняется в рабочем потоке)
+        
+        Returns:
+            list: Кортежи (ID заявки, значения колонок, цвет строки (r, g, b))
+        """
+        query = sample_requests_query(db, require_material=True, with_creator=True).filter(
+            SampleRequest.is_collected == True
+        )
+        
+        # Apply date filter
+        now = datetime.datetime.now()
+        if date_filter == "today":
+            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            query = query.filter(SampleRequest.collected_at >= today_start)
+        elif date_filter == "week":
+            week_start = now - datetime.timedelta(days=now.weekday())
+            week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+            query = query.filter(SampleRequest.collected_at >= week_start)
+        elif date_filter == "month":
+            month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            query = query.filter(SampleRequest.collected_at >= month_start)
+        
+        # Заявки без материала отсеяны запросом
+        rows = []
+        for request in query.order_by(desc(SampleRequest.collected_at)).all():
+            material = request.material_entry
+            user = request.created_by_user
+            
+            # Тип теста
+            test_types = []
+            if request.mechanical_test:
+                test_types.append("Механические испытания")
+            if request.chemical_test:
+                test_types.append("Химический анализ")
+            if request.metallographic_test:
+                test_types.append("Металлографический анализ")
+            
+            values = (
+                material.material_grade,
+                material.batch_number or "Н/Д",
+                f"{request.sample_size} {request.sample_unit}",
+                ", ".join(test_types) if test_types else "Не указано",
+                request.collected_at.strftime("%d.%m.%Y %H:%M") if request.collected_at else "",
+                user.full_name if user else "Неизвестно",
             )
-            
-            # Apply date filter
-            now = datetime.datetime.now()
-            if date_filter == "today":
-                today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                query = query.filter(SampleRequest.collected_at >= today_start)
-            elif date_filter == "week":
-                week_start = now - datetime.timedelta(days=now.weekday())
-                week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-                query = query.filter(SampleRequest.collected_at >= week_start)
-            elif date_filter == "month":
-                month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                query = query.filter(SampleRequest.collected_at >= month_start)
-            
-            # Execute query
-            completed_requests = query.order_by(desc(SampleRequest.collected_at)).all()
-            
-            # Populate table
-            for row, request in enumerate(completed_requests):
-                # Get material info
-                material = db.query(MaterialEntry).filter(
-                    MaterialEntry.id == request.material_entry_id
-                ).first()
-                
-                # Skip if material not found
-                if not material:
-                    continue
-                    
-                # Get user who created the request
-                user = db.query(User).filter(
-                    User.id == request.created_by_id
-                ).first()
-                
-                self.completed_samples_table.insertRow(row)
-                
-                # Марка материала
-                material_grade = material.material_grade
-                grade_item = QTableWidgetItem(material_grade)
-                grade_item.setData(Qt.UserRole, request.id)  # Store request ID
-                self.completed_samples_table.setItem(row, 0, grade_item)
-                
-                # Партия
-                batch_number = material.batch_number or "Н/Д"
-                self.completed_samples_table.setItem(row, 1, QTableWidgetItem(batch_number))
-                
-                # Размер пробы
-                sample_size = f"{request.sample_size} {request.sample_unit}"
-                self.completed_samples_table.setItem(row, 2, QTableWidgetItem(sample_size))
-                
-                # Тип теста
-                test_types = []
-                if request.mechanical_test:
-                    test_types.append("Механические испытания")
-                if request.chemical_test:
-                    test_types.append("Химический анализ")
-                if request.metallographic_test:
-                    test_types.append("Металлографический анализ")
-                
-                test_type_str = ", ".join(test_types) if test_types else "Не указано"
-                self.completed_samples_table.setItem(row, 3, QTableWidgetItem(test_type_str))
-                
-                # Дата изготовления
-                date_str = request.collected_at.strftime("%d.%m.%Y %H:%M") if request.collected_at else ""
-                self.completed_samples_table.setItem(row, 4, QTableWidgetItem(date_str))
-                
-                # Изготовитель
-                user_name = user.full_name if user else "Неизвестно"
-                self.completed_samples_table.setItem(row, 5, QTableWidgetItem(user_name))
-                
-                # Highlight the row indicating it's completed
-                self.color_row(self.completed_samples_table, row, QColor(220, 255, 220))  # Light green
-            
-            # Close session
-            db.close()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке образцов: {str(e)}")
+            # Highlight the row indicating it's completed
+            rows.append((request.id, values, (220, 255, 220)))  # Light green
+        return rows
+    
+    def fill_completed_samples_table(self, rows):
+        """Заполнить таблицу изготовленных образцов загруженными строками"""
+        self.fill_table(self.completed_samples_table, rows)
+        self.filter_completed_samples()
+    
+    def fill_table(self, table, rows):
+        """Заполнить таблицу строками (ID заявки, значения, цвет строки)"""
+        table.setRowCount(0)
+        for row, (request_id, values, row_color) in enumerate(rows):
+            table.insertRow(row)
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 0:
+                    item.setData(Qt.UserRole, request_id)  # Store request ID
+                table.setItem(row, col, item)
+            if row_color:
+                self.color_row(table, row, QColor(*row_color))
     
     def filter_pending_samples(self):
         """Filter pending samples table by search text"""
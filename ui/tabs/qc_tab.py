@@ -1,15 +1,15 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-                             QTableWidget, QTableWidgetItem, QComboBox, QLineEdit,
+                             QComboBox, QLineEdit,
                              QFormLayout, QMessageBox, QFileDialog, QHeaderView,
                              QGroupBox, QCheckBox, QDialog, QTextEdit, QScrollArea,
                              QSplitter, QFrame, QMenu, QSpinBox, QDoubleSpinBox,
                              QSizePolicy)
-from PySide6.QtCore import Qt, QDateTime, QRegularExpression
-from PySide6.QtGui import QFont, QColor, QBrush, QRegularExpressionValidator, QAction
+from PySide6.QtCore import Qt, QDateTime, QRegularExpression, QTimer
+from PySide6.QtGui import QFont, QRegularExpressionValidator, QAction
 
 from database.connection import SessionLocal
 from models.models import User, MaterialEntry, Supplier, MaterialType, MaterialStatus, QCCheck
-from sqlalchemy import desc
+from sqlalchemy import func, or_
 import os
 import shutil
 import datetime
@@ -18,6 +18,35 @@ from ui.icons.icon_provider import IconProvider
 from ui.themes import theme_manager
 from ui.styles import (apply_button_style, apply_input_style, apply_combobox_style, 
                        apply_table_style, refresh_table_style)
+from ui.components.lazy_table import LazyTableModel, LazyTableView, GridRow
+from ui.components.background_loader import LoadingIndicator
+from database.queries import keyset_page, materials_query, materials_count_query, changes_since
+
+QC_MATERIALS_HEADERS = [
+    "Марка материала", "Вид проката", "Партия", "Плавка", "Поставщик", "Статус", "Отметка"
+]
+MARK_COLUMN = 6
+
+# Color row by status
+STATUS_ROW_COLORS = {
+    MaterialStatus.RECEIVED.value: (255, 255, 200),        # Light yellow
+    MaterialStatus.QC_CHECKED.value: (200, 255, 200),      # Light green
+    MaterialStatus.LAB_TESTING.value: (200, 200, 255),     # Light blue
+    MaterialStatus.EDIT_REQUESTED.value: (255, 230, 200),  # Light orange
+}
+
+# Ограничения ширины колонок после загрузки первой страницы
+MIN_COLUMN_WIDTHS = {
+    0: 120,  # Марка материала
+    1: 80,   # Вид проката
+    2: 80,   # Партия
+    3: 80,   # Плавка
+    4: 100,  # Поставщик
+    5: 100,  # Статус
+    6: 100   # Отметка
+}
+
+FILTER_DELAY_MS = 300
 
 class QCCheckForm(QDialog):
     def __init__(self, material_id, user, parent=None):
@@ -765,6 +794,11 @@ class QCTab(QWidget):
         self.user = user
         self.parent = parent
         self.viewed_materials = set()  # Track viewed materials
+        # Поиск выполняется в базе, поэтому запрос откладывается до паузы в наборе
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self.load_materials)
         self.init_ui()
     
     def refresh_styles(self):
@@ -863,7 +897,7 @@ class QCTab(QWidget):
         self.status_filter.addItem("На лабораторных", MaterialStatus.LAB_TESTING.value)
         self.status_filter.addItem("Редактирование", MaterialStatus.EDIT_REQUESTED.value)
         apply_combobox_style(self.status_filter)
-        self.status_filter.currentIndexChanged.connect(self.filter_materials)
+        self.status_filter.currentIndexChanged.connect(self.load_materials)
         filter_layout.addWidget(self.status_filter)
         
         toolbar_layout.addWidget(filter_widget)
@@ -891,37 +925,35 @@ class QCTab(QWidget):
         table_title.setFont(QFont("Segoe UI", 14, QFont.Weight.Bold))
         table_layout.addWidget(table_title)
         
-        # Create pending materials table с гибкими размерами
-        self.materials_table = QTableWidget()
-        self.materials_table.setColumnCount(9)
-        self.materials_table.setHorizontalHeaderLabels([
-            "ID", "Марка материала", "Вид проката", "Размер", "Плавка", 
-            "Партия", "Сертификат", "Поставщик", "Статус"
-        ])
+        # Create pending materials table: строки подгружаются страницами при прокрутке
+        self.materials_model = LazyTableModel(
+            QC_MATERIALS_HEADERS, self.fetch_materials_page, count_rows=self.count_materials,
+            fetch_changes=self.fetch_material_changes
+        )
+        self.materials_model.rows_loaded.connect(self.on_materials_loaded)
+        self.materials_model.rows_patched.connect(self.update_table_status)
+        self.materials_model.load_failed.connect(self.on_materials_load_failed)
+        self.materials_table = LazyTableView(self.materials_model)
         
         # Применяем гибкие стили к таблице
         apply_table_style(self.materials_table)
         
-        # Set column resize modes для лучшей адаптивности
-        header = self.materials_table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)  # ID
-        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)  # Марка материала - растягивается
-        header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)  # Вид проката
-        header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)  # Размер
-        header.setSectionResizeMode(4, QHeaderView.ResizeMode.ResizeToContents)  # Плавка
-        header.setSectionResizeMode(5, QHeaderView.ResizeMode.ResizeToContents)  # Партия
-        header.setSectionResizeMode(6, QHeaderView.ResizeMode.ResizeToContents)  # Сертификат
-        header.setSectionResizeMode(7, QHeaderView.ResizeMode.ResizeToContents)  # Поставщик
-        header.setSectionResizeMode(8, QHeaderView.ResizeMode.ResizeToContents)  # Статус
+        # Марка материала растягивается, остальные колонки подгоняются по первой странице
+        self.materials_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         
         # Настраиваем контекстное меню для таблицы
         self.materials_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.materials_table.customContextMenuRequested.connect(self.show_context_menu)
         
         # Double click to open QC check form
-        self.materials_table.cellDoubleClicked.connect(self.show_qc_check_form)
+        self.materials_table.key_activated.connect(self.show_qc_check_form)
         
         table_layout.addWidget(self.materials_table)
+
+        # Индикатор фоновой загрузки
+        self.loading_indicator = LoadingIndicator()
+        self.loading_indicator.attach(self.materials_model.loader)
+        table_layout.addWidget(self.loading_indicator)
         
         # Add table status row
         status_layout = QHBoxLayout()
@@ -948,152 +980,121 @@ class QCTab(QWidget):
         dialog = CertificateBrowserDialog(self)
         dialog.exec()
     
+    def current_filters(self):
+        """Фильтры таблицы: статус и строка поиска"""
+        filters = {}
+        status_filter = self.status_filter.currentData()
+        if status_filter:
+            filters['status'] = status_filter
+        search_text = self.search_input.text().strip()
+        if search_text:
+            filters['search'] = search_text
+        return filters
+    
+    def filter_query(self, query, filters):
+        """Apply table filters to a query over MaterialEntry"""
+        if 'status' in filters:
+            query = query.filter(MaterialEntry.status == filters['status'])
+        
+        if 'search' in filters:
+            text = f"%{filters['search']}%"
+            query = query.filter(
+                or_(
+                    MaterialEntry.material_grade.ilike(text),
+                    MaterialEntry.batch_number.ilike(text),
+                    MaterialEntry.melt_number.ilike(text),
+                    Supplier.name.ilike(text)
+                )
+            )
+        
+        return query
+    
+    def fetch_materials_page(self, db, filters, cursor, limit):
+        """Страница материалов для таблицы (новые первыми, в фоновом потоке)"""
+        query = self.filter_query(materials_query(db), filters)
+        materials, next_cursor = keyset_page(query, MaterialEntry, cursor, limit)
+        return [self.material_row(material) for material in materials], next_cursor
+    
+    def count_materials(self, db, filters):
+        """Количество материалов, подходящих под фильтры"""
+        query = materials_count_query(db, func.count(MaterialEntry.id), join_supplier='search' in filters)
+        return self.filter_query(query, filters).scalar()
+    
+    def fetch_material_changes(self, db, filters, since):
+        """Материалы, измененные после отметки since (в фоновом потоке)"""
+        changes = changes_since(db, self.filter_query(materials_query(db), filters), MaterialEntry, since)
+        if changes is None:
+            return None
+        materials, changed_ids, watermark = changes
+        return [self.material_row(material) for material in materials], changed_ids, watermark
+    
+    def material_row(self, material):
+        """Строка таблицы для материала"""
+        # New/viewed mark
+        mark_text = ""
+        mark_color = None
+        
+        if material.id not in self.viewed_materials:
+            mark_text = "Новая"
+            mark_color = (255, 255, 0)  # Yellow
+        
+        # Добавляем иконку запроса на редактирование если есть запрос
+        if material.edit_requested:
+            mark_text = "⚠️ Запрос изменений"
+            mark_color = (255, 165, 0)  # Orange
+        
+        values = (
+            clean_material_grade(material.material_grade),  # Очищаем марку материала от стандарта
+            get_material_type_display(material.material_type),
+            material.batch_number or "",
+            material.melt_number,
+            material.supplier.name if material.supplier else "Неизвестно",
+            get_status_display_name(material.status),
+            mark_text
+        )
+        
+        # Color row by status, отметка сохраняет свой цвет
+        colors = [STATUS_ROW_COLORS.get(material.status)] * len(QC_MATERIALS_HEADERS)
+        if mark_color:
+            colors[MARK_COLUMN] = mark_color
+        
+        return GridRow(material.id, values, colors=tuple(colors), order_key=(material.created_at, material.id))
+    
     def load_materials(self):
         """Load materials that need QC check"""
-        db = SessionLocal()
-        try:
-            # Get status filter
-            status_filter = self.status_filter.currentData()
-            
-            # Get materials that need QC check
-            query = db.query(MaterialEntry).filter(MaterialEntry.is_deleted == False)
-            
-            if status_filter:
-                query = query.filter(MaterialEntry.status == status_filter)
-            
-            materials = query.order_by(desc(MaterialEntry.created_at)).all()
-            
-            # Clear table
-            self.materials_table.setRowCount(0)
-            
-            # Add materials to table
-            for row, material in enumerate(materials):
-                self.materials_table.insertRow(row)
-                
-                # Сохраняем ID как данные (UserRole), но не отображаем
-                # Очищаем марку материала от стандарта
-                clean_grade = clean_material_grade(material.material_grade)
-                grade_item = QTableWidgetItem(clean_grade)
-                grade_item.setData(Qt.UserRole, material.id)
-                self.materials_table.setItem(row, 0, grade_item)
-                
-                self.materials_table.setItem(row, 1, QTableWidgetItem(get_material_type_display(material.material_type)))
-                self.materials_table.setItem(row, 2, QTableWidgetItem(material.batch_number or ""))
-                self.materials_table.setItem(row, 3, QTableWidgetItem(material.melt_number))
-                
-                # Get supplier name
-                supplier = db.query(Supplier).filter(Supplier.id == material.supplier_id).first()
-                supplier_name = supplier.name if supplier else "Неизвестно"
-                self.materials_table.setItem(row, 4, QTableWidgetItem(supplier_name))
-                
-                # Status
-                status_item = QTableWidgetItem(get_status_display_name(material.status))
-                self.materials_table.setItem(row, 5, status_item)
-                
-                # New/viewed mark
-                mark_text = ""
-                mark_color = None
-                
-                if material.id not in self.viewed_materials:
-                    mark_text = "Новая"
-                    mark_color = QColor(255, 255, 0)  # Yellow
-                
-                # Добавляем иконку запроса на редактирование если есть запрос
-                if material.edit_requested:
-                    mark_text = "⚠️ Запрос изменений"
-                    mark_color = QColor(255, 165, 0)  # Orange
-                
-                mark_item = QTableWidgetItem(mark_text)
-                if mark_color:
-                    mark_item.setBackground(QBrush(mark_color))
-                self.materials_table.setItem(row, 6, mark_item)
-                
-                # Color row by status
-                row_color = None
-                if material.status == MaterialStatus.RECEIVED.value:
-                    row_color = QColor(255, 255, 200)  # Light yellow
-                elif material.status == MaterialStatus.QC_CHECKED.value:
-                    row_color = QColor(200, 255, 200)  # Light green
-                elif material.status == MaterialStatus.LAB_TESTING.value:
-                    row_color = QColor(200, 200, 255)  # Light blue
-                elif material.status == MaterialStatus.EDIT_REQUESTED.value:
-                    row_color = QColor(255, 230, 200)  # Light orange
-                
-                if row_color:
-                    self.color_row(row, row_color)
-            
-            # Update status
-            self.parent.status_bar.showMessage(f"Загружено {len(materials)} материалов")
-            
-            # После заполнения таблицы данными:
-            self.materials_table.resizeColumnsToContents()
-            
-            # Ограничим максимальную ширину колонок и установим минимальную
-            min_widths = {
-                0: 60,   # ID
-                1: 120,  # Марка материала 
-                2: 80,   # Вид проката
-                3: 80,   # Размер
-                4: 80,   # Плавка
-                5: 80,   # Партия
-                6: 100,  # Сертификат
-                7: 100,  # Поставщик
-                8: 100   # Статус
-            }
-            
-            max_width = 300
-            for col in range(self.materials_table.columnCount()):
-                current_width = self.materials_table.columnWidth(col)
-                min_width = min_widths.get(col, 60)
-                
-                # Устанавливаем ширину между минимальной и максимальной
-                if current_width < min_width:
-                    self.materials_table.setColumnWidth(col, min_width)
-                elif current_width > max_width:
-                    self.materials_table.setColumnWidth(col, max_width)
-                    
-            # Марка материала может растягиваться
-            self.materials_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке материалов: {str(e)}")
-        finally:
-            db.close()
+        self.filter_timer.stop()
+        self.table_status_label.setText("Загрузка данных...")
+        self.materials_model.reload(self.current_filters())
     
-    def color_row(self, row, color):
-        """Set background color for entire row"""
-        for col in range(self.materials_table.columnCount()):
-            item = self.materials_table.item(row, col)
-            if item:
-                item.setBackground(QBrush(color))
+    def refresh_materials(self):
+        """Обновить только измененные материалы (после проверки или смены статуса)"""
+        self.materials_model.refresh_changed()
+    
+    def on_materials_loaded(self, loaded, total):
+        """Обновить строку состояния после загрузки страницы"""
+        if loaded <= self.materials_model.page_size:
+            # Первая страница: подгоняем ширину колонок
+            self.materials_table.fit_columns(MIN_COLUMN_WIDTHS, stretch_column=0)
+        
+        self.update_table_status(loaded, total)
+    
+    def update_table_status(self, loaded, total):
+        """Строка состояния таблицы: сколько материалов загружено"""
+        self.parent.status_bar.showMessage(f"Загружено {total} материалов")
+        self.table_status_label.setText("Данные загружены")
+        self.records_count_label.setText(f"Записей: {total}" if loaded == total else f"Записей: {loaded} / {total}")
+    
+    def on_materials_load_failed(self, message):
+        """Ошибка загрузки материалов"""
+        self.table_status_label.setText("Ошибка загрузки")
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке материалов: {message}")
     
     def filter_materials(self):
         """Filter materials by search text"""
-        search_text = self.search_input.text().lower()
-        
-        for row in range(self.materials_table.rowCount()):
-            show_row = True
-            
-            # Check if row matches search text
-            if search_text:
-                match_found = False
-                for col in range(1, 5):  # Check columns 1-4 (material info)
-                    item = self.materials_table.item(row, col)
-                    if item and search_text in item.text().lower():
-                        match_found = True
-                        break
-                
-                if not match_found:
-                    show_row = False
-            
-            # Show/hide row
-            self.materials_table.setRowHidden(row, not show_row)
+        self.filter_timer.start()
     
-    def show_qc_check_form(self, row, column):
+    def show_qc_check_form(self, material_id):
         """Show form to check material certificate"""
-        # Получаем ID из данных ячейки
-        material_id = self.materials_table.item(row, 0).data(Qt.UserRole)
-        
         # Mark as viewed
         self.viewed_materials.add(material_id)
         
@@ -1123,7 +1124,7 @@ class QCTab(QWidget):
                         "Вы разрешили редактирование материала. "
                         "Кладовщик теперь может внести изменения."
                     )
-                    self.load_materials()
+                    self.refresh_materials()
                     return
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка при обработке запроса: {str(e)}")
@@ -1136,32 +1137,26 @@ class QCTab(QWidget):
         
         # Refresh materials list if form was accepted
         if result == QDialog.Accepted:
-            self.load_materials()
+            self.refresh_materials()
     
     def show_check_dialog(self):
         """Показать диалог проверки для выбранного материала"""
         # Проверяем, выбран ли материал
-        selected_items = self.materials_table.selectedItems()
-        if not selected_items:
+        material_id = self.materials_table.selected_key()
+        if material_id is None:
             QMessageBox.warning(self, "Предупреждение", "Выберите материал для проверки")
             return
         
-        # Получаем строку выбранного материала
-        row = selected_items[0].row()
-        
         # Вызываем форму проверки
-        self.show_qc_check_form(row, 0)
+        self.show_qc_check_form(material_id)
     
     def view_check_details(self):
         """Просмотр деталей проверки выбранного материала"""
-        selected_items = self.materials_table.selectedItems()
-        if not selected_items:
+        material_id = self.materials_table.selected_key()
+        if material_id is None:
             QMessageBox.warning(self, "Предупреждение", "Выберите материал для просмотра")
             return
         
-        row = selected_items[0].row()
-        material_id = self.materials_table.item(row, 0).data(Qt.UserRole)
-        
         # Проверяем, есть ли данные проверки для этого материала
         db = SessionLocal()
         try:
@@ -1192,8 +1187,7 @@ class QCTab(QWidget):
     
     def show_context_menu(self, position):
         """Показать контекстное меню для таблицы материалов"""
-        selected_items = self.materials_table.selectedItems()
-        if not selected_items:
+        if self.materials_table.selected_key() is None:
             return
             
         menu = QMenu(self)
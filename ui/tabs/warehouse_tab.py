@@ -1,31 +1,77 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QTableWidget, QTableWidgetItem, QComboBox, QLineEdit,
+    QComboBox, QLineEdit,
     QFormLayout, QMessageBox, QFileDialog, QHeaderView,
     QGroupBox, QSpinBox, QDoubleSpinBox, QDialog, QInputDialog,
     QSplitter, QFrame, QMenu, QSizePolicy
 )
-from PySide6.QtCore import Qt, QDateTime
-from PySide6.QtGui import QFont, QIcon, QPixmap, QColor, QBrush, QAction
+from PySide6.QtCore import Qt, QDateTime, QTimer
+from PySide6.QtGui import QFont, QIcon, QPixmap, QAction
 
 import os
 import datetime
 from database.connection import SessionLocal
 from models.models import User, MaterialEntry, Supplier, MaterialType, MaterialStatus
-from sqlalchemy import desc, and_, or_
+from sqlalchemy import String, cast, func, or_
 from ui.tabs.warehouse_entry_form import WarehouseEntryForm
 from ui.icons.icon_provider import IconProvider
 from ui.styles import (apply_button_style, apply_input_style, apply_combobox_style, 
                        apply_table_style, refresh_table_style)
 from ui.themes import theme_manager
 from ui.dialogs.advanced_search_dialog import AdvancedSearchDialog
+from ui.components.lazy_table import LazyTableModel, LazyTableView, GridRow
+from ui.components.background_loader import LoadingIndicator
+from database.queries import keyset_page, materials_query, materials_count_query, changes_since
 from utils.material_utils import clean_material_grade, get_material_type_display, get_status_display_name
 
+MATERIALS_HEADERS = [
+    "Номер заказа", "Марка материала", "Вид проката", "Размер", "Плавка", "Сертификат",
+    "Партия", "Общая длина/площадь", "Дата прихода", "Статус", "Поставщик"
+]
+DATE_COLUMN = 8
+STATUS_COLUMN = 9
+
+# Подсветка статусов разными цветами
+STATUS_COLORS = {
+    MaterialStatus.RECEIVED.value: (240, 240, 240),        # Светло-серый
+    MaterialStatus.PENDING_QC.value: (255, 230, 180),      # Светло-оранжевый
+    MaterialStatus.QC_PASSED.value: (200, 255, 200),       # Светло-зеленый
+    MaterialStatus.QC_FAILED.value: (255, 200, 200),       # Светло-красный
+    MaterialStatus.LAB_TESTING.value: (200, 220, 255),     # Светло-синий
+    MaterialStatus.READY_FOR_USE.value: (180, 255, 180),   # Ярко-зеленый
+    MaterialStatus.REJECTED.value: (255, 180, 180),        # Ярко-красный
+    MaterialStatus.EDIT_REQUESTED.value: (255, 255, 180),  # Светло-желтый
+}
+EDIT_REQUESTED_COLOR = (255, 255, 200)  # Светло-желтый
+
+# Ограничения ширины колонок после загрузки первой страницы
+MIN_COLUMN_WIDTHS = {
+    0: 80,   # Номер заказа
+    1: 120,  # Марка материала
+    2: 80,   # Вид проката
+    3: 80,   # Размер
+    4: 80,   # Плавка
+    5: 100,  # Сертификат
+    6: 80,   # Партия
+    7: 120,  # Общая длина/площадь
+    8: 80,   # Дата прихода
+    9: 100,  # Статус
+    10: 100  # Поставщик
+}
+
+FILTER_DELAY_MS = 300
+
 class WarehouseTab(QWidget):
     def __init__(self, user, parent=None):
         super().__init__(parent)
         self.user = user
         self.parent = parent
+        self.advanced_filters = {}  # Фильтры расширенного поиска
+        # Поиск по тексту выполняется в базе, поэтому запрос откладывается до паузы в наборе
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self.apply_filters)
         self.init_ui()
         
     def refresh_styles(self):
@@ -188,39 +234,35 @@ class WarehouseTab(QWidget):
         table_title.setFont(QFont("Segoe UI", 14, QFont.Weight.Bold))
         table_layout.addWidget(table_title)
         
-        # Create materials table с гибкими размерами
-        self.materials_table = QTableWidget()
-        self.materials_table.setColumnCount(11)  # Расширено до 11 колонок
-        self.materials_table.setHorizontalHeaderLabels([
-            "Номер заказа", "Марка материала", "Вид проката", "Размер", "Плавка", "Сертификат", 
-            "Партия", "Общая длина/площадь", "Дата прихода", "Статус", "Поставщик"
-        ])
+        # Create materials table: строки подгружаются страницами при прокрутке
+        self.materials_model = LazyTableModel(
+            MATERIALS_HEADERS, self.fetch_materials_page, count_rows=self.count_materials,
+            fetch_changes=self.fetch_material_changes
+        )
+        self.materials_model.rows_loaded.connect(self.on_materials_loaded)
+        self.materials_model.rows_patched.connect(self.update_table_status)
+        self.materials_model.load_failed.connect(self.on_materials_load_failed)
+        self.materials_table = LazyTableView(self.materials_model)
         
         # Применяем гибкие стили к таблице
         apply_table_style(self.materials_table)
         
-        # Set column resize modes для лучшей адаптивности
-        header = self.materials_table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)  # Номер заказа
-        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)  # Марка материала - растягивается
-        header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)  # Вид проката
-        header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)  # Размер
-        header.setSectionResizeMode(4, QHeaderView.ResizeMode.ResizeToContents)  # Плавка
-        header.setSectionResizeMode(5, QHeaderView.ResizeMode.ResizeToContents)  # Сертификат
-        header.setSectionResizeMode(6, QHeaderView.ResizeMode.ResizeToContents)  # Партия
-        header.setSectionResizeMode(7, QHeaderView.ResizeMode.ResizeToContents)  # Общая длина/площадь
-        header.setSectionResizeMode(8, QHeaderView.ResizeMode.ResizeToContents)  # Дата прихода
-        header.setSectionResizeMode(9, QHeaderView.ResizeMode.ResizeToContents)  # Статус
-        header.setSectionResizeMode(10, QHeaderView.ResizeMode.ResizeToContents)  # Поставщик
+        # Марка материала растягивается, остальные колонки подгоняются по первой странице
+        self.materials_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
         
         # Настраиваем контекстное меню для таблицы
         self.materials_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.materials_table.customContextMenuRequested.connect(self.show_context_menu)
         
         # Двойной клик по строке для редактирования
-        self.materials_table.cellDoubleClicked.connect(self.on_table_double_click)
+        self.materials_table.key_activated.connect(self.on_table_double_click)
         
         table_layout.addWidget(self.materials_table)
+
+        # Индикатор фоновой загрузки
+        self.loading_indicator = LoadingIndicator()
+        self.loading_indicator.attach(self.materials_model.loader)
+        table_layout.addWidget(self.loading_indicator)
         
         # Add table status row
         status_layout = QHBoxLayout()
@@ -249,318 +291,272 @@ class WarehouseTab(QWidget):
     
     def perform_advanced_search(self, filters):
         """Perform advanced search with filters"""
-        db = SessionLocal()
-        try:
-            # Start with base query
-            query = db.query(MaterialEntry).filter(MaterialEntry.is_deleted == False)
-            
-            # Apply filters
-            if 'text_search' in filters:
-                text = f"%{filters['text_search']}%"
-                query = query.filter(
-                    or_(
-                        MaterialEntry.material_grade.ilike(text),
-                        MaterialEntry.batch_number.ilike(text),
-                        MaterialEntry.melt_number.ilike(text)
-                    )
+        self.advanced_filters = dict(filters)
+        self.apply_filters()
+    
+    def current_filters(self):
+        """Фильтры таблицы: расширенный поиск, строка поиска и статус"""
+        filters = dict(self.advanced_filters)
+        search_text = self.search_input.text().strip()
+        if search_text:
+            filters['quick_search'] = search_text
+        status = self.status_filter.currentData()
+        if status:
+            filters['quick_status'] = status
+        return filters
+    
+    def filter_query(self, query, filters):
+        """Apply table filters to a query over MaterialEntry"""
+        if 'text_search' in filters:
+            text = f"%{filters['text_search']}%"
+            query = query.filter(
+                or_(
+                    MaterialEntry.material_grade.ilike(text),
+                    MaterialEntry.batch_number.ilike(text),
+                    MaterialEntry.melt_number.ilike(text)
                 )
-            
-            if 'material_grade' in filters:
-                query = query.filter(MaterialEntry.material_grade == filters['material_grade'])
-            
-            if 'product_type' in filters:
-                query = query.filter(MaterialEntry.material_type == filters['product_type'])
-            
-            if 'status' in filters:
-                query = query.filter(MaterialEntry.status == filters['status'].value)
-            
-            if 'date_from' in filters:
-                query = query.filter(MaterialEntry.created_at >= filters['date_from'])
-            
-            if 'date_to' in filters:
-                query = query.filter(MaterialEntry.created_at <= filters['date_to'])
-            
-            if 'supplier' in filters:
-                query = query.filter(MaterialEntry.supplier_id == filters['supplier'])
-            
-            if 'melt_number' in filters:
-                query = query.filter(MaterialEntry.melt_number.ilike(f"%{filters['melt_number']}%"))
-            
-            if 'batch_number' in filters:
-                query = query.filter(MaterialEntry.batch_number.ilike(f"%{filters['batch_number']}%"))
-            
-            if 'size_from' in filters:
-                query = query.filter(
-                    or_(
-                        MaterialEntry.diameter >= filters['size_from'],
-                        MaterialEntry.thickness >= filters['size_from']
-                    )
+            )
+        
+        if 'material_grade' in filters:
+            query = query.filter(MaterialEntry.material_grade == filters['material_grade'])
+        
+        if 'product_type' in filters:
+            query = query.filter(MaterialEntry.material_type == filters['product_type'])
+        
+        if 'status' in filters:
+            query = query.filter(MaterialEntry.status == filters['status'].value)
+        
+        if 'date_from' in filters:
+            query = query.filter(MaterialEntry.created_at >= filters['date_from'])
+        
+        if 'date_to' in filters:
+            query = query.filter(MaterialEntry.created_at <= filters['date_to'])
+        
+        if 'supplier' in filters:
+            query = query.filter(MaterialEntry.supplier_id == filters['supplier'])
+        
+        if 'melt_number' in filters:
+            query = query.filter(MaterialEntry.melt_number.ilike(f"%{filters['melt_number']}%"))
+        
+        if 'batch_number' in filters:
+            query = query.filter(MaterialEntry.batch_number.ilike(f"%{filters['batch_number']}%"))
+        
+        if 'size_from' in filters:
+            query = query.filter(
+                or_(
+                    MaterialEntry.diameter >= filters['size_from'],
+                    MaterialEntry.thickness >= filters['size_from']
                 )
-            
-            if 'size_to' in filters:
-                query = query.filter(
-                    or_(
-                        MaterialEntry.diameter <= filters['size_to'],
-                        MaterialEntry.thickness <= filters['size_to']
-                    )
+            )
+        
+        if 'size_to' in filters:
+            query = query.filter(
+                or_(
+                    MaterialEntry.diameter <= filters['size_to'],
+                    MaterialEntry.thickness <= filters['size_to']
                 )
-            
-            if 'has_certificate' in filters:
-                query = query.filter(MaterialEntry.certificate_file_path.isnot(None))
-            
-            if 'requires_lab' in filters:
-                query = query.filter(MaterialEntry.requires_lab_verification == True)
-            
-            if 'edit_requested' in filters:
-                query = query.filter(MaterialEntry.edit_requested == True)
-            
-            # Execute query
-            materials = query.order_by(desc(MaterialEntry.created_at)).all()
-            
-            # Update table
-            self.update_materials_table(materials, db)
-            
-            # Update status
-            self.parent.status_bar.showMessage(f"Найдено {len(materials)} материалов по фильтрам")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при поиске: {str(e)}")
-        finally:
-            db.close()
+            )
+        
+        if 'has_certificate' in filters:
+            query = query.filter(MaterialEntry.certificate_file_path.isnot(None))
+        
+        if 'requires_lab' in filters:
+            query = query.filter(MaterialEntry.requires_lab_verification == True)
+        
+        if 'edit_requested' in filters:
+            query = query.filter(MaterialEntry.edit_requested == True)
+        
+        # Строка поиска и фильтр статуса на панели инструментов
+        if 'quick_search' in filters:
+            search = filters['quick_search']
+            text = f"%{search}%"
+            conditions = [
+                MaterialEntry.order_number.ilike(text),
+                MaterialEntry.material_grade.ilike(text),
+                MaterialEntry.melt_number.ilike(text),
+                MaterialEntry.batch_number.ilike(text),
+                MaterialEntry.certificate_number.ilike(text),
+                Supplier.name.ilike(text),
+                # Размер в таблице выводится из этих значений ("Ø20.0", "10.0 мм")
+                cast(MaterialEntry.diameter, String).ilike(text),
+                cast(MaterialEntry.thickness, String).ilike(text),
+                cast(MaterialEntry.wall_thickness, String).ilike(text),
+            ]
+            # Вид проката и статус хранятся кодами - ищем по отображаемым названиям
+            type_codes = [material_type.value for material_type in MaterialType
+                          if search.lower() in get_material_type_display(material_type.value).lower()]
+            if type_codes:
+                conditions.append(MaterialEntry.material_type.in_(type_codes))
+            status_codes = [status.value for status in MaterialStatus
+                            if search.lower() in get_status_display_name(status.value).lower()]
+            if status_codes:
+                conditions.append(MaterialEntry.status.in_(status_codes))
+            query = query.filter(or_(*conditions))
+        
+        if 'quick_status' in filters:
+            query = query.filter(MaterialEntry.status == filters['quick_status'])
+        
+        return query
     
-    def update_materials_table(self, materials, db):
-        """Update materials table with given materials"""
-        # Clear table
-        self.materials_table.setRowCount(0)
-        
-        # Add materials to table
-        for row, material in enumerate(materials):
-            self.materials_table.insertRow(row)
-            
-            # Номер заказа (теперь первый столбец)
-            order_item = QTableWidgetItem(material.order_number or "")
-            order_item.setToolTip(f"Заказ: {material.order_number or 'Не указан'}")
-            self.materials_table.setItem(row, 0, order_item)
-            
-            # Марка материала (теперь второй столбец)
-            # Очищаем марку материала от стандарта
-            clean_grade = clean_material_grade(material.material_grade)
-            grade_item = QTableWidgetItem(clean_grade)
-            grade_item.setData(Qt.UserRole, material.id)
-            grade_item.setToolTip(f"Полное название: {material.material_grade}")
-            self.materials_table.setItem(row, 1, grade_item)
-            
-            # Тип проката
-            type_display = get_material_type_display(material.material_type)
-            type_item = QTableWidgetItem(type_display)
-            type_item.setToolTip(f"Тип материала: {type_display}")
-            self.materials_table.setItem(row, 2, type_item)
-            
-            # Размер (диаметр/толщина)
-            size_text = ""
-            if material.material_type == MaterialType.ROD.value:
-                size_text = f"Ø{material.diameter}" if material.diameter else ""
-            elif material.material_type == MaterialType.SHEET.value:
-                size_text = f"{material.thickness} мм" if material.thickness else ""
-            elif material.material_type == MaterialType.PIPE.value:
-                size_text = f"Ø{material.diameter}x{material.wall_thickness}" if material.diameter else ""
-            else:
-                size_text = f"Ø{material.diameter}" if material.diameter else f"{material.thickness} мм" if material.thickness else ""
-            
-            size_item = QTableWidgetItem(size_text)
-            size_tooltip = "Размер: " + size_text
-            if material.material_type == MaterialType.SHEET.value and material.width and material.length:
-                size_tooltip += f"\nШирина: {material.width} мм\nДлина: {material.length} мм"
-            size_item.setToolTip(size_tooltip)
-            self.materials_table.setItem(row, 3, size_item)
-            
-            # Плавка
-            melt_item = QTableWidgetItem(material.melt_number)
-            melt_item.setToolTip(f"Плавка: {material.melt_number}")
-            self.materials_table.setItem(row, 4, melt_item)
-            
-            # Сертификат (номер + дата)
-            cert_date_str = material.certificate_date.strftime("%d.%m.%Y") if material.certificate_date else ""
-            cert_text = f"{material.certificate_number} от {cert_date_str}" if cert_date_str else material.certificate_number
-            cert_item = QTableWidgetItem(cert_text)
-            cert_tooltip = f"Сертификат: {cert_text}"
-            if material.certificate_file_path:
-                cert_tooltip += f"\nФайл: {material.certificate_file_path}"
-            cert_item.setToolTip(cert_tooltip)
-            self.materials_table.setItem(row, 5, cert_item)
-            
-            # Партия
-            batch_item = QTableWidgetItem(material.batch_number or "")
-            batch_item.setToolTip(f"Партия: {material.batch_number or 'Не указана'}")
-            self.materials_table.setItem(row, 6, batch_item)
-            
-            # Общая длина/площадь
-            length_text = ""
-            if material.material_type == MaterialType.SHEET.value and material.width and material.length:
-                # Для листов считаем площадь в м²
-                area = (material.width * material.length) / 1000000  # переводим из мм² в м²
-                length_text = f"{area:.2f} м²"
-            elif material.material_type == MaterialType.ROD.value or material.material_type == MaterialType.PIPE.value:
-                # Для прутков и труб считаем общую длину в метрах
-                if hasattr(material, 'sizes') and material.sizes:
-                    total_length = sum(size.length * size.quantity for size in material.sizes) / 1000  # переводим из мм в м
-                    length_text = f"{total_length:.2f} м"
-            
-            length_item = QTableWidgetItem(length_text)
-            if material.material_type == MaterialType.SHEET.value:
-                length_item.setToolTip(f"Площадь: {length_text}")
-            else:
-                length_item.setToolTip(f"Общая длина: {length_text}")
-            self.materials_table.setItem(row, 7, length_item)
-            
-            # Дата прихода
-            created_date = material.created_at.strftime("%d.%m.%Y") if material.created_at else ""
-            date_item = QTableWidgetItem(created_date)
-            if material.created_at:
-                date_item.setToolTip(f"Создано: {material.created_at.strftime('%d.%m.%Y %H:%M:%S')}")
-            self.materials_table.setItem(row, 8, date_item)
-            
-            # Статус (теперь в колонке 9)
-            status_display = get_status_display_name(material.status)
-            status_item = QTableWidgetItem(status_display)
-            status_item.setToolTip(f"Статус: {status_display}")
-            
-            # Подсветка статусов разными цветами
-            if material.status == MaterialStatus.RECEIVED.value:
-                status_item.setBackground(QBrush(QColor(240, 240, 240)))  # Светло-серый
-            elif material.status == MaterialStatus.PENDING_QC.value:
-                status_item.setBackground(QBrush(QColor(255, 230, 180)))  # Светло-оранжевый
-            elif material.status == MaterialStatus.QC_PASSED.value:
-                status_item.setBackground(QBrush(QColor(200, 255, 200)))  # Светло-зеленый
-            elif material.status == MaterialStatus.QC_FAILED.value:
-                status_item.setBackground(QBrush(QColor(255, 200, 200)))  # Светло-красный
-            elif material.status == MaterialStatus.LAB_TESTING.value:
-                status_item.setBackground(QBrush(QColor(200, 220, 255)))  # Светло-синий
-            elif material.status == MaterialStatus.READY_FOR_USE.value:
-                status_item.setBackground(QBrush(QColor(180, 255, 180)))  # Ярко-зеленый
-            elif material.status == MaterialStatus.REJECTED.value:
-                status_item.setBackground(QBrush(QColor(255, 180, 180)))  # Ярко-красный
-            elif material.status == MaterialStatus.EDIT_REQUESTED.value:
-                status_item.setBackground(QBrush(QColor(255, 255, 180)))  # Светло-желтый
-            
-            self.materials_table.setItem(row, 9, status_item)
-            
-            # Поставщик (теперь в колонке 10)
-            supplier = db.query(Supplier).filter(Supplier.id == material.supplier_id).first()
-            supplier_name = supplier.name if supplier else "Неизвестно"
-            supplier_item = QTableWidgetItem(supplier_name)
-            if supplier:
-                supplier_tooltip = f"Поставщик: {supplier.name}"
-                if supplier.contact_info:
-                    supplier_tooltip += f"\nКонтакты: {supplier.contact_info}"
-                supplier_item.setToolTip(supplier_tooltip)
-            self.materials_table.setItem(row, 10, supplier_item)
-            
-            # Выделяем цветом записи с запросом на редактирование
-            if material.edit_requested:
-                for col in range(0, 11):  # Теперь 11 колонок
-                    if col != 9:  # Не меняем цвет столбца статуса, так как он уже имеет свой цвет
-                        item = self.materials_table.item(row, col)
-                        if item:
-                            item.setBackground(QBrush(QColor(255, 255, 200)))  # Светло-желтый
-        
-        # После заполнения таблицы данными:
-        self.materials_table.resizeColumnsToContents()
-        
-        # Ограничим максимальную ширину колонок и установим минимальную
-        min_widths = {
-            0: 80,   # Номер заказа
-            1: 120,  # Марка материала 
-            2: 80,   # Вид проката
-            3: 80,   # Размер
-            4: 80,   # Плавка
-            5: 100,  # Сертификат
-            6: 80,   # Партия
-            7: 120,  # Общая длина/площадь
-            8: 80,   # Дата прихода
-            9: 100,  # Статус
-            10: 100  # Поставщик
-        }
-        
-        max_width = 300
-        for col in range(self.materials_table.columnCount()):
-            current_width = self.materials_table.columnWidth(col)
-            min_width = min_widths.get(col, 60)
-            
-            # Устанавливаем ширину между минимальной и максимальной
-            if current_width < min_width:
-                self.materials_table.setColumnWidth(col, min_width)
-            elif current_width > max_width:
-                self.materials_table.setColumnWidth(col, max_width)
-                
-        # Марка материала может растягиваться
-        self.materials_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+    def fetch_materials_page(self, db, filters, cursor, limit):
+        """Страница материалов для таблицы (новые первыми, в фоновом потоке)"""
+        query = self.filter_query(materials_query(db, with_sizes=True), filters)
+        materials, next_cursor = keyset_page(query, MaterialEntry, cursor, limit)
+        return [self.material_row(material) for material in materials], next_cursor
+    
+    def count_materials(self, db, filters):
+        """Количество материалов, подходящих под фильтры"""
+        query = materials_count_query(db, func.count(MaterialEntry.id), join_supplier='quick_search' in filters)
+        return self.filter_query(query, filters).scalar()
+    
+    def fetch_material_changes(self, db, filters, since):
+        """Материалы, измененные после отметки since (в фоновом потоке)"""
+        query = self.filter_query(materials_query(db, with_sizes=True), filters)
+        changes = changes_since(db, query, MaterialEntry, since)
+        if changes is None:
+            return None
+        materials, changed_ids, watermark = changes
+        return [self.material_row(material) for material in materials], changed_ids, watermark
+    
+    def material_row(self, material):
+        """Строка таблицы для материала (поставщик и размеры уже загружены)"""
+        supplier = material.supplier
+        # Очищаем марку материала от стандарта
+        clean_grade = clean_material_grade(material.material_grade)
+        type_display = get_material_type_display(material.material_type)
+        
+        # Размер (диаметр/толщина)
+        size_text = ""
+        if material.material_type == MaterialType.ROD.value:
+            size_text = f"Ø{material.diameter}" if material.diameter else ""
+        elif material.material_type == MaterialType.SHEET.value:
+            size_text = f"{material.thickness} мм" if material.thickness else ""
+        elif material.material_type == MaterialType.PIPE.value:
+            size_text = f"Ø{material.diameter}x{material.wall_thickness}" if material.diameter else ""
+        else:
+            size_text = f"Ø{material.diameter}" if material.diameter else f"{material.thickness} мм" if material.thickness else ""
+        
+        size_tooltip = "Размер: " + size_text
+        if material.material_type == MaterialType.SHEET.value and material.width and material.length:
+            size_tooltip += f"\nШирина: {material.width} мм\nДлина: {material.length} мм"
+        
+        # Сертификат (номер + дата)
+        cert_date_str = material.certificate_date.strftime("%d.%m.%Y") if material.certificate_date else ""
+        cert_text = f"{material.certificate_number} от {cert_date_str}" if cert_date_str else material.certificate_number
+        cert_tooltip = f"Сертификат: {cert_text}"
+        if material.certificate_file_path:
+            cert_tooltip += f"\nФайл: {material.certificate_file_path}"
+        
+        # Общая длина/площадь
+        length_text = ""
+        if material.material_type == MaterialType.SHEET.value and material.width and material.length:
+            # Для листов считаем площадь в м²
+            area = (material.width * material.length) / 1000000  # переводим из мм² в м²
+            length_text = f"{area:.2f} м²"
+        elif material.material_type == MaterialType.ROD.value or material.material_type == MaterialType.PIPE.value:
+            # Для прутков и труб считаем общую длину в метрах
+            if material.sizes:
+                total_length = sum(size.length * size.quantity for size in material.sizes) / 1000  # переводим из мм в м
+                length_text = f"{total_length:.2f} м"
+        
+        if material.material_type == MaterialType.SHEET.value:
+            length_tooltip = f"Площадь: {length_text}"
+        else:
+            length_tooltip = f"Общая длина: {length_text}"
+        
+        # Дата прихода
+        created_date = material.created_at.strftime("%d.%m.%Y") if material.created_at else ""
+        date_tooltip = f"Создано: {material.created_at.strftime('%d.%m.%Y %H:%M:%S')}" if material.created_at else None
+        
+        status_display = get_status_display_name(material.status)
+        
+        supplier_name = supplier.name if supplier else "Неизвестно"
+        supplier_tooltip = None
+        if supplier:
+            supplier_tooltip = f"Поставщик: {supplier.name}"
+            if supplier.contact_info:
+                supplier_tooltip += f"\nКонтакты: {supplier.contact_info}"
+        
+        values = (
+            material.order_number or "", clean_grade, type_display, size_text, material.melt_number,
+            cert_text, material.batch_number or "", length_text, created_date, status_display, supplier_name
+        )
+        tooltips = (
+            f"Заказ: {material.order_number or 'Не указан'}",
+            f"Полное название: {material.material_grade}",
+            f"Тип материала: {type_display}",
+            size_tooltip,
+            f"Плавка: {material.melt_number}",
+            cert_tooltip,
+            f"Партия: {material.batch_number or 'Не указана'}",
+            length_tooltip,
+            date_tooltip,
+            f"Статус: {status_display}",
+            supplier_tooltip
+        )
+        
+        # Выделяем цветом записи с запросом на редактирование (кроме столбца статуса)
+        row_color = EDIT_REQUESTED_COLOR if material.edit_requested else None
+        colors = [row_color] * len(MATERIALS_HEADERS)
+        colors[STATUS_COLUMN] = STATUS_COLORS.get(material.status)
+        
+        # Дата прихода сортируется по дате, а не по тексту
+        sort_keys = [None] * len(MATERIALS_HEADERS)
+        sort_keys[DATE_COLUMN] = material.created_at
+        
+        return GridRow(material.id, values, tooltips, tuple(colors), tuple(sort_keys),
+                       (material.created_at, material.id))
     
     def load_materials(self):
         """Load materials from database"""
+        # Полный список: сбрасываем фильтры расширенного поиска
+        self.advanced_filters = {}
+        self.apply_filters()
+    
+    def apply_filters(self):
+        """Перезагрузить таблицу с текущими фильтрами"""
+        self.filter_timer.stop()
         self.table_status_label.setText("Загрузка данных...")
-        db = SessionLocal()
-        try:
-            # Get all materials that are not deleted
-            materials = db.query(MaterialEntry).filter(
-                MaterialEntry.is_deleted == False
-            ).order_by(desc(MaterialEntry.created_at)).all()
-            
-            # Update table
-            self.update_materials_table(materials, db)
-            
-            # Update status
-            self.parent.status_bar.showMessage(f"Загружено {len(materials)} материалов")
-            self.table_status_label.setText("Данные загружены")
-            self.records_count_label.setText(f"Записей: {len(materials)}")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке материалов: {str(e)}")
-        finally:
-            db.close()
+        self.materials_model.reload(self.current_filters())
+    
+    def refresh_materials(self):
+        """Обновить только измененные материалы (после редактирования или смены статуса)"""
+        self.materials_model.refresh_changed()
     
     def filter_materials(self):
         """Filter materials by search text and status"""
-        search_text = self.search_input.text().lower()
-        status = self.status_filter.currentData()
-        
-        visible_count = 0
+        self.filter_timer.start()
+    
+    def on_materials_loaded(self, loaded, total):
+        """Обновить строку состояния после загрузки страницы"""
+        if loaded <= self.materials_model.page_size:
+            # Первая страница: подгоняем ширину колонок
+            self.materials_table.fit_columns(MIN_COLUMN_WIDTHS, stretch_column=1)
         
-        for row in range(self.materials_table.rowCount()):
-            show_row = True
-            
-            # Check if row matches search text
-            if search_text:
-                match_found = False
-                for col in range(0, 10):  # Проверяем колонки 0-9 (информация о материале, без статуса)
-                    item = self.materials_table.item(row, col)
-                    if item and search_text in item.text().lower():
-                        match_found = True
-                        break
-                
-                if not match_found:
-                    show_row = False
-            
-            # Check if row matches status filter
-            if status and show_row:
-                status_item = self.materials_table.item(row, 9)  # Статус теперь в колонке 9
-                status_display = status_item.text() if status_item else ""
-                if get_status_display_name(status) != status_display:
-                    show_row = False
-            
-            # Show/hide row
-            self.materials_table.setRowHidden(row, not show_row)
-            
-            if show_row:
-                visible_count += 1
+        self.update_table_status(loaded, total)
+    
+    def update_table_status(self, loaded, total):
+        """Строка состояния таблицы: сколько материалов загружено и найдено"""
+        filters = self.materials_model.filters
+        if self.advanced_filters:
+            self.parent.status_bar.showMessage(f"Найдено {total} материалов по фильтрам")
+        else:
+            self.parent.status_bar.showMessage(f"Загружено {total} материалов")
         
-        # Update status
-        if search_text or status:
-            self.table_status_label.setText(f"Отфильтровано: {search_text if search_text else ''} {get_status_display_name(status) if status else ''}")
-            self.records_count_label.setText(f"Показано: {visible_count} / {self.materials_table.rowCount()}")
+        if filters.get('quick_search') or filters.get('quick_status') or self.advanced_filters:
+            status = filters.get('quick_status')
+            self.table_status_label.setText(
+                f"Отфильтровано: {filters.get('quick_search', '')} {get_status_display_name(status) if status else ''}"
+            )
+            self.records_count_label.setText(f"Показано: {loaded} / {total}")
         else:
-            self.table_status_label.setText("Все записи")
-            self.records_count_label.setText(f"Записей: {self.materials_table.rowCount()}")
+            self.table_status_label.setText("Данные загружены")
+            self.records_count_label.setText(f"Записей: {total}" if loaded == total else f"Записей: {loaded} / {total}")
+    
+    def on_materials_load_failed(self, message):
+        """Ошибка загрузки материалов"""
+        self.table_status_label.setText("Ошибка загрузки")
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке материалов: {message}")
     
     def show_add_material_form(self):
         """Show form to add new material"""
@@ -568,19 +564,15 @@ class WarehouseTab(QWidget):
         self.entry_form.setWindowTitle("Добавление материала")
         self.entry_form.setWindowIcon(IconProvider.create_material_entry_icon())
         if self.entry_form.exec() == QDialog.DialogCode.Accepted:
-            self.load_materials()
+            self.refresh_materials()
     
     def edit_selected_material(self):
         """Редактирование выбранного материала"""
         # Проверяем, есть ли выделенные строки
-        selected_rows = self.materials_table.selectedItems()
-        if not selected_rows:
+        material_id = self.materials_table.selected_key()
+        if material_id is None:
             QMessageBox.warning(self, "Предупреждение", "Выберите материал для редактирования")
             return
-            
-        # Получаем ID материала
-        row = selected_rows[0].row()
-        material_id = self.materials_table.item(row, 1).data(Qt.UserRole)
         
         # Проверяем статус материала
         db = SessionLocal()
@@ -616,7 +608,7 @@ class WarehouseTab(QWidget):
                     "Запрос на редактирование отправлен сотруднику ОТК. "
                     "Вы сможете редактировать запись после подтверждения."
                 )
-                self.load_materials()
+                self.refresh_materials()
                 return
                 
             # Если материал еще не в процессе проверки или это подтвержденный запрос,
@@ -632,7 +624,7 @@ class WarehouseTab(QWidget):
                     material.edit_comment = None
                     material.status = MaterialStatus.RECEIVED.value
                     db.commit()
-                self.load_materials()
+                self.refresh_materials()
                 
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка при обработке запроса: {str(e)}")
@@ -641,32 +633,26 @@ class WarehouseTab(QWidget):
     
     def change_status(self):
         """Изменение статуса выбранного материала"""
-        selected_items = self.materials_table.selectedItems()
-        if not selected_items:
+        material_id = self.materials_table.selected_key()
+        if material_id is None:
             QMessageBox.warning(self, "Предупреждение", "Выберите материал для изменения статуса")
             return
         
-        row = selected_items[0].row()
-        material_id = self.materials_table.item(row, 1).data(Qt.UserRole)
-        
         from ui.dialogs.status_change_dialog import StatusChangeDialog
         dialog = StatusChangeDialog(material_id, self.user, self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self.load_materials()
+            self.refresh_materials()
     
     def generate_sample_qr(self):
         """Генерация QR-кода для образца"""
-        selected_items = self.materials_table.selectedItems()
-        if not selected_items:
+        material_id = self.materials_table.selected_key()
+        if material_id is None:
             # Открываем общий генератор QR-кодов
             from ui.dialogs.qr_dialog import QRDialog
             dialog = QRDialog(parent=self)
             dialog.exec()
             return
         
-        row = selected_items[0].row()
-        material_id = self.materials_table.item(row, 1).data(Qt.UserRole)
-        
         # Получаем данные материала для формирования кода образца
         db = SessionLocal()
         try:
@@ -715,15 +701,15 @@ class WarehouseTab(QWidget):
         dialog = CertificateBrowserDialog(self)
         dialog.exec()
     
-    def on_table_double_click(self, row, column):
-        """Обработка двойного клика по ячейке таблицы"""
+    def on_table_double_click(self, material_id):
+        """Обработка двойного клика по строке таблицы"""
         # Редактировать материал при двойном клике
         self.edit_selected_material()
     
     def show_context_menu(self, position):
         """Показать контекстное меню для таблицы материалов"""
-        selected_items = self.materials_table.selectedItems()
-        if not selected_items:
+        material_id = self.materials_table.selected_key()
+        if material_id is None:
             return
             
         menu = QMenu(self)
@@ -742,9 +728,6 @@ class WarehouseTab(QWidget):
         menu.addSeparator()
         
         # Пункт меню "Просмотреть сертификат"
-        row = selected_items[0].row()
-        material_id = self.materials_table.item(row, 1).data(Qt.UserRole)
-        
         db = SessionLocal()
         try:
             material = db.query(MaterialEntry).filter(MaterialEntry.id == material_id).first()
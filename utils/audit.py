@@ -1,14 +1,23 @@
 """
 Модуль для аудита действий пользователей и системных событий.
 Записывает все действия в базу данных для последующего анализа.
+
+Записи не пишутся в базу в потоке вызывающего кода (в том числе в UI):
+log_action ставит их в очередь, фоновый AuditWriter вставляет их пакетами
+в одной транзакции.
 """
 
+import os
+import json
+import queue
+import atexit
 import logging
 import datetime
+import threading
 import traceback
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
-from database.connection import Base, SessionLocal
+from database.connection import Base, SessionLocal, engine
 from typing import Optional, Dict, Any, Union
 
 # Настройка логгера
@@ -32,28 +41,226 @@ class AuditLog(Base):
     details = Column(Text, nullable=True)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
     
+    # Объект действия и значения до/после (JSON)
+    entity_type = Column(String(50), nullable=True)  # material, ...
+    entity_id = Column(Integer, nullable=True)
+    old_value = Column(Text, nullable=True)
+    new_value = Column(Text, nullable=True)
+    
     # Отношения
     user = relationship("User", backref="audit_logs")
+    
+    __table_args__ = (
+        Index("ix_audit_log_entity", "entity_type", "entity_id", "timestamp"),
+        Index("ix_audit_log_user_timestamp", "user_id", "timestamp"),
+        Index("ix_audit_log_timestamp", "timestamp"),
+    )
+
+def to_json(value: Any) -> Optional[str]:
+    """Значение для old_value/new_value (None остается NULL)"""
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+# Параметры фоновой записи
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500")) / 1000
+
+class AuditWriter:
+    """
+    Фоновая запись журнала аудита пакетами
+    
+    Записи накапливаются в ограниченной очереди и вставляются одной
+    транзакцией каждые flush_interval секунд или по batch_size записей.
+    Если очередь переполнена или база недоступна, запись попадает только
+    в файловый лог (logs/audit.log) и учитывается в счетчиках.
+    """
+    
+    def __init__(self, max_queue_size: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL):
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.counters = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self._counters_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Число обработанных записей (записанных или ушедших в файловый лог)
+        self._processed = 0
+        self._processed_changed = threading.Condition()
+    
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """
+        Поставить запись в очередь
+        
+        Returns:
+            bool: False, если очередь переполнена (запись только в файловом логе)
+        """
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self._count("dropped")
+            logger.error(f"Audit queue is full, entry not saved to database: {entry}")
+            return False
+        self._count("enqueued")
+        return True
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Дождаться записи всех записей, поставленных в очередь до вызова
+        
+        Записи, поступающие во время ожидания, не учитываются, поэтому
+        ожидание конечно и при непрерывном потоке записей.
+        
+        Returns:
+            bool: True, если записи обработаны за отведенное время
+        """
+        with self._counters_lock:
+            target = self.counters["enqueued"]
+        with self._processed_changed:
+            if not self._thread or not self._thread.is_alive():
+                return self._processed >= target
+            return self._processed_changed.wait_for(
+                lambda: self._processed >= target or not self._thread.is_alive(), timeout
+            ) and self._processed >= target
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Записать оставшиеся записи и остановить поток (при завершении приложения)"""
+        if self._thread and self._thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                logger.error("Audit queue is full on shutdown, some entries may be lost")
+                return
+            self._thread.join(timeout)
+    
+    def stats(self) -> Dict[str, int]:
+        """Глубина очереди и счетчики записей"""
+        with self._counters_lock:
+            stats = dict(self.counters)
+        stats["queue_depth"] = self.queue.qsize()
+        return stats
+    
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+    
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._counters_lock:
+            self.counters[name] += value
+    
+    def _run(self) -> None:
+        try:
+            self._process_queue()
+        finally:
+            # Разбудить flush, если поток завершился
+            with self._processed_changed:
+                self._processed_changed.notify_all()
+    
+    def _process_queue(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            
+            deadline = datetime.datetime.now() + datetime.timedelta(seconds=self.flush_interval)
+            while True:
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                remaining = (deadline - datetime.datetime.now()).total_seconds()
+                try:
+                    item = self.queue.get(timeout=max(remaining, 0)) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            
+            self._write_batch(batch)
+            # task_done для каждой полученной записи, включая маркер остановки
+            for _ in range(len(batch) + (1 if stopping else 0)):
+                self.queue.task_done()
+            with self._processed_changed:
+                self._processed += len(batch)
+                self._processed_changed.notify_all()
+    
+    def _write_batch(self, batch: list) -> None:
+        if not batch:
+            return
+        try:
+            with engine.begin() as conn:
+                conn.execute(AuditLog.__table__.insert(), batch)
+            self._count("written", len(batch))
+            self._count("batches")
+        except Exception as e:
+            self._count("failed", len(batch))
+            logger.error(f"Failed to write {len(batch)} audit entries to database: {str(e)}")
+            for entry in batch:
+                logger.error(f"Audit fallback: {entry}")
 
-def log_action(user_id: Optional[int], action: str, details: Optional[str] = None) -> None:
+audit_writer = AuditWriter()
+atexit.register(audit_writer.stop)
+
+def log_action(user_id: Optional[int], action: str, details: Optional[str] = None,
+               entity_type: Optional[str] = None, entity_id: Optional[int] = None,
+               old_value: Any = None, new_value: Any = None) -> None:
     """
     Записывает действие пользователя в журнал аудита
     
+    Запись выполняется в фоне (см. AuditWriter), время действия
+    фиксируется в момент вызова.
+    
     Args:
         user_id: ID пользователя (может быть None для системных действий)
         action: Название действия (например, "login", "create_material", "edit_material")
         details: Дополнительные детали (например, ID материала, описание действия)
+        entity_type: Тип объекта действия (например, "material")
+        entity_id: ID объекта действия
+        old_value: Значение до изменения (сохраняется как JSON)
+        new_value: Значение после изменения или данные действия (JSON)
     """
-    try:
-        db = SessionLocal()
-        audit_entry = AuditLog(user_id=user_id, action=action, details=details)
-        db.add(audit_entry)
-        db.commit()
-        logger.info(f"Audit: User {user_id} - {action} - {details}")
-    except Exception as e:
-        logger.error(f"Failed to log audit entry: {str(e)}")
-    finally:
-        db.close()
+    audit_writer.submit({
+        "user_id": user_id,
+        "action": action,
+        "details": details,
+        "timestamp": datetime.datetime.utcnow(),
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "old_value": to_json(old_value),
+        "new_value": to_json(new_value),
+    })
+    logger.info(f"Audit: User {user_id} - {action} - {details}")
+
+def flush_audit_log(timeout: Optional[float] = None) -> bool:
+    """
+    Дождаться записи журнала аудита в базу (перед чтением журнала)
+    
+    Args:
+        timeout: Максимальное время ожидания в секундах
+        
+    Returns:
+        bool: True, если все записи сохранены
+    """
+    return audit_writer.flush(timeout)
+
+def get_audit_writer_stats() -> Dict[str, int]:
+    """
+    Состояние фоновой записи аудита
+    
+    Returns:
+        dict: queue_depth, enqueued, written, dropped, failed, batches
+    """
+    return audit_writer.stats()
 
 def log_material_action(user_id: int, action: str, material_id: int, data: Optional[Dict[str, Any]] = None) -> None:
     """
@@ -68,9 +275,10 @@ def log_material_action(user_id: int, action: str, material_id: int, data: Optio
     details = f"Material ID: {material_id}"
     if data:
         # Добавляем информацию о изменениях или другие данные
-        details += f", Data: {str(data)}"
+        details += f", Data: {to_json(data)}"
     
-    log_action(user_id, f"material_{action}", details)
+    log_action(user_id, f"material_{action}", details,
+               entity_type="material", entity_id=material_id, new_value=data or None)
 
 def log_qc_action(user_id: int, action: str, material_id: int, qc_data: Optional[Dict[str, Any]] = None) -> None:
     """
@@ -85,9 +293,10 @@ def log_qc_action(user_id: int, action: str, material_id: int, qc_data: Optional
     details = f"Material ID: {material_id}"
     if qc_data:
         # Добавляем информацию о проверке
-        details += f", QC Data: {str(qc_data)}"
+        details += f", QC Data: {to_json(qc_data)}"
     
-    log_action(user_id, f"qc_{action}", details)
+    log_action(user_id, f"qc_{action}", details,
+               entity_type="material", entity_id=material_id, new_value=qc_data or None)
 
 def log_lab_action(user_id: int, action: str, material_id: int, sample_id: Optional[int] = None, 
                   test_data: Optional[Dict[str, Any]] = None) -> None:
@@ -102,12 +311,16 @@ def log_lab_action(user_id: int, action: str, material_id: int, sample_id: Optio
         test_data: Данные испытания
     """
     details = f"Material ID: {material_id}"
+    payload = {}
     if sample_id:
         details += f", Sample ID: {sample_id}"
+        payload["sample_id"] = sample_id
     if test_data:
-        details += f", Test Data: {str(test_data)}"
+        details += f", Test Data: {to_json(test_data)}"
+        payload["test_data"] = test_data
     
-    log_action(user_id, f"lab_{action}", details)
+    log_action(user_id, f"lab_{action}", details,
+               entity_type="material", entity_id=material_id, new_value=payload or None)
 
 def log_status_change(user_id: int, material_id: int, old_status: str, new_status: str) -> None:
     """
@@ -120,7 +333,8 @@ def log_status_change(user_id: int, material_id: int, old_status: str, new_statu
         new_status: Новый статус
     """
     details = f"Material ID: {material_id}, Old Status: {old_status}, New Status: {new_status}"
-    log_action(user_id, "status_change", details)
+    log_action(user_id, "status_change", details, entity_type="material", entity_id=material_id,
+               old_value=old_status, new_value=new_status)
 
 def log_error(error: Exception, user_id: Optional[int] = None, context: Optional[str] = None) -> None:
     """
@@ -218,10 +432,10 @@ def get_material_audit_history(material_id: int, limit: int = 100) -> list:
     """
     db = SessionLocal()
     try:
-        # Ищем записи, где в деталях упоминается ID материала
-        material_id_str = f"Material ID: {material_id}"
+        # Точечный поиск по индексу ix_audit_log_entity
         audit_entries = db.query(AuditLog).filter(
-            AuditLog.details.like(f"%{material_id_str}%")
+            AuditLog.entity_type == "material",
+            AuditLog.entity_id == material_id
         ).order_by(AuditLog.timestamp.desc()).limit(limit).all()
         
         return audit_entries
@@ -248,9 +462,159 @@ def get_recent_activity(limit: int = 100) -> list:
     finally:
         db.close()
 
+AUDIT_PAGE_SIZE = 200
+# Совпадений, ранжируемых при поиске по релевантности
+AUDIT_RANKED_MATCHES = 1000
+
+def build_fts_query(search: str) -> Optional[str]:
+    """
+    Строка поиска -> запрос FTS5: все слова обязательны, каждое ищется
+    как префикс, спецсимволы FTS экранируются
+    """
+    terms = [term.replace('"', '""') for term in search.split()]
+    return " ".join(f'"{term}"*' for term in terms) or None
+
+def audit_fts_available(db) -> bool:
+    """Создан ли полнотекстовый индекс audit_log_fts"""
+    return bool(db.execute(text(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='audit_log_fts'"
+    )).scalar())
+
+def fetch_audit_page(search: Optional[str] = None, date_from: Optional[datetime.datetime] = None,
+                     date_to: Optional[datetime.datetime] = None, user_id: Optional[int] = None,
+                     cursor: Optional[tuple] = None, limit: int = AUDIT_PAGE_SIZE, order: str = "time"):
+    """
+    Страница журнала аудита
+    
+    С поисковой строкой записи ищутся по индексу audit_log_fts (с
+    выделенным фрагментом деталей). Порядок:
+    
+    - "time" - по времени, новые первыми; следующая страница выбирается
+      по ключу (timestamp, id) последней записи, а не через OFFSET;
+    - "relevance" (только с поиском по индексу) - по релевантности (bm25).
+      Оценка bm25 меняется при добавлении и архивировании записей, поэтому
+      первая страница ранжирует не более AUDIT_RANKED_MATCHES лучших
+      совпадений один раз, а курсор хранит этот список: следующие страницы
+      берутся из него и не пропускают и не повторяют записи.
+    
+    Args:
+        search: Поисковый запрос
+        date_from: Начало периода
+        date_to: Конец периода
+        user_id: ID пользователя
+        cursor: Курсор, возвращенный для предыдущей страницы с тем же order
+        limit: Размер страницы
+        order: "time" или "relevance"
+        
+    Returns:
+        tuple: (список словарей timestamp, user_name, action, details, snippet, id;
+                курсор следующей страницы или None)
+    """
+    db = SessionLocal()
+    try:
+        fts_query = build_fts_query(search) if search else None
+        use_fts = fts_query is not None and audit_fts_available(db)
+        
+        conditions = []
+        params = {"limit": limit + 1}
+        
+        if use_fts:
+            select_sql = """
+                SELECT a.timestamp, COALESCE(u.full_name, u.username), a.action, a.details,
+                       snippet(audit_log_fts, 1, '«', '»', '…', 16), a.id
+                FROM audit_log_fts f
+                JOIN audit_log a ON a.id = f.rowid
+                LEFT JOIN users u ON a.user_id = u.id
+            """
+            conditions.append("audit_log_fts MATCH :match")
+            params["match"] = fts_query
+        else:
+            select_sql = """
+                SELECT a.timestamp, COALESCE(u.full_name, u.username), a.action, a.details,
+                       NULL, a.id
+                FROM audit_log a
+                LEFT JOIN users u ON a.user_id = u.id
+            """
+            if search:
+                # Индекс еще не создан: поиск подстроки
+                conditions.append("(a.action LIKE :search OR a.details LIKE :search)")
+                params["search"] = f"%{search}%"
+        
+        if date_from:
+            conditions.append("a.timestamp >= :date_from")
+            params["date_from"] = date_from
+        if date_to:
+            conditions.append("a.timestamp <= :date_to")
+            params["date_to"] = date_to
+        if user_id:
+            conditions.append("a.user_id = :user_id")
+            params["user_id"] = user_id
+        
+        if use_fts and order == "relevance":
+            rows, next_cursor = _fetch_ranked_page(db, select_sql, conditions, params, cursor, limit)
+        else:
+            if cursor:
+                conditions.append("(a.timestamp < :cursor_key OR (a.timestamp = :cursor_key AND a.id < :cursor_id))")
+                params["cursor_key"], params["cursor_id"] = cursor
+            
+            query = select_sql
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += " ORDER BY a.timestamp DESC, a.id DESC LIMIT :limit"
+            
+            rows = db.execute(text(query), params).fetchall()
+            
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = (rows[-1][0], rows[-1][5])
+        
+        entries = [{
+            "timestamp": row[0],
+            "user_name": row[1],
+            "action": row[2],
+            "details": row[3],
+            "snippet": row[4],
+            "id": row[5],
+        } for row in rows]
+        
+        return entries, next_cursor
+    finally:
+        db.close()
+
+def _fetch_ranked_page(db, select_sql: str, conditions: list, params: dict, cursor: Optional[tuple], limit: int):
+    """
+    Страница поиска по релевантности
+    
+    Курсор - (id совпадений в порядке bm25, позиция следующей страницы).
+    Записи, архивированные после первой страницы, пропускаются.
+    """
+    where = " WHERE " + " AND ".join(conditions)
+    if cursor:
+        ranked_ids, position = cursor
+    else:
+        ranked_ids = tuple(row[0] for row in db.execute(text(
+            "SELECT a.id FROM audit_log_fts f JOIN audit_log a ON a.id = f.rowid"
+            + where + " ORDER BY f.rank, a.id LIMIT :ranked_limit"
+        ), {**params, "ranked_limit": AUDIT_RANKED_MATCHES}))
+        position = 0
+    
+    page_ids = ranked_ids[position:position + limit]
+    rows = []
+    if page_ids:
+        id_params = {f"id_{i}": entry_id for i, entry_id in enumerate(page_ids)}
+        found = {row[5]: row for row in db.execute(text(
+            select_sql + where + " AND a.id IN (" + ", ".join(f":{name}" for name in id_params) + ")"
+        ), {**params, **id_params})}
+        rows = [found[entry_id] for entry_id in page_ids if entry_id in found]
+    
+    position += limit
+    next_cursor = (ranked_ids, position) if position < len(ranked_ids) else None
+    return rows, next_cursor
+
 def search_audit_log(query: str, limit: int = 100) -> list:
     """
-    Поиск в журнале аудита
+    Поиск в журнале аудита (по релевантности)
     
     Args:
         query: Поисковый запрос
@@ -259,12 +623,12 @@ def search_audit_log(query: str, limit: int = 100) -> list:
     Returns:
         list: Список записей аудита
     """
+    entries, _ = fetch_audit_page(search=query, limit=limit, order="relevance")
+    ids = [entry["id"] for entry in entries]
+    
     db = SessionLocal()
     try:
-        audit_entries = db.query(AuditLog).filter(
-            AuditLog.details.like(f"%{query}%") | AuditLog.action.like(f"%{query}%")
-        ).order_by(AuditLog.timestamp.desc()).limit(limit).all()
-        
-        return audit_entries
+        audit_entries = {entry.id: entry for entry in db.query(AuditLog).filter(AuditLog.id.in_(ids)).all()}
+        return [audit_entries[entry_id] for entry_id in ids if entry_id in audit_entries]
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -0,0 +1,318 @@
+"""
+Хранение журнала аудита: перенос старых записей в помесячные архивы
+
+Записи audit_log старше AUDIT_RETENTION_DAYS переносятся в файлы
+AUDIT_ARCHIVE_DIR/audit_YYYY_MM.db (таблица audit_log той же структуры)
+и удаляются из рабочей базы. Архивы подключаются (ATTACH) только на время
+переноса или поиска по архивному периоду. После переноса рабочая база
+сжимается, если в ней накопилось много свободных страниц.
+"""
+
+import os
+import logging
+import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+
+from database.connection import engine, DATABASE_PATH
+
+logger = logging.getLogger(__name__)
+
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "365"))
+AUDIT_ARCHIVE_DIR = os.getenv(
+    "AUDIT_ARCHIVE_DIR", os.path.join(os.path.dirname(DATABASE_PATH) or ".", "archive")
+)
+DEFAULT_BATCH_SIZE = 5000
+
+# Доля свободных страниц, начиная с которой выполняется VACUUM
+VACUUM_FREE_RATIO = 0.2
+
+AUDIT_COLUMNS = ("id, user_id, action, details, timestamp, "
+                 "entity_type, entity_id, old_value, new_value")
+
+ARCHIVE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.audit_log (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        action VARCHAR(100) NOT NULL,
+        details TEXT,
+        timestamp DATETIME,
+        entity_type VARCHAR(50),
+        entity_id INTEGER,
+        old_value TEXT,
+        new_value TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.ix_audit_log_timestamp ON audit_log (timestamp)",
+    "CREATE INDEX IF NOT EXISTS archive.ix_audit_log_entity ON audit_log (entity_type, entity_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS archive.ix_audit_log_user_timestamp ON audit_log (user_id, timestamp)",
+]
+
+def _format_timestamp(value: datetime.datetime) -> str:
+    """Формат, в котором SQLAlchemy хранит DateTime в SQLite"""
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def _month_bounds(month: str) -> Tuple[datetime.datetime, datetime.datetime]:
+    """'YYYY-MM' -> (начало месяца, начало следующего месяца)"""
+    start = datetime.datetime.strptime(month, "%Y-%m")
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start, end
+
+def archive_path(month: str) -> str:
+    """Путь к архиву месяца 'YYYY-MM'"""
+    return os.path.join(AUDIT_ARCHIVE_DIR, f"audit_{month.replace('-', '_')}.db")
+
+def list_archive_months() -> List[str]:
+    """Месяцы ('YYYY-MM'), для которых есть архивы, новые первыми"""
+    if not os.path.isdir(AUDIT_ARCHIVE_DIR):
+        return []
+    months = []
+    for name in os.listdir(AUDIT_ARCHIVE_DIR):
+        if name.startswith("audit_") and name.endswith(".db"):
+            months.append(name[len("audit_"):-len(".db")].replace("_", "-"))
+    return sorted(months, reverse=True)
+
+def archive_months_in_range(date_from: Optional[datetime.date] = None,
+                            date_to: Optional[datetime.date] = None) -> List[str]:
+    """Архивные месяцы, пересекающиеся с периодом, новые первыми"""
+    if isinstance(date_from, datetime.datetime):
+        date_from = date_from.date()
+    if isinstance(date_to, datetime.datetime):
+        date_to = date_to.date()
+    result = []
+    for month in list_archive_months():
+        start, end = _month_bounds(month)
+        if date_from and end.date() <= date_from:
+            continue
+        if date_to and start.date() > date_to:
+            continue
+        result.append(month)
+    return result
+
+def _attach(conn, path: str) -> None:
+    conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (path,))
+
+def _detach(conn) -> None:
+    conn.rollback()
+    conn.exec_driver_sql("DETACH DATABASE archive")
+
+def archive_audit_log(retention_days: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                      progress=None) -> Dict[str, int]:
+    """
+    Перенести записи старше срока хранения в помесячные архивы
+
+    Записи переносятся пакетами по id: INSERT OR IGNORE в архив и DELETE
+    из рабочей базы. В режиме WAL транзакция с подключенной базой атомарна
+    только для каждого файла в отдельности, поэтому перенос сделан
+    повторяемым: после сбоя запись, уже попавшая в архив, просто удаляется
+    при следующем запуске. Триггеры audit_log_fts удаляют перенесенные
+    записи и из полнотекстового индекса.
+
+    Args:
+        retention_days: Срок хранения в рабочей базе (дни)
+        batch_size: Количество записей в одной транзакции
+        progress: Функция progress(month, moved, total)
+
+    Returns:
+        dict: Месяц -> количество перенесенных записей
+    """
+    retention_days = AUDIT_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=retention_days)
+    os.makedirs(AUDIT_ARCHIVE_DIR, exist_ok=True)
+
+    with engine.connect() as conn:
+        months = [row[0] for row in conn.exec_driver_sql(
+            "SELECT DISTINCT strftime('%Y-%m', timestamp) FROM audit_log "
+            "WHERE timestamp < ? ORDER BY 1", (_format_timestamp(cutoff),)
+        ) if row[0]]
+
+    moved = {}
+    for month in months:
+        month_start, month_end = _month_bounds(month)
+        range_from = _format_timestamp(month_start)
+        range_to = _format_timestamp(min(month_end, cutoff))
+        moved[month] = 0
+
+        with engine.connect() as conn:
+            total = conn.exec_driver_sql(
+                "SELECT COUNT(*) FROM audit_log WHERE timestamp >= ? AND timestamp < ?",
+                (range_from, range_to)
+            ).scalar()
+            _attach(conn, archive_path(month))
+            try:
+                for statement in ARCHIVE_DDL:
+                    conn.exec_driver_sql(statement)
+                conn.commit()
+
+                while True:
+                    first_id, last_id = conn.exec_driver_sql(
+                        "SELECT MIN(id), MAX(id) FROM (SELECT id FROM main.audit_log "
+                        "WHERE timestamp >= ? AND timestamp < ? ORDER BY id LIMIT ?)",
+                        (range_from, range_to, batch_size)
+                    ).one()
+                    if first_id is None:
+                        break
+
+                    params = (first_id, last_id, range_from, range_to)
+                    condition = "id BETWEEN ? AND ? AND timestamp >= ? AND timestamp < ?"
+                    conn.exec_driver_sql(
+                        f"INSERT OR IGNORE INTO archive.audit_log ({AUDIT_COLUMNS}) "
+                        f"SELECT {AUDIT_COLUMNS} FROM main.audit_log WHERE {condition}", params
+                    )
+                    result = conn.exec_driver_sql(f"DELETE FROM main.audit_log WHERE {condition}", params)
+                    conn.commit()
+
+                    moved[month] += result.rowcount
+                    if progress:
+                        progress(month, moved[month], total)
+            finally:
+                _detach(conn)
+
+        logger.info(f"Audit archive {month}: moved {moved[month]} rows to {archive_path(month)}")
+
+    return moved
+
+def compact_live_database(force: bool = False) -> bool:
+    """
+    Сжать рабочую базу после переноса записей
+
+    Индекс audit_log_fts оптимизируется всегда, VACUUM выполняется, если
+    свободных страниц больше VACUUM_FREE_RATIO (или force).
+
+    Returns:
+        bool: True, если выполнен VACUUM
+    """
+    with engine.connect() as conn:
+        has_fts = conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='audit_log_fts'"
+        ).scalar()
+        if has_fts:
+            conn.exec_driver_sql("INSERT INTO audit_log_fts(audit_log_fts) VALUES('optimize')")
+            conn.commit()
+
+        page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        freelist_count = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    if not force and (not page_count or freelist_count / page_count < VACUUM_FREE_RATIO):
+        return False
+
+    # VACUUM нельзя выполнять внутри транзакции
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    logger.info(f"Live database compacted ({freelist_count} of {page_count} pages were free)")
+    return True
+
+def apply_audit_retention(retention_days: Optional[int] = None, progress=None) -> Dict[str, object]:
+    """
+    Политика хранения целиком: перенос в архивы, сжатие, отчет о размерах
+
+    Returns:
+        dict: moved (месяц -> записей), vacuumed, report (см. get_audit_storage_report)
+    """
+    moved = archive_audit_log(retention_days, progress=progress)
+    vacuumed = compact_live_database() if any(moved.values()) else False
+    return {"moved": moved, "vacuumed": vacuumed, "report": get_audit_storage_report()}
+
+def get_audit_storage_report() -> Dict[str, object]:
+    """
+    Размеры рабочей базы и архивов журнала аудита
+
+    Returns:
+        dict: live (файл, размер, свободные страницы, записей аудита,
+              самая старая запись) и archives (по месяцам: файл, размер, записей)
+    """
+    with engine.connect() as conn:
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+        page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        freelist_count = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        audit_rows, oldest = conn.exec_driver_sql("SELECT COUNT(*), MIN(timestamp) FROM audit_log").one()
+
+    wal_path = f"{DATABASE_PATH}-wal"
+    report = {
+        "live": {
+            "path": DATABASE_PATH,
+            "size_bytes": page_size * page_count,
+            "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            "free_bytes": page_size * freelist_count,
+            "audit_rows": audit_rows,
+            "oldest_audit_entry": oldest,
+        },
+        "archives": [],
+    }
+
+    for month in list_archive_months():
+        path = archive_path(month)
+        with engine.connect() as conn:
+            _attach(conn, path)
+            try:
+                rows = conn.exec_driver_sql("SELECT COUNT(*) FROM archive.audit_log").scalar()
+            finally:
+                _detach(conn)
+        report["archives"].append({
+            "month": month,
+            "path": path,
+            "size_bytes": os.path.getsize(path),
+            "audit_rows": rows,
+        })
+
+    return report
+
+def fetch_archive_page(month: str, search: Optional[str] = None,
+                       date_from: Optional[datetime.datetime] = None,
+                       date_to: Optional[datetime.datetime] = None, user_id: Optional[int] = None,
+                       cursor: Optional[tuple] = None, limit: int = 200):
+    """
+    Страница записей из архива месяца (по времени, новые первыми)
+
+    Формат записей и курсора как у utils.audit.fetch_audit_page. Поиск
+    в архивах - по подстроке: к ним обращаются редко.
+    """
+    conditions = []
+    params = {"limit": limit + 1}
+    if search:
+        conditions.append("(a.action LIKE :search OR a.details LIKE :search)")
+        params["search"] = f"%{search}%"
+    if date_from:
+        conditions.append("a.timestamp >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        conditions.append("a.timestamp <= :date_to")
+        params["date_to"] = date_to
+    if user_id:
+        conditions.append("a.user_id = :user_id")
+        params["user_id"] = user_id
+    if cursor:
+        conditions.append("(a.timestamp < :cursor_key OR (a.timestamp = :cursor_key AND a.id < :cursor_id))")
+        params["cursor_key"], params["cursor_id"] = cursor
+
+    query = """
+        SELECT a.timestamp, COALESCE(u.full_name, u.username), a.action, a.details, a.id
+        FROM archive.audit_log a
+        LEFT JOIN main.users u ON a.user_id = u.id
+    """
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY a.timestamp DESC, a.id DESC LIMIT :limit"
+
+    with engine.connect() as conn:
+        _attach(conn, archive_path(month))
+        try:
+            rows = conn.execute(text(query), params).fetchall()
+        finally:
+            _detach(conn)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1][0], rows[-1][4])
+
+    entries = [{
+        "timestamp": row[0],
+        "user_name": row[1],
+        "action": row[2],
+        "details": row[3],
+        "snippet": None,
+        "id": row[4],
+    } for row in rows]
+    return entries, next_cursor
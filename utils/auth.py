@@ -1,7 +1,47 @@
 import os
+import logging
 import bcrypt
 from sqlalchemy.orm import Session
 from models.models import User
+# Registers session listeners that reset the notification recipient cache
+# when users are created or edited (admin tab, scripts)
+import utils.recipient_directory  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# Cost factor for new password hashes. Existing hashes with a different cost
+# are transparently rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+
+def hash_password(password: str, rounds: int = None) -> str:
+    """
+    Hash a password with bcrypt.
+    
+    Args:
+        password (str): Plain text password
+        rounds (int): bcrypt cost factor, BCRYPT_ROUNDS by default
+        
+    Returns:
+        str: bcrypt hash
+    """
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+def get_hash_rounds(hashed_password: str) -> int:
+    """
+    Get the cost factor of a bcrypt hash ("$2b$12$..." -> 12).
+    
+    Returns:
+        int: Cost factor or None if the hash is not in bcrypt format
+    """
+    try:
+        return int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash was created with a cost other than BCRYPT_ROUNDS"""
+    return get_hash_rounds(hashed_password) != BCRYPT_ROUNDS
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -36,6 +76,17 @@ def authenticate_user(db: Session, username: str, password: str) -> User:
     if not user.is_active:
         return None
     
+    if needs_rehash(user.password_hash):
+        # The password is known only here, so the hash is upgraded on login
+        try:
+            user.password_hash = hash_password(password)
+            db.commit()
+            db.refresh(user)
+            logger.info(f"Password hash for '{username}' rehashed with cost {BCRYPT_ROUNDS}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to rehash password for '{username}': {str(e)}")
+    
     return user
 
 def get_current_user(db: Session, username: str) -> User:
@@ -78,7 +129,7 @@ def create_user(db: Session, username: str, password: str, full_name: str, role:
         return None
     
     # Hash the password
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = hash_password(password)
     
     # Create new user
     new_user = User(
@@ -117,7 +168,7 @@ def update_user(db: Session, user_id: int, **kwargs) -> User:
     
     # Update password if provided
     if 'password' in kwargs:
-        password_hash = bcrypt.hashpw(kwargs['password'].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = hash_password(kwargs['password'])
         kwargs['password_hash'] = password_hash
         del kwargs['password']
     
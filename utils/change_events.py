@@ -0,0 +1,199 @@
+"""
+Рассылка событий изменений клиентам (Server-Sent Events)
+
+Один поток ChangeEventBroadcaster на процесс API читает журнал change_log
+(utils.change_log) и рассылает каждое событие всем подписчикам, вместо
+того чтобы каждый клиент (вкладки настольного приложения, веб-дашборд)
+опрашивал базу сам. Подписка - GET /events (text/event-stream):
+
+- id события - seq журнала; при переподключении клиент передает
+  Last-Event-ID (или ?since=seq) и получает пропущенное из change_log;
+- раз в CHANGE_EVENTS_HEARTBEAT секунд отправляется комментарий, чтобы
+  клиент отличал тишину от обрыва связи;
+- подписчик, не успевающий читать, отключается и при переподключении
+  догоняет по журналу.
+
+Пока подписка недоступна, клиенты возвращаются к опросу.
+"""
+
+import os
+import json
+import atexit
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from database.connection import engine
+from utils.change_log import ChangeLogReader, load_change_events
+
+logger = logging.getLogger(__name__)
+
+CHANGE_EVENTS_POLL_MS = int(os.getenv("CHANGE_EVENTS_POLL_MS", "250"))
+CHANGE_EVENTS_HEARTBEAT = float(os.getenv("CHANGE_EVENTS_HEARTBEAT", "15"))
+# Событий в очереди одного подписчика, после которых он отключается
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Через сколько мс клиенту переподключаться после обрыва (поле retry)
+CLIENT_RETRY_MS = 3000
+
+class Subscription:
+    """Очередь событий одного подписчика в его event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, events: List[Dict]) -> None:
+        """Добавить пачку событий (вызывается в loop подписчика)"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(events)
+        except asyncio.QueueFull:
+            # Подписчик отстал: отключаем, он догонит по журналу
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+class ChangeEventBroadcaster:
+    """
+    Единственный читатель change_log в процессе и рассылка подписчикам
+
+    Пример:
+        change_broadcaster.start()                # при запуске API
+        return change_event_response(request)     # в обработчике GET /events
+    """
+
+    def __init__(self, poll_interval_ms: int = CHANGE_EVENTS_POLL_MS):
+        self.poll_interval = poll_interval_ms / 1000
+        self.counters = {"published": 0, "subscribers": 0, "overflowed": 0}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Запустить поток чтения журнала (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-events", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def subscribe(self) -> Subscription:
+        """Подписаться на события (из event loop подписчика)"""
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+            self.counters["subscribers"] = len(self._subscribers)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+            self.counters["subscribers"] = len(self._subscribers)
+            if subscription.overflowed:
+                self.counters["overflowed"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики: published (событий), subscribers (сейчас), overflowed (отключено отставших)"""
+        with self._lock:
+            return dict(self.counters)
+
+    def _publish(self, events: List[Dict]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.counters["published"] += len(events)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, events)
+            except RuntimeError:
+                # Event loop подписчика уже закрыт
+                self.unsubscribe(subscription)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with engine.connect() as conn:
+                    reader = ChangeLogReader(conn)
+                    logger.info(f"Рассылка событий изменений запущена с seq {reader.last_seq}")
+                    while not self._stop.is_set():
+                        events = reader.poll()
+                        if events:
+                            self._publish(events)
+                        self._stop.wait(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Ошибка чтения журнала изменений: {e}")
+                self._stop.wait(10)
+
+def replay_events(after_seq: int) -> List[Dict]:
+    """Все события журнала после after_seq (для переподключившегося клиента)"""
+    events = []
+    with engine.connect() as conn:
+        while True:
+            batch = load_change_events(conn, after_seq)
+            if not batch:
+                return events
+            events += batch
+            after_seq = batch[-1]["seq"]
+
+def format_event(event: Dict) -> str:
+    """Событие в формате text/event-stream"""
+    return f"id: {event['seq']}\nevent: change\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+async def stream_events(since: Optional[int] = None):
+    """Поток text/event-stream для одного подписчика"""
+    subscription = change_broadcaster.subscribe()
+    try:
+        yield f"retry: {CLIENT_RETRY_MS}\n\n"
+        if since is not None:
+            # Подписка уже оформлена, поэтому между журналом и рассылкой нет разрыва
+            for event in await run_in_threadpool(replay_events, since):
+                yield format_event(event)
+                since = event["seq"]
+        while True:
+            try:
+                events = await asyncio.wait_for(subscription.queue.get(), timeout=CHANGE_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if events is None:
+                return  # Отстал - клиент переподключится с Last-Event-ID
+            for event in events:
+                if since is None or event["seq"] > since:
+                    yield format_event(event)
+                    since = event["seq"]
+    finally:
+        change_broadcaster.unsubscribe(subscription)
+
+def change_event_response(request, since: Optional[int] = None) -> StreamingResponse:
+    """
+    Ответ GET /events
+
+    Args:
+        request: Запрос (заголовок Last-Event-ID при переподключении)
+        since: seq, после которого нужны события (None - только новые)
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    change_broadcaster.start()
+    return StreamingResponse(
+        stream_events(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+change_broadcaster = ChangeEventBroadcaster()
+atexit.register(change_broadcaster.stop)
@@ -0,0 +1,171 @@
+"""
+Чтение журнала изменений change_log
+
+Триггеры (scripts/migrations/add_change_log.py) записывают в change_log
+каждую вставку, изменение и удаление строк отслеживаемых таблиц с
+возрастающим номером seq. Наблюдатель держит одно соединение, опрашивает
+PRAGMA data_version (меняется, только когда другое соединение
+зафиксировало транзакцию, и не читает таблиц) и лишь после изменения
+читает записи с seq больше последнего прочитанного.
+
+События (load_change_events) дополняются данными материалов и испытаний,
+нужными для уведомлений, одним запросом на таблицу. Их читают и
+наблюдатель клиента (ui/components/real_time_notifications.py), и
+рассылка событий API (utils.change_events).
+
+Записи старше CHANGE_LOG_RETENTION_DAYS удаляются планировщиком.
+"""
+
+import os
+import datetime
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, text
+
+from database.connection import engine
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "7"))
+CHANGE_BATCH_SIZE = 500
+
+# Операции в change_log.op
+OP_INSERT = "I"
+OP_UPDATE = "U"
+OP_DELETE = "D"
+
+MATERIALS_SQL = text(
+    "SELECT id, material_grade, batch_number, supplier_id, status FROM material_entries "
+    "WHERE id IN :ids AND is_deleted = 0"
+).bindparams(bindparam("ids", expanding=True))
+
+LAB_TESTS_SQL = text(
+    "SELECT id, is_passed, test_type_id, "
+    "(SELECT MIN(sample_id) FROM lab_test_samples WHERE lab_test_id = lab_tests.id) AS sample_id "
+    "FROM lab_tests WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+def data_version(conn) -> int:
+    """PRAGMA data_version соединения conn (меняется после фиксации транзакций других соединений)"""
+    return conn.exec_driver_sql("PRAGMA data_version").scalar()
+
+def latest_seq(conn) -> int:
+    """Номер последней записи журнала (0, если журнал пуст)"""
+    return conn.execute(text("SELECT COALESCE(MAX(seq), 0) FROM change_log")).scalar()
+
+def read_changes(conn, after_seq: int, limit: int = CHANGE_BATCH_SIZE) -> List:
+    """
+    Записи журнала после after_seq
+
+    Returns:
+        list: Строки (seq, table_name, row_id, op, detail) по возрастанию seq
+    """
+    return conn.execute(
+        text("SELECT seq, table_name, row_id, op, detail FROM change_log "
+             "WHERE seq > :after_seq ORDER BY seq LIMIT :limit"),
+        {"after_seq": after_seq, "limit": limit}
+    ).fetchall()
+
+def load_change_events(conn, after_seq: int, limit: int = CHANGE_BATCH_SIZE) -> List[Dict]:
+    """
+    События журнала после after_seq с данными для уведомлений
+
+    Returns:
+        list: {seq, table, id, op, detail, data}; data - словарь материала
+              (вставка и смена статуса) или испытания (завершение), иначе None
+    """
+    changes = read_changes(conn, after_seq, limit)
+
+    material_ids = {change.row_id for change in changes if change.table_name == "material_entries"
+                    and (change.op == OP_INSERT or (change.op == OP_UPDATE and change.detail))}
+    test_ids = {change.row_id for change in changes
+                if change.table_name == "lab_tests" and change.detail == "completed"}
+
+    materials, tests = {}, {}
+    if material_ids:
+        for row in conn.execute(MATERIALS_SQL, {"ids": sorted(material_ids)}):
+            materials[row.id] = {
+                'id': row.id,
+                'grade': row.material_grade,
+                'batch': row.batch_number,
+                'supplier': row.supplier_id,
+                'status': row.status,
+            }
+    if test_ids:
+        for row in conn.execute(LAB_TESTS_SQL, {"ids": sorted(test_ids)}):
+            tests[row.id] = {
+                'id': row.id,
+                'sample_id': row.sample_id,
+                'passed': row.is_passed,
+                'test_type': row.test_type_id,
+            }
+
+    events = []
+    for change in changes:
+        data = None
+        if change.row_id in material_ids and change.table_name == "material_entries":
+            data = materials.get(change.row_id)
+        elif change.row_id in test_ids and change.table_name == "lab_tests":
+            data = tests.get(change.row_id)
+        events.append({
+            "seq": change.seq,
+            "table": change.table_name,
+            "id": change.row_id,
+            "op": change.op,
+            "detail": change.detail,
+            "data": data,
+        })
+    return events
+
+class ChangeLogReader:
+    """
+    Новые события журнала на одном соединении
+
+    Пока PRAGMA data_version соединения не изменилась, poll() не читает
+    таблиц.
+
+    Пример:
+        with engine.connect() as conn:
+            reader = ChangeLogReader(conn)
+            events = reader.poll()
+    """
+
+    def __init__(self, conn, last_seq: Optional[int] = None):
+        self.conn = conn
+        # По умолчанию - только изменения, сделанные после создания
+        self.last_seq = latest_seq(conn) if last_seq is None else last_seq
+        self._version = None
+
+    def poll(self) -> List[Dict]:
+        """События после последнего прочитанного (пустой список, если изменений нет)"""
+        version = data_version(self.conn)
+        if version == self._version:
+            return []
+        self._version = version
+        events = []
+        try:
+            while True:
+                batch = load_change_events(self.conn, self.last_seq)
+                if not batch:
+                    return events
+                events += batch
+                self.last_seq = batch[-1]["seq"]
+        finally:
+            self.conn.rollback()  # Не держим транзакцию чтения между опросами
+
+def prune_change_log(retention_days: Optional[int] = None) -> int:
+    """
+    Удалить записи журнала старше retention_days дней
+
+    Returns:
+        int: Количество удаленных записей
+    """
+    days = CHANGE_LOG_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    with engine.begin() as conn:
+        # changed_at заполняется CURRENT_TIMESTAMP: "ГГГГ-ММ-ДД ЧЧ:ММ:СС" (UTC)
+        deleted = conn.execute(text("DELETE FROM change_log WHERE changed_at < :cutoff"),
+                               {"cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S")}).rowcount
+    logger.info(f"Журнал изменений: удалено {deleted} записей старше {days} дн.")
+    return deleted
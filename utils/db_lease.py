@@ -0,0 +1,94 @@
+"""
+Аренда роли фонового процесса в таблице dispatcher_leases
+
+Клиенты работают с одной базой, и некоторые фоновые задачи (отправка
+уведомлений, обслуживание базы) должен выполнять только один из них.
+Роль закрепляется строкой с именем аренды: владелец продлевает ее раньше,
+чем истечет ttl, остальные только читают строку и берут аренду, когда она
+освобождена или просрочена (владелец остановлен или завис).
+
+Пример:
+    lease = DbLease("maintenance", ttl=180)
+    if lease.acquire():    # взять или продлить
+        run_job()
+    lease.release()        # при остановке
+"""
+
+import os
+import uuid
+import socket
+import logging
+import datetime
+
+from sqlalchemy import DateTime, text
+
+from database.connection import engine
+
+logger = logging.getLogger(__name__)
+
+class DbLease:
+    """Аренда с именем name, продлеваемая на ttl секунд"""
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held = False
+
+    def acquire(self) -> bool:
+        """
+        Взять или продлить аренду
+
+        Пока аренду держит другой живой процесс, выполняется только чтение
+        одной строки.
+
+        Returns:
+            bool: True, если этот процесс - владелец аренды
+        """
+        now = datetime.datetime.utcnow()
+        with engine.connect() as conn:
+            lease = conn.execute(
+                text("SELECT holder, expires_at FROM dispatcher_leases WHERE name = :name")
+                .columns(expires_at=DateTime),
+                {"name": self.name}
+            ).first()
+
+        if lease is not None and lease.holder != self.holder_id and lease.expires_at > now:
+            acquired = False
+        else:
+            with engine.begin() as conn:
+                if lease is None:
+                    conn.execute(
+                        text("INSERT OR IGNORE INTO dispatcher_leases (name, holder, expires_at) "
+                             "VALUES (:name, :holder, :now)"),
+                        {"name": self.name, "holder": self.holder_id, "now": now}
+                    )
+                # Условие повторяется в UPDATE: другой процесс мог взять аренду после чтения
+                acquired = conn.execute(
+                    text("UPDATE dispatcher_leases SET holder = :holder, expires_at = :expires_at "
+                         "WHERE name = :name AND (holder = :holder OR expires_at <= :now)"),
+                    {"name": self.name, "holder": self.holder_id, "now": now,
+                     "expires_at": now + datetime.timedelta(seconds=self.ttl)}
+                ).rowcount == 1
+
+        if acquired != self.held:
+            if acquired:
+                logger.info(f"Аренда {self.name} взята процессом {self.holder_id}")
+            else:
+                logger.warning(f"Аренда {self.name} потеряна процессом {self.holder_id}")
+        self.held = acquired
+        return acquired
+
+    def release(self) -> None:
+        """Освободить аренду, чтобы другой процесс сразу ее взял"""
+        if not self.held:
+            return
+        self.held = False
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    text("UPDATE dispatcher_leases SET expires_at = :now WHERE name = :name AND holder = :holder"),
+                    {"name": self.name, "holder": self.holder_id, "now": datetime.datetime.utcnow()}
+                )
+        except Exception as e:
+            logger.error(f"Не удалось освободить аренду {self.name}: {e}")
@@ -0,0 +1,63 @@
+"""
+Модуль для работы с ежедневной сводкой материалов (daily_material_rollup)
+
+Сводка обновляется инкрементально обработчиком models.update_material_rollup,
+здесь - полная сверка и выборки для дашбордов.
+"""
+
+import logging
+from sqlalchemy import func, text
+from database.connection import SessionLocal
+from models.models import DailyMaterialRollup, bump_data_versions
+
+logger = logging.getLogger(__name__)
+
+REBUILD_ROLLUP_SQL = """
+    INSERT INTO daily_material_rollup
+        (day, supplier_id, material_grade, material_type, status,
+         materials_count, quantity_sum, last_created_at)
+    SELECT date(created_at), supplier_id, material_grade, material_type,
+           COALESCE(status, 'received'), COUNT(*), COALESCE(SUM(quantity), 0), MAX(created_at)
+    FROM material_entries
+    WHERE is_deleted = 0 AND created_at IS NOT NULL
+    GROUP BY date(created_at), supplier_id, material_grade, material_type, COALESCE(status, 'received')
+"""
+
+def rebuild_rollup() -> int:
+    """
+    Пересчитывает сводку по material_entries в одной транзакции
+    (ночная сверка: исправляет расхождения после массовых UPDATE в обход ORM)
+
+    Returns:
+        int: Количество строк сводки
+    """
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM daily_material_rollup"))
+        result = db.execute(text(REBUILD_ROLLUP_SQL))
+        bump_data_versions(db.connection(), ["daily_material_rollup"])
+        db.commit()
+        logger.info(f"Daily material rollup rebuilt: {result.rowcount} rows")
+        return result.rowcount
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def get_status_totals(db) -> dict:
+    """
+    Количество неудаленных материалов по статусам
+
+    Args:
+        db: Сессия базы данных
+
+    Returns:
+        dict: Статус -> количество
+    """
+    rows = db.query(
+        DailyMaterialRollup.status,
+        func.sum(DailyMaterialRollup.materials_count)
+    ).group_by(DailyMaterialRollup.status).all()
+
+    return {status: count or 0 for status, count in rows}
@@ -0,0 +1,202 @@
+"""
+Объединение уведомлений в дайджесты
+
+Массовые события (например, приемка партии из 40 плавок) не отправляются
+каждому получателю отдельными сообщениями. queue_event() записывает
+событие в notification_digest_events в транзакции вызывающего кода, а
+диспетчер уведомлений периодически вызывает flush_digests():
+
+- события получателя копятся NOTIFY_DIGEST_WINDOW секунд с момента первого
+  из них и уходят одним сообщением: количество по типам и статусам и
+  первые NOTIFY_DIGEST_TOP_ITEMS событий;
+- повторные события по одному материалу (несколько переходов статуса)
+  сводятся к последнему;
+- в тихие часы получателя (notification_preferences или
+  NOTIFY_QUIET_HOURS) события копятся и приходят одним дайджестом после
+  их окончания;
+- единственное событие отправляется своим обычным сообщением.
+
+Срочные уведомления идут в обход дайджестов
+(utils.notification_outbox.enqueue_notification).
+"""
+
+import os
+import logging
+import datetime
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from database.connection import engine
+from models.models import NotificationDigestEvent, NotificationOutbox, NotificationPreference
+from utils.material_utils import get_status_display_name
+from utils.notification_outbox import OUTBOX_PENDING, wake_dispatcher_on_commit
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_DIGEST_WINDOW = int(os.getenv("NOTIFY_DIGEST_WINDOW", "120"))
+NOTIFY_DIGEST_TOP_ITEMS = int(os.getenv("NOTIFY_DIGEST_TOP_ITEMS", "10"))
+# Тихие часы по умолчанию, например "22:00-07:00" (пусто - без тихих часов)
+NOTIFY_QUIET_HOURS = os.getenv("NOTIFY_QUIET_HOURS", "")
+
+EVENT_TYPE_NAMES = {
+    "status_change": "Изменение статуса",
+    "new_material": "Новые материалы",
+    "test_result": "Результаты испытаний",
+}
+
+# Типы событий, из которых по материалу остается только последнее
+DEDUPLICATED_EVENT_TYPES = {"status_change"}
+
+def queue_event(db: Session, chat_id: str, event_type: str, summary: str, message: str,
+                material_id: Optional[int] = None, to_status: Optional[str] = None,
+                user_id: Optional[int] = None) -> NotificationDigestEvent:
+    """
+    Добавить событие в дайджест получателя (без commit)
+
+    Args:
+        db: Сессия, в которой выполняется само изменение
+        chat_id: Telegram ID получателя
+        event_type: Тип события (status_change, new_material, test_result)
+        summary: Короткая строка события для дайджеста
+        message: Полное сообщение, если событие окажется единственным
+        material_id: Материал (повторные смены его статуса сводятся к последней)
+        to_status: Новый статус материала (для подсчета по статусам)
+        user_id: Получатель (для тихих часов)
+    """
+    item = NotificationDigestEvent(chat_id=str(chat_id), user_id=user_id, event_type=event_type,
+                                   material_id=material_id, to_status=to_status, summary=summary,
+                                   message=message)
+    db.add(item)
+    if NOTIFY_DIGEST_WINDOW <= 0:
+        wake_dispatcher_on_commit(db)
+    return item
+
+def parse_quiet_hours(value: Optional[str]) -> Optional[Tuple[datetime.time, datetime.time]]:
+    """'22:00-07:00' -> (22:00, 07:00) или None"""
+    if not value or "-" not in value:
+        return None
+    try:
+        start, end = (datetime.datetime.strptime(part.strip(), "%H:%M").time() for part in value.split("-", 1))
+    except ValueError:
+        logger.error(f"Неверный формат тихих часов: {value}")
+        return None
+    return start, end
+
+def in_quiet_hours(quiet_hours: Optional[Tuple[datetime.time, datetime.time]],
+                   moment: Optional[datetime.time] = None) -> bool:
+    """Попадает ли время (местное) в тихие часы; интервал может переходить через полночь"""
+    if not quiet_hours:
+        return False
+    start, end = quiet_hours
+    if start == end:
+        return False
+    moment = moment or datetime.datetime.now().time()
+    if start < end:
+        return start <= moment < end
+    return moment >= start or moment < end
+
+def build_digest(events: List) -> Tuple[str, str]:
+    """
+    Сообщение для событий одного получателя
+
+    Returns:
+        tuple: (тип события для outbox, текст сообщения)
+    """
+    # Повторные события по материалу сводятся к последнему
+    items = OrderedDict()
+    for position, event in enumerate(events):
+        if event.event_type in DEDUPLICATED_EVENT_TYPES and event.material_id is not None:
+            key = (event.event_type, event.material_id)
+        else:
+            key = ("event", position)
+        items.pop(key, None)
+        items[key] = event
+    items = list(items.values())
+
+    if len(items) == 1:
+        return items[0].event_type, items[0].message
+
+    first_at, last_at = events[0].created_at, events[-1].created_at
+    minutes = max(int((last_at - first_at).total_seconds() // 60), 1)
+    lines = [f"📬 <b>Сводка уведомлений ППСД</b>: {len(items)} событий за {minutes} мин.", ""]
+
+    for event_type, count in Counter(item.event_type for item in items).most_common():
+        lines.append(f"• {EVENT_TYPE_NAMES.get(event_type, event_type)}: {count}")
+    status_counts = Counter(item.to_status for item in items if item.to_status)
+    for status, count in status_counts.most_common():
+        lines.append(f"    → {get_status_display_name(status)}: {count}")
+
+    lines.append("")
+    for item in items[:NOTIFY_DIGEST_TOP_ITEMS]:
+        lines.append(f"• {item.summary}")
+    if len(items) > NOTIFY_DIGEST_TOP_ITEMS:
+        lines.append(f"…и еще {len(items) - NOTIFY_DIGEST_TOP_ITEMS}")
+
+    return "digest", "\n".join(lines)
+
+def _quiet_hours_by_user(conn) -> Dict[int, Optional[Tuple[datetime.time, datetime.time]]]:
+    preferences = NotificationPreference.__table__
+    rows = conn.execute(select(preferences.c.user_id, preferences.c.quiet_hours_start, preferences.c.quiet_hours_end)
+                        .where(preferences.c.quiet_hours_start.isnot(None),
+                               preferences.c.quiet_hours_end.isnot(None))).fetchall()
+    return {row.user_id: parse_quiet_hours(f"{row.quiet_hours_start}-{row.quiet_hours_end}") for row in rows}
+
+def flush_digests(force: bool = False) -> int:
+    """
+    Свести накопленные события в сообщения outbox
+
+    Вызывается диспетчером уведомлений на каждом цикле.
+
+    Args:
+        force: Не ждать окончания окна (тихие часы учитываются всегда)
+
+    Returns:
+        int: Количество поставленных в outbox сообщений
+    """
+    events = NotificationDigestEvent.__table__
+    now = datetime.datetime.utcnow()
+    due_before = now if force else now - datetime.timedelta(seconds=NOTIFY_DIGEST_WINDOW)
+    default_quiet_hours = parse_quiet_hours(NOTIFY_QUIET_HOURS)
+
+    with engine.connect() as conn:
+        chats = conn.execute(select(events.c.chat_id, func.min(events.c.created_at).label("first_at"),
+                                    func.max(events.c.user_id).label("user_id"))
+                             .group_by(events.c.chat_id)).fetchall()
+        quiet_hours = _quiet_hours_by_user(conn) if chats else {}
+
+    queued = 0
+    for chat in chats:
+        if chat.first_at > due_before:
+            continue
+        if in_quiet_hours(quiet_hours.get(chat.user_id, default_quiet_hours)):
+            continue
+        try:
+            queued += _flush_chat(chat.chat_id, now)
+        except Exception as e:
+            # Другой диспетчер мог забрать события этого чата одновременно с нами
+            logger.warning(f"Дайджест для чата {chat.chat_id} не сформирован: {e}")
+    return queued
+
+def _flush_chat(chat_id: str, now: datetime.datetime) -> int:
+    """Заменить события чата одним сообщением outbox (в одной транзакции)"""
+    events_table = NotificationDigestEvent.__table__
+    with engine.begin() as conn:
+        events = conn.execute(select(events_table).where(events_table.c.chat_id == chat_id)
+                              .order_by(events_table.c.id)).fetchall()
+        if not events:
+            return 0
+
+        deleted = conn.execute(delete(events_table).where(events_table.c.chat_id == chat_id,
+                                                          events_table.c.id <= events[-1].id)).rowcount
+        if deleted != len(events):
+            raise RuntimeError("события уже обработаны другим диспетчером")
+
+        event_type, message = build_digest(events)
+        conn.execute(insert(NotificationOutbox.__table__).values(
+            channel="telegram", chat_id=chat_id, event_type=event_type, message=message,
+            status=OUTBOX_PENDING, attempts=0, next_attempt_at=now, created_at=events[0].created_at
+        ))
+    return 1
@@ -0,0 +1,415 @@
+"""
+Фоновый диспетчер уведомлений из таблицы notification_outbox
+
+Один долгоживущий поток с собственным event loop забирает из outbox
+готовые к отправке записи и отправляет их в Telegram. Встроенный
+диспетчер запускается в каждом клиенте, но работает только один на всю
+базу - владелец аренды "notifications" в dispatcher_leases: он
+продлевает ее каждый цикл, остальные раз в NOTIFY_POLL_INTERVAL секунд
+проверяют, не освободилась ли она (процесс остановлен или аренда не
+продлевалась NOTIFY_LEASE_TTL секунд). Поэтому outbox опрашивает один
+процесс, а лимиты частоты и ответы RetryAfter учитываются в одном месте:
+
+- записи берутся в работу атомарно (pending -> sending), поэтому несколько
+  запущенных диспетчеров не отправят одно сообщение дважды; записи,
+  зависшие в sending после аварийного завершения, возвращаются в очередь;
+- ошибки сети и ответы RetryAfter приводят к повтору с экспоненциальной
+  задержкой, ошибки запроса (неверный чат, бот заблокирован) - сразу к failed;
+- сообщения в один чат отправляются по порядку и не чаще
+  NOTIFY_CHAT_INTERVAL секунд, общий поток ограничен NOTIFY_GLOBAL_RATE
+  сообщений в секунду (лимиты Telegram Bot API);
+- перед каждой пачкой накопленные события дайджестов
+  (utils.notification_digest) сводятся в сообщения outbox;
+- счетчики и задержка доставки доступны через stats().
+
+Диспетчер запускается вместе с приложением. Его можно запустить
+отдельным процессом (python -m utils.notification_dispatcher) и отключить
+во всех клиентах: NOTIFY_DISPATCHER=off; если отдельный процесс работает
+рядом со встроенными, отправляет тот, кто держит аренду.
+"""
+
+import os
+import atexit
+import asyncio
+import datetime
+import inspect
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import DateTime, text
+from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+try:
+    from telegram.error import Forbidden
+except ImportError:  # python-telegram-bot 13
+    from telegram.error import Unauthorized as Forbidden
+
+from database.connection import engine
+from utils.db_lease import DbLease
+from utils.notification_digest import flush_digests
+from utils.notification_outbox import OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT, OUTBOX_FAILED
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_DISPATCHER = os.getenv("NOTIFY_DISPATCHER", "embedded")  # embedded или off
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "10"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "20"))
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", "1.0"))
+NOTIFY_GLOBAL_RATE = float(os.getenv("NOTIFY_GLOBAL_RATE", "25"))
+# Аренда роли диспетчера, секунды; должна быть больше времени отправки одной пачки
+NOTIFY_LEASE_TTL = float(os.getenv("NOTIFY_LEASE_TTL", "120"))
+LEASE_NAME = "notifications"
+
+# Задержка повтора: 5 с, 10 с, 20 с, ... но не больше часа
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 3600
+
+# Запись в статусе sending дольше этого времени считается брошенной
+CLAIM_TIMEOUT = datetime.timedelta(minutes=5)
+
+class RateLimiter:
+    """
+    Интервал между сообщениями в один чат и общий лимит частоты
+
+    Используется только из потока диспетчера, владеющего арендой, поэтому
+    лимиты действуют для всех клиентов сразу.
+    """
+
+    def __init__(self, chat_interval: float, global_rate: float):
+        self.chat_interval = chat_interval
+        self.global_interval = 1.0 / global_rate if global_rate > 0 else 0
+        self._chat_ready = defaultdict(float)  # chat_id -> monotonic время следующей отправки
+        self._global_ready = 0.0
+
+    async def acquire(self, chat_id: str) -> float:
+        """Дождаться права на отправку в чат; возвращает время ожидания"""
+        now = time.monotonic()
+        send_at = max(now, self._chat_ready[chat_id], self._global_ready)
+        # Резервируем слот до ожидания, чтобы параллельные чаты не заняли его же
+        self._chat_ready[chat_id] = send_at + self.chat_interval
+        self._global_ready = send_at + self.global_interval
+        wait = send_at - now
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def block(self, chat_id: str, seconds: float) -> None:
+        """Не отправлять в чат seconds секунд (ответ RetryAfter)"""
+        self._chat_ready[chat_id] = max(self._chat_ready[chat_id], time.monotonic() + seconds)
+
+def retry_delay(attempts: int) -> float:
+    """Задержка перед повтором после attempts неудачных попыток"""
+    return min(RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)), RETRY_MAX_DELAY)
+
+class NotificationDispatcher:
+    """
+    Отправка уведомлений из outbox в фоновом потоке с постоянным event loop
+
+    Пример:
+        notification_dispatcher.start()   # при запуске приложения
+        notification_dispatcher.wake()    # после commit с новыми уведомлениями
+        notification_dispatcher.stats()   # счетчики доставки
+    """
+
+    def __init__(self, bot_token: Optional[str] = None, default_chat_id: Optional[str] = None,
+                 poll_interval: float = NOTIFY_POLL_INTERVAL, batch_size: int = NOTIFY_BATCH_SIZE,
+                 max_attempts: int = NOTIFY_MAX_ATTEMPTS, chat_interval: float = NOTIFY_CHAT_INTERVAL,
+                 global_rate: float = NOTIFY_GLOBAL_RATE, lease_ttl: float = NOTIFY_LEASE_TTL):
+        self.bot_token = bot_token or os.getenv("TELEGRAM_BOT_TOKEN")
+        self.default_chat_id = default_chat_id or os.getenv("TELEGRAM_CHAT_ID")
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.rate_limiter = RateLimiter(chat_interval, global_rate)
+        self.lease = DbLease(LEASE_NAME, lease_ttl)
+        self.counters = {"sent": 0, "retried": 0, "failed": 0, "rate_limited": 0, "reclaimed": 0, "digests": 0}
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._counters_lock = threading.Lock()
+        self._thread = None
+        self._loop = None
+        self._wakeup = None
+        self._stopping = False
+        self._start_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.bot_token) and NOTIFY_DISPATCHER != "off"
+
+    def start(self) -> bool:
+        """
+        Запустить поток диспетчера (повторный вызов ничего не делает)
+
+        Returns:
+            bool: True, если диспетчер работает
+        """
+        if not self.enabled:
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+        with self._start_lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+                self._thread.start()
+        return True
+
+    def wake(self) -> None:
+        """Проверить outbox сейчас, не дожидаясь очередного опроса (из любого потока)"""
+        if not self.start():
+            return
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановить диспетчер (неотправленные записи остаются в outbox)"""
+        self._stopping = True
+        if self._thread and self._thread.is_alive():
+            loop, wakeup = self._loop, self._wakeup
+            if loop is not None and wakeup is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(wakeup.set)
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Счетчики доставки и состояние очереди
+
+        Returns:
+            dict: sent, retried, failed, rate_limited, reclaimed, digests,
+                  avg_latency/max_latency (секунды от записи в outbox до отправки),
+                  pending (записей в очереди), leader (этот процесс владеет арендой)
+        """
+        with self._counters_lock:
+            stats = dict(self.counters)
+            stats["leader"] = self.lease.held
+            stats["avg_latency"] = self._latency_total / stats["sent"] if stats["sent"] else 0.0
+            stats["max_latency"] = self._latency_max
+        try:
+            with engine.connect() as conn:
+                stats["pending"] = conn.execute(
+                    text("SELECT COUNT(*) FROM notification_outbox WHERE status IN (:pending, :sending)"),
+                    {"pending": OUTBOX_PENDING, "sending": OUTBOX_SENDING}
+                ).scalar()
+        except Exception as e:
+            logger.error(f"Не удалось получить размер очереди уведомлений: {e}")
+            stats["pending"] = None
+        return stats
+
+    def run_forever(self) -> None:
+        """Работать в текущем потоке до прерывания (отдельный процесс)"""
+        self._stopping = False
+        try:
+            self._run()
+        except KeyboardInterrupt:
+            self._stopping = True
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._counters_lock:
+            self.counters[name] += value
+
+    def _record_latency(self, created_at: datetime.datetime) -> None:
+        latency = max((datetime.datetime.utcnow() - created_at).total_seconds(), 0.0)
+        with self._counters_lock:
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._main())
+        finally:
+            self._loop = None
+            self._wakeup = None
+            loop.close()
+
+    async def _main(self) -> None:
+        self._wakeup = asyncio.Event()
+        bot = Bot(token=self.bot_token)
+        if hasattr(bot, "initialize"):
+            await bot.initialize()
+        logger.info("Диспетчер уведомлений запущен")
+        try:
+            while not self._stopping:
+                processed = 0
+                try:
+                    if self.lease.acquire():
+                        self._flush_digests()
+                        processed = await self._dispatch_batch(bot)
+                except Exception as e:
+                    logger.error(f"Ошибка диспетчера уведомлений: {e}")
+                if self._stopping:
+                    break
+                if processed >= self.batch_size:
+                    continue  # Очередь не пуста - сразу следующая пачка
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            self.lease.release()
+            if hasattr(bot, "shutdown"):
+                try:
+                    await bot.shutdown()
+                except Exception:
+                    pass
+            logger.info("Диспетчер уведомлений остановлен")
+
+    async def drain(self, bot, force_digests: bool = False) -> int:
+        """
+        Отправить все готовые сообщения через bot и вернуться (скрипты, проверки)
+
+        Args:
+            bot: Telegram Bot или объект с тем же send_message
+            force_digests: Свести события дайджестов, не дожидаясь окна
+
+        Returns:
+            int: Количество обработанных записей outbox
+        """
+        self._flush_digests(force=force_digests)
+        total = 0
+        while True:
+            processed = await self._dispatch_batch(bot)
+            if not processed:
+                return total
+            total += processed
+
+    def _flush_digests(self, force: bool = False) -> None:
+        try:
+            queued = flush_digests(force=force)
+        except Exception as e:
+            logger.error(f"Ошибка формирования дайджестов уведомлений: {e}")
+            return
+        if queued:
+            self._count("digests", queued)
+
+    def _claim_batch(self) -> List:
+        """Взять в работу готовые к отправке записи"""
+        now = datetime.datetime.utcnow()
+        claimed = []
+        with engine.begin() as conn:
+            reclaimed = conn.execute(
+                text("UPDATE notification_outbox SET status = :pending "
+                     "WHERE status = :sending AND claimed_at < :stale"),
+                {"pending": OUTBOX_PENDING, "sending": OUTBOX_SENDING, "stale": now - CLAIM_TIMEOUT}
+            ).rowcount
+            if reclaimed:
+                self._count("reclaimed", reclaimed)
+
+            rows = conn.execute(
+                text("SELECT id, chat_id, message, attempts, created_at FROM notification_outbox "
+                     "WHERE status = :pending AND next_attempt_at <= :now "
+                     "ORDER BY id LIMIT :limit").columns(created_at=DateTime),
+                {"pending": OUTBOX_PENDING, "now": now, "limit": self.batch_size}
+            ).fetchall()
+            for row in rows:
+                # Запись могла быть взята другим диспетчером между SELECT и UPDATE
+                result = conn.execute(
+                    text("UPDATE notification_outbox SET status = :sending, claimed_at = :now "
+                         "WHERE id = :id AND status = :pending"),
+                    {"sending": OUTBOX_SENDING, "pending": OUTBOX_PENDING, "now": now, "id": row.id}
+                )
+                if result.rowcount == 1:
+                    claimed.append(row)
+        return claimed
+
+    async def _dispatch_batch(self, bot) -> int:
+        """Отправить одну пачку; возвращает число взятых записей"""
+        rows = self._claim_batch()
+        if not rows:
+            return 0
+
+        # В каждый чат - по порядку, разные чаты - параллельно
+        by_chat = defaultdict(list)
+        for row in rows:
+            by_chat[row.chat_id or self.default_chat_id].append(row)
+        await asyncio.gather(*(self._send_chat(bot, chat_id, chat_rows) for chat_id, chat_rows in by_chat.items()))
+        return len(rows)
+
+    async def _send_chat(self, bot, chat_id: Optional[str], rows: List) -> None:
+        for position, row in enumerate(rows):
+            if not chat_id:
+                self._finish(row, OUTBOX_FAILED, error="Не указан chat_id (TELEGRAM_CHAT_ID)")
+                continue
+            if await self.rate_limiter.acquire(chat_id) > 0:
+                self._count("rate_limited")
+            try:
+                await self._send(bot, chat_id, row.message)
+            except RetryAfter as e:
+                seconds = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                self.rate_limiter.block(chat_id, seconds)
+                self._count("rate_limited")
+                # Остальные сообщения этого чата ждут вместе с текущим
+                for pending_row in rows[position:]:
+                    self._retry(pending_row, f"RetryAfter: {seconds} с", delay=seconds, count_attempt=False)
+                return
+            except (BadRequest, Forbidden) as e:
+                # Повтор не поможет: неверный чат, бот заблокирован, ошибка разметки
+                self._finish(row, OUTBOX_FAILED, error=str(e))
+            except (NetworkError, TelegramError, OSError) as e:
+                self._retry(row, str(e))
+            except Exception as e:
+                logger.error(f"Неожиданная ошибка отправки уведомления {row.id}: {e}")
+                self._retry(row, str(e))
+            else:
+                self._finish(row, OUTBOX_SENT)
+                self._count("sent")
+                self._record_latency(row.created_at)
+
+    async def _send(self, bot, chat_id: str, message: str) -> None:
+        if inspect.iscoroutinefunction(bot.send_message):
+            await bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
+        else:
+            # python-telegram-bot 13: синхронный API, отправляем в пуле потоков
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
+            )
+
+    def _retry(self, row, error: str, delay: Optional[float] = None, count_attempt: bool = True) -> None:
+        attempts = row.attempts + (1 if count_attempt else 0)
+        if attempts >= self.max_attempts:
+            logger.error(f"Уведомление {row.id} не доставлено после {attempts} попыток: {error}")
+            self._finish(row, OUTBOX_FAILED, error=error, attempts=attempts)
+            return
+        delay = retry_delay(attempts) if delay is None else delay
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE notification_outbox SET status = :pending, attempts = :attempts, "
+                     "next_attempt_at = :next_attempt_at, last_error = :error, claimed_at = NULL "
+                     "WHERE id = :id"),
+                {"pending": OUTBOX_PENDING, "attempts": attempts, "error": error, "id": row.id,
+                 "next_attempt_at": datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)}
+            )
+        self._count("retried")
+
+    def _finish(self, row, status: str, error: Optional[str] = None, attempts: Optional[int] = None) -> None:
+        now = datetime.datetime.utcnow()
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE notification_outbox SET status = :status, attempts = :attempts, "
+                     "last_error = :error, sent_at = :sent_at, claimed_at = NULL WHERE id = :id"),
+                {"status": status, "attempts": attempts if attempts is not None else row.attempts + 1,
+                 "error": error, "sent_at": now if status == OUTBOX_SENT else None, "id": row.id}
+            )
+        if status == OUTBOX_FAILED:
+            self._count("failed")
+
+notification_dispatcher = NotificationDispatcher()
+atexit.register(notification_dispatcher.stop)
+
+def get_dispatcher_stats() -> Dict[str, float]:
+    """Счетчики доставки уведомлений (см. NotificationDispatcher.stats)"""
+    return notification_dispatcher.stats()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    if not notification_dispatcher.bot_token:
+        raise SystemExit("TELEGRAM_BOT_TOKEN не задан")
+    notification_dispatcher.run_forever()
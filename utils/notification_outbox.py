@@ -0,0 +1,107 @@
+"""
+Очередь исходящих уведомлений (transactional outbox)
+
+Уведомление записывается в таблицу notification_outbox в той же сессии и
+транзакции, что и событие, о котором оно сообщает: если смена статуса
+откатилась, уведомления тоже не будет, а если зафиксировалась - оно не
+потеряется, даже когда Telegram недоступен. Отправкой занимается фоновый
+диспетчер utils.notification_dispatcher; после фиксации транзакции он
+получает сигнал и забирает новые записи, не дожидаясь очередного опроса.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+# Статусы записей outbox
+OUTBOX_PENDING = "pending"
+OUTBOX_SENDING = "sending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+# Ключ в session.info: в транзакции есть новые уведомления
+_SESSION_FLAG = "notification_outbox_enqueued"
+
+def enqueue_notification(db: Session, event_type: str, message: str,
+                         chat_id: Optional[str] = None, channel: str = "telegram") -> NotificationOutbox:
+    """
+    Добавить уведомление в outbox текущей транзакции (без commit)
+
+    Args:
+        db: Сессия, в которой выполняется само изменение
+        event_type: Тип события (qc_approval, status_change, ...)
+        message: Готовый текст сообщения (HTML)
+        chat_id: Получатель (None - общий чат TELEGRAM_CHAT_ID)
+        channel: Канал доставки
+    """
+    item = NotificationOutbox(channel=channel, chat_id=chat_id, event_type=event_type, message=message,
+                              status=OUTBOX_PENDING)
+    db.add(item)
+    wake_dispatcher_on_commit(db)
+    return item
+
+def wake_dispatcher_on_commit(db: Session) -> None:
+    """Разбудить диспетчер после фиксации транзакции сессии"""
+    db.info[_SESSION_FLAG] = True
+
+def material_notification_data(material) -> Dict[str, str]:
+    """Данные материала для шаблонов utils.telegram_bot"""
+    return {
+        "id": material.id,
+        "grade": material.material_grade,
+        "batch": material.batch_number or "Нет",
+        "melt": material.melt_number,
+        "supplier": material.supplier.name if material.supplier else "Н/Д",
+    }
+
+def enqueue_qc_approval(db: Session, material, qc_operator: str) -> NotificationOutbox:
+    """Уведомление о положительном результате проверки ОТК"""
+    from utils.telegram_bot import telegram_bot
+    text = telegram_bot.format_qc_approval(material_notification_data(material), qc_operator)
+    return enqueue_notification(db, "qc_approval", text)
+
+def enqueue_qc_rejection(db: Session, material, qc_operator: str, comment: Optional[str] = None) -> NotificationOutbox:
+    """Уведомление о негативном результате проверки ОТК"""
+    from utils.telegram_bot import telegram_bot
+    defects: List[str] = ["Несоответствие сертификата"]
+    if comment:
+        defects.append(comment)
+    text = telegram_bot.format_qc_rejection(material_notification_data(material), qc_operator, defects)
+    return enqueue_notification(db, "qc_rejection", text)
+
+def enqueue_lab_test_failure(db: Session, material, engineer: str, comment: Optional[str] = None) -> NotificationOutbox:
+    """Уведомление о негативном результате лабораторных испытаний"""
+    from utils.telegram_bot import telegram_bot
+    test_data = {"test_type": "Химический анализ", "engineer": engineer}
+    discrepancies: List[str] = ["Несоответствие химического состава"]
+    if comment:
+        discrepancies.append(comment)
+    text = telegram_bot.format_lab_test_failure(material_notification_data(material), test_data, discrepancies)
+    return enqueue_notification(db, "lab_test_failure", text)
+
+def enqueue_final_acceptance(db: Session, material, responsible_person: str) -> NotificationOutbox:
+    """Уведомление о финальном одобрении материала"""
+    from utils.telegram_bot import telegram_bot
+    text = telegram_bot.format_final_acceptance(material_notification_data(material), responsible_person)
+    return enqueue_notification(db, "final_acceptance", text)
+
+@event.listens_for(Session, "after_commit")
+def wake_dispatcher_after_commit(session):
+    """Разбудить диспетчер, если в зафиксированной транзакции были уведомления"""
+    if session.info.pop(_SESSION_FLAG, False):
+        try:
+            from utils.notification_dispatcher import notification_dispatcher
+            notification_dispatcher.wake()
+        except Exception as e:
+            # Запись уже в outbox, диспетчер заберет ее при следующем опросе
+            logger.error(f"Не удалось разбудить диспетчер уведомлений: {e}")
+
+@event.listens_for(Session, "after_rollback")
+def reset_outbox_flag(session):
+    session.info.pop(_SESSION_FLAG, None)
@@ -7,51 +7,52 @@ import logging
 from typing import List, Optional
 from datetime import datetime
 
-import telegram
-from telegram import Bot
-from telegram.error import TelegramError
-
 from database.connection import SessionLocal
-from models.models import User, MaterialEntry, MaterialStatus, UserRole
+from models.models import MaterialEntry, MaterialStatus, UserRole
+from utils.notification_digest import queue_event
+from utils.notification_outbox import enqueue_notification
+from utils.recipient_directory import get_recipients
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
 class NotificationService:
+    """
+    Уведомления пользователям по ролям
+
+    События о материалах собираются в дайджесты получателей
+    (utils.notification_digest), отправкой занимается диспетчер outbox.
+    """
+
     def __init__(self):
         """Инициализация сервиса уведомлений"""
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        self.bot = None
-        
-        if self.telegram_bot_token:
-            try:
-                self.bot = Bot(token=self.telegram_bot_token)
-                logger.info("Telegram бот успешно инициализирован")
-            except Exception as e:
-                logger.error(f"Ошибка инициализации Telegram бота: {e}")
-                self.bot = None
-    
+
     def send_telegram_message(self, telegram_id: str, message: str) -> bool:
         """
-        Отправить сообщение через Telegram
+        Поставить сообщение в очередь отправки Telegram (без дайджеста)
         
         Args:
             telegram_id: Telegram ID пользователя
             message: Текст сообщения
         
         Returns:
-            True если сообщение отправлено успешно
+            True если сообщение поставлено в очередь
         """
-        if not self.bot or not telegram_id:
+        if not self.telegram_bot_token or not telegram_id:
             return False
         
+        db = SessionLocal()
         try:
-            self.bot.send_message(chat_id=telegram_id, text=message, parse_mode='HTML')
-            logger.info(f"Telegram сообщение отправлено пользователю {telegram_id}")
+            enqueue_notification(db, "message", message, chat_id=str(telegram_id))
+            db.commit()
             return True
-        except TelegramError as e:
-            logger.error(f"Ошибка отправки Telegram сообщения: {e}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Ошибка постановки Telegram сообщения в очередь: {e}")
             return False
+        finally:
+            db.close()
     
     def notify_status_change(self, material_id: int, old_status: str, new_status: str):
         """
@@ -115,18 +116,19 @@ class NotificationService:
             else:
                 return  # Для других статусов уведомления не отправляем
             
-            # Получаем пользователей для уведомления
-            users_to_notify = db.query(User).filter(
-                User.role.in_(notify_roles),
-                User.telegram_id.isnot(None),
-                User.is_active == True
-            ).all()
+            # Получатели - из справочника, без запроса к users
+            users_to_notify = get_recipients(notify_roles, channel="telegram")
             
-            # Отправляем уведомления
+            # Событие попадает в дайджест каждого получателя
+            summary = f"{material.material_grade}, плавка {material.melt_number}: " \
+                      f"{self._get_status_name(new_status)}"
             for user in users_to_notify:
-                self.send_telegram_message(user.telegram_id, message)
+                queue_event(db, user.telegram_id, "status_change", summary, message,
+                            material_id=material.id, to_status=new_status, user_id=user.id)
+            db.commit()
             
         except Exception as e:
+            db.rollback()
             logger.error(f"Ошибка при отправке уведомлений: {e}")
         finally:
             db.close()
@@ -166,16 +168,17 @@ class NotificationService:
                      f"Результат: {result_text}"
             
             # Уведомляем ОТК и склад
-            users_to_notify = db.query(User).filter(
-                User.role.in_([UserRole.QC.value, UserRole.WAREHOUSE.value]),
-                User.telegram_id.isnot(None),
-                User.is_active == True
-            ).all()
+            users_to_notify = get_recipients([UserRole.QC.value, UserRole.WAREHOUSE.value], channel="telegram")
             
+            summary = f"{material.material_grade}, плавка {material.melt_number}: {test_name} - " \
+                      f"{'годен' if passed else 'брак'}"
             for user in users_to_notify:
-                self.send_telegram_message(user.telegram_id, message)
+                queue_event(db, user.telegram_id, "test_result", summary, message,
+                            material_id=material.id, user_id=user.id)
+            db.commit()
             
         except Exception as e:
+            db.rollback()
             logger.error(f"Ошибка при отправке уведомлений о результатах: {e}")
         finally:
             db.close()
@@ -210,17 +213,15 @@ class NotificationService:
             else:
                 message += "Нет активных материалов в системе\n"
             
-            # Отправляем администраторам
-            admins = db.query(User).filter(
-                User.role == UserRole.ADMIN.value,
-                User.telegram_id.isnot(None),
-                User.is_active == True
-            ).all()
+            # Сводка сама по себе дайджест - сразу в очередь отправки
+            admins = get_recipients([UserRole.ADMIN.value], channel="telegram")
             
             for admin in admins:
-                self.send_telegram_message(admin.telegram_id, message)
+                enqueue_notification(db, "daily_summary", message, chat_id=str(admin.telegram_id))
+            db.commit()
             
         except Exception as e:
+            db.rollback()
             logger.error(f"Ошибка при отправке ежедневной сводки: {e}")
         finally:
             db.close()
@@ -0,0 +1,163 @@
+"""
+Справочник получателей уведомлений: роль -> активные пользователи
+
+Уведомления рассылаются по ролям, и раньше каждое событие заново читало
+таблицу users. Справочник загружает всех активных пользователей одним
+запросом и отдает получателей из памяти:
+
+- после фиксации транзакции, изменившей роль, Telegram ID, активность или
+  имя пользователя (администрирование, utils.auth), справочник
+  перечитывается при следующем обращении;
+- изменения из других процессов и в обход ORM подхватываются не позже
+  чем через RECIPIENT_CACHE_TTL секунд (или вызовом invalidate_recipients).
+
+Используется обоими стеками уведомлений: utils.notifications и
+web-app/backend/notifications.py.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import defaultdict, namedtuple
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from database.connection import SessionLocal
+from models.models import User
+
+logger = logging.getLogger(__name__)
+
+RECIPIENT_CACHE_TTL = float(os.getenv("RECIPIENT_CACHE_TTL", "300"))
+
+# Поля пользователя, от которых зависит список получателей
+RECIPIENT_FIELDS = ("role", "telegram_id", "is_active", "full_name", "email")
+
+# Ключ в session.info: в транзакции изменены получатели
+_SESSION_FLAG = "recipient_directory_changed"
+
+Recipient = namedtuple("Recipient", ["id", "username", "full_name", "role", "telegram_id", "email"])
+Recipient.__doc__ = "Получатель уведомлений (снимок пользователя, не привязан к сессии)"
+
+class RecipientDirectory:
+    """
+    Кэш получателей по ролям
+
+    Пример:
+        recipient_directory.recipients([UserRole.QC.value], channel="telegram")
+        recipient_directory.invalidate()   # после изменения users в обход ORM
+    """
+
+    def __init__(self, ttl: float = RECIPIENT_CACHE_TTL):
+        self.ttl = ttl
+        self.counters = {"hits": 0, "loads": 0, "invalidations": 0}
+        self._by_role = None  # role -> [Recipient]
+        self._loaded_at = 0.0
+        self._generation = 0  # Растет при каждом сбросе
+        self._lock = threading.Lock()
+
+    def recipients(self, roles: Iterable[str], channel: Optional[str] = None) -> List[Recipient]:
+        """
+        Активные пользователи перечисленных ролей
+
+        Args:
+            roles: Роли (UserRole.*.value)
+            channel: "telegram" или "email" - только пользователи с этим
+                     каналом; None - все
+
+        Returns:
+            list: Recipient в порядке ролей, затем id
+        """
+        by_role = self._snapshot()
+        result = []
+        for role in dict.fromkeys(roles):
+            for recipient in by_role.get(role, ()):
+                if channel == "telegram" and not recipient.telegram_id:
+                    continue
+                if channel == "email" and not recipient.email:
+                    continue
+                result.append(recipient)
+        return result
+
+    def invalidate(self) -> None:
+        """Перечитать пользователей при следующем обращении"""
+        with self._lock:
+            self._by_role = None
+            self._generation += 1
+            self.counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики: hits (ответ из памяти), loads (запросы к users), invalidations"""
+        with self._lock:
+            return dict(self.counters)
+
+    def _snapshot(self) -> Dict[str, List[Recipient]]:
+        with self._lock:
+            if self._by_role is not None and time.monotonic() - self._loaded_at < self.ttl:
+                self.counters["hits"] += 1
+                return self._by_role
+            generation = self._generation
+
+        by_role = self._load()
+        with self._lock:
+            # Сброс во время загрузки: прочитанное могло устареть, не сохраняем
+            if generation == self._generation:
+                self._by_role = by_role
+                self._loaded_at = time.monotonic()
+            self.counters["loads"] += 1
+        return by_role
+
+    def _load(self) -> Dict[str, List[Recipient]]:
+        db = SessionLocal()
+        try:
+            users = db.query(User).filter(User.is_active == True).order_by(User.id).all()
+            by_role = defaultdict(list)
+            for user in users:
+                by_role[user.role].append(Recipient(
+                    id=user.id,
+                    username=user.username,
+                    full_name=user.full_name,
+                    role=user.role,
+                    telegram_id=user.telegram_id,
+                    email=getattr(user, "email", None),
+                ))
+            return dict(by_role)
+        finally:
+            db.close()
+
+recipient_directory = RecipientDirectory()
+
+def get_recipients(roles: Iterable[str], channel: Optional[str] = None) -> List[Recipient]:
+    """Активные пользователи ролей (см. RecipientDirectory.recipients)"""
+    return recipient_directory.recipients(roles, channel)
+
+def invalidate_recipients() -> None:
+    """Сбросить справочник получателей (после изменения users в обход ORM)"""
+    recipient_directory.invalidate()
+
+def _recipient_changed(user) -> bool:
+    state = inspect(user)
+    return any(field in state.attrs and state.attrs[field].history.has_changes() for field in RECIPIENT_FIELDS)
+
+@event.listens_for(Session, "after_flush")
+def track_recipient_changes(session, flush_context):
+    """Отметить транзакцию, если в ней изменились получатели уведомлений"""
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, User):
+            session.info[_SESSION_FLAG] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, User) and _recipient_changed(obj):
+            session.info[_SESSION_FLAG] = True
+            return
+
+@event.listens_for(Session, "after_commit")
+def invalidate_after_commit(session):
+    if session.info.pop(_SESSION_FLAG, False):
+        recipient_directory.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def reset_recipient_flag(session):
+    session.info.pop(_SESSION_FLAG, None)
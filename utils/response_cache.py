@@ -0,0 +1,167 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) и кэш ответов для FastAPI-приложений
+
+Для каждого кэшируемого маршрута указываются таблицы, от которых зависит
+ответ. Перед обработкой запроса из data_versions читаются счетчики изменений
+этих таблиц (один запрос по первичному ключу). Если данные не изменились,
+клиент получает 304, а повторный запрос без заголовков - ответ из кэша,
+без выполнения тяжелых запросов.
+
+ETag меняется также раз в API_CACHE_TTL секунд: ответы с окнами,
+отсчитываемыми от текущего момента, и изменения в обход ORM устаревают
+не дольше чем на TTL.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+from database.connection import engine
+
+DEFAULT_TTL = int(os.getenv("API_CACHE_TTL", "30"))
+DEFAULT_MAX_ENTRIES = 256
+
+DATA_VERSIONS_SQL = text(
+    "SELECT table_name, version, updated_at FROM data_versions WHERE table_name IN :tables"
+).bindparams(bindparam("tables", expanding=True))
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_data_versions(tables: Iterable[str]) -> Optional[Tuple[str, Optional[datetime]]]:
+    """
+    Текущая версия набора таблиц
+
+    Returns:
+        tuple: (токен версии, время последнего изменения в UTC) или None,
+               если таблицы data_versions еще нет
+    """
+    tables = sorted(tables)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(DATA_VERSIONS_SQL, {"tables": tables}).fetchall()
+    except OperationalError:
+        return None
+
+    versions = {row[0]: row[1] for row in rows}
+    token = ",".join(f"{table}:{versions.get(table, 0)}" for table in tables)
+
+    last_modified = None
+    for row in rows:
+        updated_at = datetime.fromisoformat(row[2]) if isinstance(row[2], str) else row[2]
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    if last_modified:
+        last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+
+    return token, last_modified
+
+def invalidate_response_cache() -> None:
+    """Очистить кэш ответов (после записи через API)"""
+    with _cache_lock:
+        _cache.clear()
+
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
+    """
+    ETag / Last-Modified / 304 и кэш ответов для перечисленных маршрутов
+
+    Args:
+        routes: Список (регулярное выражение пути, таблицы)
+        ttl: Максимальное время жизни ответа в секундах
+        max_entries: Размер кэша ответов
+    """
+
+    def __init__(self, app, routes: List[Tuple[str, Iterable[str]]],
+                 ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        super().__init__(app)
+        self.routes = [(re.compile(pattern), tuple(tables)) for pattern, tables in routes]
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def _match_tables(self, path: str) -> Optional[Tuple[str, ...]]:
+        for pattern, tables in self.routes:
+            if pattern.fullmatch(path):
+                return tables
+        return None
+
+    async def dispatch(self, request, call_next):
+        if request.method != "GET":
+            response = await call_next(request)
+            if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+                invalidate_response_cache()
+            return response
+
+        tables = self._match_tables(request.url.path)
+        if tables is None:
+            return await call_next(request)
+
+        state = await run_in_threadpool(get_data_versions, tables)
+        if state is None:
+            return await call_next(request)
+        token, last_modified = state
+
+        key = f"{request.url.path}?{request.url.query}"
+        bucket = int(time.time() // self.ttl) if self.ttl else 0
+        etag = 'W/"' + hashlib.sha1(f"{key}|{token}|{bucket}".encode("utf-8")).hexdigest()[:20] + '"'
+
+        if self.ttl:
+            # Last-Modified, как и ETag, меняется не реже раза в TTL
+            bucket_start = datetime.fromtimestamp(bucket * self.ttl, timezone.utc)
+            last_modified = max(last_modified, bucket_start) if last_modified else bucket_start
+
+        validators = {"ETag": etag, "Cache-Control": "no-cache"}
+        if last_modified:
+            validators["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+        if self._not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=validators)
+
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached and cached[0] == etag:
+                _cache.move_to_end(key)
+                body, headers, media_type = cached[1:]
+                return Response(content=body, headers={**headers, **validators}, media_type=media_type)
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = {name: value for name, value in response.headers.items() if name.lower() != "content-length"}
+        with _cache_lock:
+            _cache[key] = (etag, body, headers, response.media_type)
+            _cache.move_to_end(key)
+            while len(_cache) > self.max_entries:
+                _cache.popitem(last=False)
+
+        return Response(content=body, status_code=200, headers={**headers, **validators},
+                        media_type=response.media_type)
+
+    @staticmethod
+    def _not_modified(request, etag: str, last_modified: Optional[datetime]) -> bool:
+        """Проверка If-None-Match, а при его отсутствии - If-Modified-Since"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = [value.strip() for value in if_none_match.split(",")]
+            return "*" in candidates or etag in candidates
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified:
+            try:
+                return last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
@@ -3,16 +3,31 @@ import shutil
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from database.connection import SessionLocal
-from models.models import MaterialEntry, MaterialStatus
+from models.models import MaterialEntry, MaterialStatus, UserRole
 from utils.notifications import notification_service
+from utils.recipient_directory import get_recipients
 from utils.reports import ReportGenerator
+from utils.material_rollup import rebuild_rollup
+from utils.audit_archive import apply_audit_retention
+from utils.change_log import prune_change_log
+from utils.db_lease import DbLease
+
+# Обслуживание базы (сверка сводки, архив аудита с VACUUM, очистка журнала
+# изменений) выполняет только владелец аренды "maintenance": планировщик
+# запущен в каждом клиенте, а VACUUM берет монопольную блокировку базы.
+# Аренда продлевается каждые MAINTENANCE_LEASE_INTERVAL секунд.
+MAINTENANCE_LEASE_TTL = float(os.getenv("MAINTENANCE_LEASE_TTL", "180"))
+MAINTENANCE_LEASE_INTERVAL = 60
+MAINTENANCE_LEASE_NAME = "maintenance"
 
 class TaskScheduler:
     """Планировщик автоматических задач для PPSD"""
     
     def __init__(self):
         self.scheduler = BackgroundScheduler()
+        self.maintenance_lease = DbLease(MAINTENANCE_LEASE_NAME, MAINTENANCE_LEASE_TTL)
         self.setup_jobs()
     
     def setup_jobs(self):
@@ -33,6 +48,38 @@ class TaskScheduler:
             name='Резервное копирование БД'
         )
         
+        # Сверка ежедневной сводки материалов в 02:00
+        self.scheduler.add_job(
+            func=self.reconcile_rollup,
+            trigger=CronTrigger(hour=2, minute=0),
+            id='rollup_reconciliation',
+            name='Сверка сводки материалов'
+        )
+        
+        # Перенос старых записей журнала аудита в архивы в 03:00
+        self.scheduler.add_job(
+            func=self.archive_audit_log,
+            trigger=CronTrigger(hour=3, minute=0),
+            id='audit_retention',
+            name='Архивирование журнала аудита'
+        )
+        
+        # Очистка журнала изменений в 03:30
+        self.scheduler.add_job(
+            func=self.prune_change_log,
+            trigger=CronTrigger(hour=3, minute=30),
+            id='change_log_retention',
+            name='Очистка журнала изменений'
+        )
+        
+        # Продление аренды обслуживания базы
+        self.scheduler.add_job(
+            func=self.hold_maintenance_lease,
+            trigger=IntervalTrigger(seconds=MAINTENANCE_LEASE_INTERVAL),
+            id='maintenance_lease',
+            name='Аренда обслуживания базы'
+        )
+        
         # Проверка просроченных задач каждый час
         self.scheduler.add_job(
             func=self.check_overdue_tasks,
@@ -49,6 +96,47 @@ class TaskScheduler:
         except Exception as e:
             print(f"[{datetime.now()}] Ошибка отправки сводки: {e}")
     
+    def hold_maintenance_lease(self) -> bool:
+        """Взять или продлить аренду обслуживания базы"""
+        try:
+            return self.maintenance_lease.acquire()
+        except Exception as e:
+            print(f"[{datetime.now()}] Ошибка аренды обслуживания базы: {e}")
+            return False
+    
+    def reconcile_rollup(self):
+        """Пересчет ежедневной сводки материалов"""
+        if not self.hold_maintenance_lease():
+            return
+        try:
+            rows = rebuild_rollup()
+            print(f"[{datetime.now()}] Сводка материалов пересчитана: {rows} строк")
+        except Exception as e:
+            print(f"[{datetime.now()}] Ошибка пересчета сводки: {e}")
+    
+    def archive_audit_log(self):
+        """Перенос старых записей аудита в помесячные архивы и сжатие базы"""
+        if not self.hold_maintenance_lease():
+            return
+        try:
+            result = apply_audit_retention()
+            moved = sum(result["moved"].values())
+            live = result["report"]["live"]
+            print(f"[{datetime.now()}] Журнал аудита: перенесено в архив {moved} записей, "
+                  f"размер базы {live['size_bytes'] // 1024} КБ, архивов {len(result['report']['archives'])}")
+        except Exception as e:
+            print(f"[{datetime.now()}] Ошибка архивирования журнала аудита: {e}")
+    
+    def prune_change_log(self):
+        """Удаление старых записей журнала изменений"""
+        if not self.hold_maintenance_lease():
+            return
+        try:
+            deleted = prune_change_log()
+            print(f"[{datetime.now()}] Журнал изменений: удалено {deleted} записей")
+        except Exception as e:
+            print(f"[{datetime.now()}] Ошибка очистки журнала изменений: {e}")
+    
     def backup_database(self):
         """Резервное копирование базы данных"""
         try:
@@ -111,12 +199,7 @@ class TaskScheduler:
                     message += f"  Статус: {material.status}, просрочено на {days_overdue} дней\n\n"
                 
                 # Отправляем администраторам
-                from models.models import User, UserRole
-                admins = db.query(User).filter(
-                    User.role == UserRole.ADMIN.value,
-                    User.telegram_id.isnot(None),
-                    User.is_active == True
-                ).all()
+                admins = get_recipients([UserRole.ADMIN.value], channel="telegram")
                 
                 for admin in admins:
                     notification_service.send_telegram_message(admin.telegram_id, message)
@@ -136,6 +219,7 @@ class TaskScheduler:
     def stop(self):
         """Остановка планировщика"""
         self.scheduler.shutdown()
+        self.maintenance_lease.release()
         print("Планировщик задач остановлен")
 
 # Глобальный экземпляр планировщика
@@ -2,7 +2,7 @@
 Модуль для управления статусами материалов
 """
 
-from models.models import MaterialStatus, UserRole
+from models.models import MaterialEntry, MaterialStatus, UserRole
 from database.connection import SessionLocal
 from datetime import datetime
 
@@ -203,4 +203,51 @@ class StatusManager:
             MaterialStatus.EDIT_REQUESTED.value: "Запрошено редактирование данных материала"
         }
         
-        return descriptions.get(status, "Нет описания для данного статуса") 
\ No newline at end of file
+        return descriptions.get(status, "Нет описания для данного статуса") 
+    
+    @staticmethod
+    def transition_material(material_id, target_status, user_id, user_role, comment=None):
+        """
+        Перевести материал в новый статус с проверкой прав роли
+        
+        Переход записывается в material_status_history (через обработчик
+        before_flush) и в журнал аудита.
+        
+        Args:
+            material_id (int): ID материала
+            target_status (str): Новый статус
+            user_id (int): ID пользователя
+            user_role (str): Роль пользователя
+            comment (str): Комментарий к переходу
+            
+        Returns:
+            tuple: (успех, сообщение)
+        """
+        from utils.audit import log_status_change
+        
+        db = SessionLocal(info={"user_id": user_id})
+        try:
+            material = db.query(MaterialEntry).filter(
+                MaterialEntry.id == material_id,
+                MaterialEntry.is_deleted == False
+            ).first()
+            if not material:
+                return False, "Материал не найден"
+            
+            previous_status = material.status
+            if target_status not in StatusManager.get_available_transitions(previous_status, user_role):
+                return False, f"Переход из статуса {previous_status} в {target_status} недоступен для роли {user_role}"
+            
+            material.status = target_status
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            return False, f"Ошибка при изменении статуса: {str(e)}"
+        finally:
+            db.close()
+        
+        log_status_change(user_id, material_id, previous_status, target_status)
+        message = f"Статус изменен: {previous_status} -> {target_status}"
+        if comment:
+            message += f" ({comment})"
+        return True, message
@@ -85,34 +85,32 @@ class PPSDTelegramBot:
             f"📅 <b>Дата:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}"
         )
     
-    async def send_qc_approval(self, material_data: Dict, qc_operator: str) -> bool:
-        """Отправка уведомления об одобрении ОТК"""
-        message = (
+    def format_qc_approval(self, material_data: Dict, qc_operator: str) -> str:
+        """Текст уведомления об одобрении ОТК"""
+        return (
             f"{self.emojis['success']} <b>МАТЕРИАЛ ОДОБРЕН ОТК</b>\n\n"
             f"{self.format_material_info(material_data)}\n\n"
             f"{self.emojis['qc']} <b>Сотрудник ОТК:</b> {qc_operator}\n"
             f"{self.emojis['approved']} <b>Статус:</b> Одобрен для использования"
         )
-        return await self.send_message(message)
     
-    async def send_qc_rejection(self, material_data: Dict, qc_operator: str, defects: List[str]) -> bool:
-        """Отправка уведомления об отклонении ОТК с замечаниями"""
+    def format_qc_rejection(self, material_data: Dict, qc_operator: str, defects: List[str]) -> str:
+        """Текст уведомления об отклонении ОТК с замечаниями"""
         defects_text = "\n".join([f"• {defect}" for defect in defects])
         
-        message = (
+        return (
             f"{self.emojis['error']} <b>МАТЕРИАЛ ОТКЛОНЕН ОТК</b>\n\n"
             f"{self.format_material_info(material_data)}\n\n"
             f"{self.emojis['qc']} <b>Сотрудник ОТК:</b> {qc_operator}\n"
             f"{self.emojis['rejected']} <b>Статус:</b> Отклонен\n\n"
             f"<b>🔍 Список замечаний:</b>\n{defects_text}"
         )
-        return await self.send_message(message)
     
-    async def send_lab_test_failure(self, material_data: Dict, test_data: Dict, discrepancies: List[str]) -> bool:
-        """Отправка уведомления о браке в лаборатории ЦЗЛ"""
+    def format_lab_test_failure(self, material_data: Dict, test_data: Dict, discrepancies: List[str]) -> str:
+        """Текст уведомления о браке в лаборатории ЦЗЛ"""
         discrepancies_text = "\n".join([f"• {disc}" for disc in discrepancies])
         
-        message = (
+        return (
             f"{self.emojis['error']} <b>БРАК ЛАБОРАТОРИИ ЦЗЛ</b>\n\n"
             f"{self.format_material_info(material_data)}\n\n"
             f"{self.emojis['test']} <b>Тип испытания:</b> {test_data.get('test_type', 'Н/Д')}\n"
@@ -120,18 +118,44 @@ class PPSDTelegramBot:
             f"👨‍🔬 <b>Инженер ЦЗЛ:</b> {test_data.get('engineer', 'Н/Д')}\n\n"
             f"<b>⚡ Несоответствия:</b>\n{discrepancies_text}"
         )
-        return await self.send_message(message)
     
-    async def send_final_acceptance(self, material_data: Dict, responsible_person: str, acceptance_type: str = "ППСД") -> bool:
-        """Отправка уведомления о окончательной приемке"""
-        message = (
+    def format_final_acceptance(self, material_data: Dict, responsible_person: str, acceptance_type: str = "ППСД") -> str:
+        """Текст уведомления о окончательной приемке"""
+        return (
             f"{self.emojis['success']} <b>ОКОНЧАТЕЛЬНАЯ ПРИЕМКА {acceptance_type}</b>\n\n"
             f"{self.format_material_info(material_data)}\n\n"
             f"👤 <b>Ответственный:</b> {responsible_person}\n"
             f"{self.emojis['approved']} <b>Статус:</b> Материал принят в эксплуатацию\n"
             f"📋 <b>Заключение:</b> Все проверки пройдены успешно"
         )
-        return await self.send_message(message)
+    
+    def format_status_change(self, material_data: Dict, old_status: str, new_status: str, changed_by: str) -> str:
+        """Текст уведомления об изменении статуса"""
+        return (
+            f"{self.emojis['info']} <b>ИЗМЕНЕНИЕ СТАТУСА МАТЕРИАЛА</b>\n\n"
+            f"{self.format_material_info(material_data)}\n\n"
+            f"📊 <b>Было:</b> {old_status}\n"
+            f"📊 <b>Стало:</b> {new_status}\n"
+            f"👤 <b>Изменил:</b> {changed_by}"
+        )
+    
+    async def send_qc_approval(self, material_data: Dict, qc_operator: str) -> bool:
+        """Отправка уведомления об одобрении ОТК"""
+        return await self.send_message(self.format_qc_approval(material_data, qc_operator))
+    
+    async def send_qc_rejection(self, material_data: Dict, qc_operator: str, defects: List[str]) -> bool:
+        """Отправка уведомления об отклонении ОТК с замечаниями"""
+        return await self.send_message(self.format_qc_rejection(material_data, qc_operator, defects))
+    
+    async def send_lab_test_failure(self, material_data: Dict, test_data: Dict, discrepancies: List[str]) -> bool:
+        """Отправка уведомления о браке в лаборатории ЦЗЛ"""
+        return await self.send_message(self.format_lab_test_failure(material_data, test_data, discrepancies))
+    
+    async def send_final_acceptance(self, material_data: Dict, responsible_person: str, acceptance_type: str = "ППСД") -> bool:
+        """Отправка уведомления о окончательной приемке"""
+        return await self.send_message(
+            self.format_final_acceptance(material_data, responsible_person, acceptance_type)
+        )
     
     async def send_urgent_notification(self, title: str, message: str) -> bool:
         """Отправка срочного уведомления"""
@@ -145,14 +169,7 @@ class PPSDTelegramBot:
     
     async def send_status_change(self, material_data: Dict, old_status: str, new_status: str, changed_by: str) -> bool:
         """Отправка уведомления об изменении статуса"""
-        message = (
-            f"{self.emojis['info']} <b>ИЗМЕНЕНИЕ СТАТУСА МАТЕРИАЛА</b>\n\n"
-            f"{self.format_material_info(material_data)}\n\n"
-            f"📊 <b>Было:</b> {old_status}\n"
-            f"📊 <b>Стало:</b> {new_status}\n"
-            f"👤 <b>Изменил:</b> {changed_by}"
-        )
-        return await self.send_message(message)
+        return await self.send_message(self.format_status_change(material_data, old_status, new_status, changed_by))
     
     def send_message_sync(self, text: str, chat_id: Optional[str] = None) -> bool:
         """Синхронная версия отправки сообщения"""
@@ -200,14 +217,21 @@ class PPSDTelegramBot:
 
     def send_error_sync(self, error_message: str, error_details: str = None) -> bool:
         """Синхронная обертка для отправки уведомления об ошибке"""
+        return self.send_message_sync(self.format_error(error_message, error_details))
+    
+    def format_error(self, error_message: str, error_details: str = None) -> str:
+        """Текст уведомления об ошибке"""
         message = f"⚠️ ОШИБКА: {error_message}"
         if error_details:
             message += f"\n\nДетали: {error_details}"
-        
-        return self.send_message_sync(message)
+        return message
     
     def send_system_event_sync(self, event_type: str, details: str = None) -> bool:
         """Синхронная обертка для отправки уведомления о системном событии"""
+        return self.send_message_sync(self.format_system_event(event_type, details))
+    
+    def format_system_event(self, event_type: str, details: str = None) -> str:
+        """Текст уведомления о системном событии"""
         event_type_map = {
             "startup": "🟢 Система запущена",
             "shutdown": "🔴 Система остановлена",
@@ -220,13 +244,18 @@ class PPSDTelegramBot:
         message = f"{title}"
         if details:
             message += f"\n\n{details}"
-        
-        return self.send_message_sync(message)
+        return message
     
     def send_status_change_notification_sync(self, material_id: int, old_status: str, new_status: str, 
                                           changed_by: str) -> bool:
         """Синхронная функция для отправки уведомления об изменении статуса материала"""
-        from models.models import MaterialStatus
+        return self.send_message_sync(
+            self.format_status_change_notification(material_id, old_status, new_status, changed_by)
+        )
+    
+    def format_status_change_notification(self, material_id: int, old_status: str, new_status: str,
+                                          changed_by: str) -> str:
+        """Текст уведомления об изменении статуса материала по ID"""
         from utils.material_utils import get_status_display_name
         
         old_status_display = get_status_display_name(old_status)
@@ -236,100 +265,59 @@ class PPSDTelegramBot:
         message += f"Старый статус: {old_status_display}\n"
         message += f"Новый статус: {new_status_display}\n"
         message += f"Изменил: {changed_by}"
-        
-        return self.send_message_sync(message)
+        return message
 
 # Глобальный экземпляр бота
 telegram_bot = PPSDTelegramBot()
 
+# Функции ниже не отправляют сообщение сразу, а записывают его в таблицу
+# notification_outbox; отправляет фоновый диспетчер (utils.notification_dispatcher).
+# Поэтому они не блокируют поток интерфейса и не теряют сообщения без сети.
+
+def _queue_message(event_type: str, text: str) -> bool:
+    """Записать сообщение в общий чат в outbox отдельной транзакцией"""
+    from database.connection import SessionLocal
+    from utils.notification_outbox import enqueue_notification
+    
+    db = SessionLocal()
+    try:
+        enqueue_notification(db, event_type, text)
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Не удалось поставить уведомление в очередь: {e}")
+        return False
+    finally:
+        db.close()
+
 def send_qc_approval_notification(material_data: Dict, qc_operator: str) -> bool:
     """Отправить уведомление об одобрении материала ОТК"""
-    return telegram_bot.send_qc_approval_sync(material_data, qc_operator)
+    return _queue_message("qc_approval", telegram_bot.format_qc_approval(material_data, qc_operator))
 
 def send_qc_rejection_notification(material_data: Dict, qc_operator: str, defects: List[str]) -> bool:
     """Отправить уведомление о забраковке материала ОТК"""
-    return telegram_bot.send_qc_rejection_sync(material_data, qc_operator, defects)
+    return _queue_message("qc_rejection", telegram_bot.format_qc_rejection(material_data, qc_operator, defects))
 
 def send_lab_test_failure_notification(material_data: Dict, test_data: Dict, discrepancies: List[str]) -> bool:
     """Отправить уведомление о негативных результатах лабораторных испытаний"""
-    return telegram_bot.send_lab_test_failure_sync(material_data, test_data, discrepancies)
+    return _queue_message("lab_test_failure",
+                          telegram_bot.format_lab_test_failure(material_data, test_data, discrepancies))
 
 def send_final_acceptance_notification(material_data: Dict, responsible_person: str, acceptance_type: str = "ППСД") -> bool:
     """Отправить уведомление о финальном одобрении материала"""
-    return telegram_bot.send_final_acceptance_sync(material_data, responsible_person, acceptance_type)
+    return _queue_message("final_acceptance",
+                          telegram_bot.format_final_acceptance(material_data, responsible_person, acceptance_type))
 
 def send_error_notification(error_message: str, error_details: str = None) -> bool:
     """Отправить уведомление об ошибке"""
-    return telegram_bot.send_error_sync(error_message, error_details)
+    return _queue_message("error", telegram_bot.format_error(error_message, error_details))
 
 def send_system_event_notification(event_type: str, details: str = None) -> bool:
     """Отправить уведомление о системном событии"""
-    return telegram_bot.send_system_event_sync(event_type, details)
+    return _queue_message("system_event", telegram_bot.format_system_event(event_type, details))
 
 def send_status_change_notification(material_id: int, old_status: str, new_status: str, changed_by: str) -> bool:
     """Отправить уведомление об изменении статуса материала"""
-    return telegram_bot.send_status_change_notification_sync(material_id, old_status, new_status, changed_by)
-
-# Примеры использования
-def send_qc_approval_notification(material):
-    """Отправка уведомления о положительном результате проверки ОТК"""
-    from database.connection import SessionLocal
-    db = SessionLocal()
-    try:
-        # Формируем минимальные данные для уведомления
-        material_data = {
-            "id": material.id,
-            "material_grade": material.material_grade,
-            "batch_number": material.batch_number,
-            "melt_number": material.melt_number
-        }
-        
-        # Получаем имя пользователя
-        user = db.query(User).filter(User.id == material.created_by_id).first()
-        operator_name = user.full_name if user else "Неизвестный пользователь"
-        
-        send_qc_approval_notification(material_data, operator_name)
-    finally:
-        db.close()
-
-def send_qc_rejection_notification(material, comment=None):
-    """Отправка уведомления о негативном результате проверки ОТК"""
-    material_data = {
-        "id": material.id,
-        "material_grade": material.material_grade,
-        "batch_number": material.batch_number or "Нет",
-        "melt_number": material.melt_number
-    }
-    
-    defects = ["Несоответствие сертификата"]
-    if comment:
-        defects.append(comment)
-    
-    send_qc_rejection_notification(material_data, "Инспектор ОТК", defects)
-
-def send_lab_test_failure_notification(material, comment=None):
-    """Отправка уведомления о негативном результате лабораторных испытаний"""
-    material_data = {
-        "id": material.id,
-        "material_grade": material.material_grade,
-        "batch_number": material.batch_number or "Нет",
-        "melt_number": material.melt_number
-    }
-    
-    test_data = {"test_type": "Химический анализ"}
-    discrepancies = ["Несоответствие химического состава"]
-    if comment:
-        discrepancies.append(comment)
-    
-    send_lab_test_failure_notification(material_data, test_data, discrepancies)
-
-def send_final_acceptance_notification(material):
-    """Отправка уведомления о финальном одобрении материала"""
-    material_data = {
-        "id": material.id,
-        "material_grade": material.material_grade,
-        "batch_number": material.batch_number or "Нет",
-        "melt_number": material.melt_number
-    }
-    
-    send_final_acceptance_notification(material_data, "Инспектор ЦЗЛ") 
\ No newline at end of file
+    return _queue_message("status_change", telegram_bot.format_status_change_notification(
+        material_id, old_status, new_status, changed_by))
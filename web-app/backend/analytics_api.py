@@ -9,19 +9,35 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import pandas as pd
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import func, desc, and_, or_, case, true
 
 # Добавляем корневую директорию в путь
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
-from database.connection import SessionLocal
-from models.models import MaterialEntry, User, Supplier, MaterialType, MaterialStatus, UserRole
+from database.connection import SessionLocal, check_database_settings
+from utils.response_cache import ConditionalGetMiddleware
+from models.models import MaterialEntry, User, Supplier, MaterialType, MaterialStatus, UserRole, DailyMaterialRollup
+from stage_analytics import compute_stage_durations
+from report_export import EXPORT_MEDIA_TYPES, generate_export
 
 app = FastAPI(title="ППСД Analytics API", version="1.0.0")
 
+# Кэшируемые GET-маршруты: путь -> таблицы, от которых зависит ответ
+CACHED_ROUTES = [
+    (r"/statistics", ("material_entries",)),
+    (r"/materials/distribution", ("material_entries",)),
+    (r"/suppliers/stats", ("material_entries", "suppliers", "daily_material_rollup")),
+    (r"/materials/timeline", ("material_entries", "daily_material_rollup")),
+    (r"/materials/grades", ("material_entries", "daily_material_rollup")),
+    (r"/processing/time-stats", ("material_status_history", "material_entries", "suppliers")),
+    (r"/kpi/dashboard", ("material_entries",)),
+]
+
+app.add_middleware(ConditionalGetMiddleware, routes=CACHED_ROUTES)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -29,8 +45,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
+@app.on_event("startup")
+async def startup_self_check():
+    """Проверка настроек базы данных при запуске"""
+    check_database_settings()
+
 def get_db():
     """Получение сессии базы данных"""
     db = SessionLocal()
@@ -39,6 +61,87 @@ def get_db():
     finally:
         db.close()
 
+# Группы статусов для статистики: ключ ответа -> статусы
+STATUS_BUCKETS = {
+    'approved': [MaterialStatus.APPROVED.value],
+    'rejected': [MaterialStatus.REJECTED.value],
+    'pending_qc': [MaterialStatus.QC_CHECK_PENDING.value],
+    'pending_lab': [MaterialStatus.LAB_CHECK_PENDING.value],
+    'in_testing': [MaterialStatus.TESTING.value],
+    'received': [MaterialStatus.RECEIVED.value],
+    'qc_check': [MaterialStatus.QC_CHECKED.value],
+    'lab_testing': [
+        MaterialStatus.SAMPLES_REQUESTED.value,
+        MaterialStatus.SAMPLES_COLLECTED.value,
+        MaterialStatus.TESTING.value
+    ],
+}
+
+def aggregate_status_buckets(
+    db: Session,
+    periods: List[tuple],
+    supplier_id: Optional[int] = None,
+    material_grade: Optional[str] = None
+) -> List[Dict[str, int]]:
+    """
+    Подсчет материалов по группам статусов для нескольких периодов
+    одним сгруппированным запросом
+    
+    Args:
+        db: Сессия базы данных
+        periods: Список (начало, конец) по created_at; None - без границы
+        supplier_id: Фильтр по поставщику
+        material_grade: Фильтр по марке (подстрока)
+        
+    Returns:
+        list: Для каждого периода словарь {'total_materials': n, <группа>: n, ...}
+    """
+    def period_condition(start, end):
+        conditions = []
+        if start is not None:
+            conditions.append(MaterialEntry.created_at >= start)
+        if end is not None:
+            conditions.append(MaterialEntry.created_at < end)
+        return and_(true(), *conditions)
+    
+    period_column = case(
+        *[(period_condition(start, end), index) for index, (start, end) in enumerate(periods)],
+        else_=None
+    ).label('period')
+    
+    columns = [period_column, func.count(MaterialEntry.id).label('total_materials')]
+    for bucket, statuses in STATUS_BUCKETS.items():
+        columns.append(func.sum(case((MaterialEntry.status.in_(statuses), 1), else_=0)).label(bucket))
+    
+    query = db.query(*columns).filter(MaterialEntry.is_deleted == False)
+    
+    # Общие границы всех периодов, чтобы использовать индекс по created_at
+    starts = [start for start, _ in periods]
+    ends = [end for _, end in periods]
+    if None not in starts:
+        query = query.filter(MaterialEntry.created_at >= min(starts))
+    if None not in ends:
+        query = query.filter(MaterialEntry.created_at < max(ends))
+    
+    if supplier_id:
+        query = query.filter(MaterialEntry.supplier_id == supplier_id)
+    
+    if material_grade:
+        query = query.filter(MaterialEntry.material_grade.ilike(f"%{material_grade}%"))
+    
+    empty = {'total_materials': 0, **{bucket: 0 for bucket in STATUS_BUCKETS}}
+    results = [dict(empty) for _ in periods]
+    
+    for row in query.group_by(period_column).all():
+        if row.period is None:
+            continue
+        results[row.period] = {
+            'total_materials': row.total_materials,
+            **{bucket: getattr(row, bucket) or 0 for bucket in STATUS_BUCKETS}
+        }
+    
+    return results
+
 # Pydantic модели для ответов
 class StatisticsResponse(BaseModel):
     total_materials: int
@@ -73,6 +176,12 @@ class ProcessingTimeStats(BaseModel):
     stage: str
     avg_processing_time_hours: float
     avg_processing_time_days: float
+    stage_code: str
+    group: Optional[str] = None
+    count: int
+    median_hours: float
+    p90_hours: float
+    p99_hours: float
 
 class MaterialGradeStats(BaseModel):
     grade: str
@@ -93,39 +202,14 @@ async def get_statistics(
 ):
     """Получение общей статистики системы"""
     
-    # Базовый запрос
-    query = db.query(MaterialEntry).filter(MaterialEntry.is_deleted == False)
+    start_date = datetime.now() - timedelta(days=days) if days > 0 else None
     
-    # Фильтрация по дате
-    if days > 0:
-        start_date = datetime.now() - timedelta(days=days)
-        query = query.filter(MaterialEntry.created_at >= start_date)
-    
-    # Дополнительные фильтры
-    if supplier_id:
-        query = query.filter(MaterialEntry.supplier_id == supplier_id)
-    
-    if material_grade:
-        query = query.filter(MaterialEntry.material_grade.ilike(f"%{material_grade}%"))
-    
-    # Подсчет по статусам
-    total_materials = query.count()
-    
-    stats = {
-        'total_materials': total_materials,
-        'approved': query.filter(MaterialEntry.status == MaterialStatus.APPROVED.value).count(),
-        'rejected': query.filter(MaterialEntry.status == MaterialStatus.REJECTED.value).count(),
-        'pending_qc': query.filter(MaterialEntry.status == MaterialStatus.QC_CHECK_PENDING.value).count(),
-        'pending_lab': query.filter(MaterialEntry.status == MaterialStatus.LAB_CHECK_PENDING.value).count(),
-        'in_testing': query.filter(MaterialEntry.status == MaterialStatus.TESTING.value).count(),
-        'received': query.filter(MaterialEntry.status == MaterialStatus.RECEIVED.value).count(),
-        'qc_check': query.filter(MaterialEntry.status == MaterialStatus.QC_CHECKED.value).count(),
-        'lab_testing': query.filter(MaterialEntry.status.in_([
-            MaterialStatus.SAMPLES_REQUESTED.value,
-            MaterialStatus.SAMPLES_COLLECTED.value,
-            MaterialStatus.TESTING.value
-        ])).count()
-    }
+    stats = aggregate_status_buckets(
+        db,
+        [(start_date, None)],
+        supplier_id=supplier_id,
+        material_grade=material_grade
+    )[0]
     
     return StatisticsResponse(**stats)
 
@@ -160,38 +244,67 @@ async def get_materials_distribution(
     
     return distribution
 
+def rollup_start_day(days: int):
+    """Первый день окна для запросов к ежедневной сводке"""
+    return (datetime.utcnow() - timedelta(days=days)).date()
+
 @app.get("/suppliers/stats", response_model=List[SupplierStats])
 async def get_suppliers_stats(
     days: int = Query(90, description="Количество дней для анализа"),
     limit: int = Query(10, description="Количество топ поставщиков"),
+    exact: bool = Query(False, description="Точное окно от текущего момента вместо целых суток"),
     db: Session = Depends(get_db)
 ):
     """Получение статистики по поставщикам"""
     
-    start_date = datetime.now() - timedelta(days=days)
-    
-    # Запрос статистики по поставщикам
-    supplier_stats = db.query(
-        Supplier.name,
-        func.count(MaterialEntry.id).label('total_materials'),
-        func.sum(func.case(
-            (MaterialEntry.status == MaterialStatus.APPROVED.value, 1),
-            else_=0
-        )).label('approved_count'),
-        func.sum(func.case(
-            (MaterialEntry.status == MaterialStatus.REJECTED.value, 1),
-            else_=0
-        )).label('rejected_count')
-    ).join(
-        MaterialEntry, Supplier.id == MaterialEntry.supplier_id
-    ).filter(
-        MaterialEntry.is_deleted == False,
-        MaterialEntry.created_at >= start_date
-    ).group_by(
-        Supplier.id, Supplier.name
-    ).order_by(
-        desc('total_materials')
-    ).limit(limit).all()
+    if exact:
+        start_date = datetime.now() - timedelta(days=days)
+        
+        # Запрос статистики по поставщикам
+        supplier_stats = db.query(
+            Supplier.name,
+            func.count(MaterialEntry.id).label('total_materials'),
+            func.sum(case(
+                (MaterialEntry.status == MaterialStatus.APPROVED.value, 1),
+                else_=0
+            )).label('approved_count'),
+            func.sum(case(
+                (MaterialEntry.status == MaterialStatus.REJECTED.value, 1),
+                else_=0
+            )).label('rejected_count')
+        ).join(
+            MaterialEntry, Supplier.id == MaterialEntry.supplier_id
+        ).filter(
+            MaterialEntry.is_deleted == False,
+            MaterialEntry.created_at >= start_date
+        ).group_by(
+            Supplier.id, Supplier.name
+        ).order_by(
+            desc('total_materials')
+        ).limit(limit).all()
+    else:
+        # Ответ из ежедневной сводки
+        supplier_stats = db.query(
+            Supplier.name,
+            func.sum(DailyMaterialRollup.materials_count).label('total_materials'),
+            func.sum(case(
+                (DailyMaterialRollup.status == MaterialStatus.APPROVED.value, DailyMaterialRollup.materials_count),
+                else_=0
+            )).label('approved_count'),
+            func.sum(case(
+                (DailyMaterialRollup.status == MaterialStatus.REJECTED.value, DailyMaterialRollup.materials_count),
+                else_=0
+            )).label('rejected_count')
+        ).join(
+            DailyMaterialRollup, Supplier.id == DailyMaterialRollup.supplier_id
+        ).filter(
+            DailyMaterialRollup.day >= rollup_start_day(days),
+            DailyMaterialRollup.materials_count > 0
+        ).group_by(
+            Supplier.id, Supplier.name
+        ).order_by(
+            desc('total_materials')
+        ).limit(limit).all()
     
     stats = []
     for name, total, approved, rejected in supplier_stats:
@@ -212,35 +325,56 @@ async def get_suppliers_stats(
 @app.get("/materials/timeline", response_model=List[TimelineData])
 async def get_materials_timeline(
     days: int = Query(30, description="Количество дней для анализа"),
+    exact: bool = Query(False, description="Точное окно от текущего момента вместо целых суток"),
     db: Session = Depends(get_db)
 ):
     """Получение временной линии поступления материалов"""
     
-    start_date = datetime.now() - timedelta(days=days)
-    
-    # Группировка по дням
-    timeline_data = db.query(
-        func.date(MaterialEntry.created_at).label('date'),
-        func.count(MaterialEntry.id).label('materials_count'),
-        func.sum(func.case(
-            (MaterialEntry.status == MaterialStatus.APPROVED.value, 1),
-            else_=0
-        )).label('approved_count'),
-        func.sum(func.case(
-            (MaterialEntry.status == MaterialStatus.REJECTED.value, 1),
-            else_=0
-        )).label('rejected_count')
-    ).filter(
-        MaterialEntry.is_deleted == False,
-        MaterialEntry.created_at >= start_date
-    ).group_by(
-        func.date(MaterialEntry.created_at)
-    ).order_by('date').all()
+    if exact:
+        start_date = datetime.now() - timedelta(days=days)
+        
+        # Группировка по дням
+        timeline_data = db.query(
+            func.date(MaterialEntry.created_at).label('date'),
+            func.count(MaterialEntry.id).label('materials_count'),
+            func.sum(case(
+                (MaterialEntry.status == MaterialStatus.APPROVED.value, 1),
+                else_=0
+            )).label('approved_count'),
+            func.sum(case(
+                (MaterialEntry.status == MaterialStatus.REJECTED.value, 1),
+                else_=0
+            )).label('rejected_count')
+        ).filter(
+            MaterialEntry.is_deleted == False,
+            MaterialEntry.created_at >= start_date
+        ).group_by(
+            func.date(MaterialEntry.created_at)
+        ).order_by('date').all()
+    else:
+        # Ответ из ежедневной сводки
+        timeline_data = db.query(
+            DailyMaterialRollup.day.label('date'),
+            func.sum(DailyMaterialRollup.materials_count).label('materials_count'),
+            func.sum(case(
+                (DailyMaterialRollup.status == MaterialStatus.APPROVED.value, DailyMaterialRollup.materials_count),
+                else_=0
+            )).label('approved_count'),
+            func.sum(case(
+                (DailyMaterialRollup.status == MaterialStatus.REJECTED.value, DailyMaterialRollup.materials_count),
+                else_=0
+            )).label('rejected_count')
+        ).filter(
+            DailyMaterialRollup.day >= rollup_start_day(days),
+            DailyMaterialRollup.materials_count > 0
+        ).group_by(
+            DailyMaterialRollup.day
+        ).order_by('date').all()
     
     timeline = []
     for date, materials_count, approved_count, rejected_count in timeline_data:
         timeline.append(TimelineData(
-            date=date.strftime('%Y-%m-%d'),
+            date=str(date),  # SQLite func.date возвращает строку, сводка - date
             materials_count=materials_count,
             approved_count=approved_count or 0,
             rejected_count=rejected_count or 0
@@ -251,30 +385,34 @@ async def get_materials_timeline(
 @app.get("/processing/time-stats", response_model=List[ProcessingTimeStats])
 async def get_processing_time_stats(
     days: int = Query(90, description="Количество дней для анализа"),
+    date_from: Optional[datetime] = Query(None, description="Начало периода (UTC), заменяет days"),
+    date_to: Optional[datetime] = Query(None, description="Конец периода (UTC)"),
+    group_by: Optional[str] = Query(None, description="Группировка: supplier, grade, type"),
     db: Session = Depends(get_db)
 ):
     """Получение статистики времени обработки по этапам"""
     
-    # Это упрощенная версия - в реальности нужно отслеживать время перехода между статусами
-    # Пока возвращаем тестовые данные
-    
-    stats = [
-        ProcessingTimeStats(
-            stage="ОТК проверка",
-            avg_processing_time_hours=48.5,
-            avg_processing_time_days=2.0
-        ),
-        ProcessingTimeStats(
-            stage="Лабораторные испытания",
-            avg_processing_time_hours=120.0,
-            avg_processing_time_days=5.0
-        ),
-        ProcessingTimeStats(
-            stage="Окончательное утверждение",
-            avg_processing_time_hours=24.0,
-            avg_processing_time_days=1.0
-        )
-    ]
+    if group_by not in (None, "supplier", "grade", "type"):
+        raise HTTPException(status_code=400, detail="Поддерживаемые группировки: supplier, grade, type")
+    
+    # Окно выравнивается по началу суток, чтобы повторные запросы попадали в кэш
+    if date_from is None:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        date_from = today - timedelta(days=days)
+    
+    stats = []
+    for item in compute_stage_durations(db, date_from, date_to, group_by):
+        stats.append(ProcessingTimeStats(
+            stage=item["stage_name"],
+            avg_processing_time_hours=round(item["mean_hours"], 2),
+            avg_processing_time_days=round(item["mean_hours"] / 24, 2),
+            stage_code=item["stage"],
+            group=item["group"],
+            count=item["count"],
+            median_hours=round(item["median_hours"], 2),
+            p90_hours=round(item["p90_hours"], 2),
+            p99_hours=round(item["p99_hours"], 2)
+        ))
     
     return stats
 
@@ -282,24 +420,40 @@ async def get_processing_time_stats(
 async def get_material_grades_stats(
     days: int = Query(90, description="Количество дней для анализа"),
     limit: int = Query(15, description="Количество топ марок"),
+    exact: bool = Query(False, description="Точное окно от текущего момента вместо целых суток"),
     db: Session = Depends(get_db)
 ):
     """Получение статистики по маркам материалов"""
     
-    start_date = datetime.now() - timedelta(days=days)
-    
-    grade_stats = db.query(
-        MaterialEntry.material_grade,
-        func.count(MaterialEntry.id).label('count'),
-        func.max(MaterialEntry.created_at).label('latest_date')
-    ).filter(
-        MaterialEntry.is_deleted == False,
-        MaterialEntry.created_at >= start_date
-    ).group_by(
-        MaterialEntry.material_grade
-    ).order_by(
-        desc('count')
-    ).limit(limit).all()
+    if exact:
+        start_date = datetime.now() - timedelta(days=days)
+        
+        grade_stats = db.query(
+            MaterialEntry.material_grade,
+            func.count(MaterialEntry.id).label('count'),
+            func.max(MaterialEntry.created_at).label('latest_date')
+        ).filter(
+            MaterialEntry.is_deleted == False,
+            MaterialEntry.created_at >= start_date
+        ).group_by(
+            MaterialEntry.material_grade
+        ).order_by(
+            desc('count')
+        ).limit(limit).all()
+    else:
+        # Ответ из ежедневной сводки
+        grade_stats = db.query(
+            DailyMaterialRollup.material_grade,
+            func.sum(DailyMaterialRollup.materials_count).label('count'),
+            func.max(DailyMaterialRollup.last_created_at).label('latest_date')
+        ).filter(
+            DailyMaterialRollup.day >= rollup_start_day(days),
+            DailyMaterialRollup.materials_count > 0
+        ).group_by(
+            DailyMaterialRollup.material_grade
+        ).order_by(
+            desc('count')
+        ).limit(limit).all()
     
     stats = []
     for grade, count, latest_date in grade_stats:
@@ -321,27 +475,20 @@ async def get_kpi_dashboard(
     start_date = datetime.now() - timedelta(days=days)
     prev_start_date = start_date - timedelta(days=days)
     
-    # Текущий период
-    current_stats = db.query(MaterialEntry).filter(
-        MaterialEntry.is_deleted == False,
-        MaterialEntry.created_at >= start_date
+    # Текущий и предыдущий период одним запросом
+    current_stats, prev_stats = aggregate_status_buckets(
+        db,
+        [(start_date, None), (prev_start_date, start_date)]
     )
     
-    # Предыдущий период для сравнения
-    prev_stats = db.query(MaterialEntry).filter(
-        MaterialEntry.is_deleted == False,
-        MaterialEntry.created_at >= prev_start_date,
-        MaterialEntry.created_at < start_date
-    )
+    current_total = current_stats['total_materials']
+    prev_total = prev_stats['total_materials']
     
-    current_total = current_stats.count()
-    prev_total = prev_stats.count()
+    current_approved = current_stats['approved']
+    prev_approved = prev_stats['approved']
     
-    current_approved = current_stats.filter(MaterialEntry.status == MaterialStatus.APPROVED.value).count()
-    prev_approved = prev_stats.filter(MaterialEntry.status == MaterialStatus.APPROVED.value).count()
-    
-    current_rejected = current_stats.filter(MaterialEntry.status == MaterialStatus.REJECTED.value).count()
-    prev_rejected = prev_stats.filter(MaterialEntry.status == MaterialStatus.REJECTED.value).count()
+    current_rejected = current_stats['rejected']
+    prev_rejected = prev_stats['rejected']
     
     # Вычисление изменений в процентах
     def calculate_change(current, previous):
@@ -381,60 +528,22 @@ async def get_kpi_dashboard(
 @app.get("/export/analytics-report")
 async def export_analytics_report(
     days: int = Query(30, description="Количество дней для анализа"),
-    format: str = Query("json", description="Формат экспорта: json, csv"),
-    db: Session = Depends(get_db)
+    format: str = Query("json", description="Формат экспорта: json, ndjson, csv")
 ):
-    """Экспорт аналитического отчета"""
+    """Экспорт аналитического отчета (потоковая выгрузка)"""
     
-    if format not in ["json", "csv"]:
-        raise HTTPException(status_code=400, detail="Поддерживаемые форматы: json, csv")
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Поддерживаемые форматы: json, ndjson, csv")
     
     start_date = datetime.now() - timedelta(days=days)
     
-    # Получаем детальные данные
-    materials = db.query(MaterialEntry).filter(
-        MaterialEntry.is_deleted == False,
-        MaterialEntry.created_at >= start_date
-    ).all()
-    
-    # Формируем данные для экспорта
-    export_data = []
-    for material in materials:
-        supplier = db.query(Supplier).filter(Supplier.id == material.supplier_id).first()
-        
-        export_data.append({
-            "id": material.id,
-            "material_grade": material.material_grade,
-            "material_type": material.material_type,
-            "melt_number": material.melt_number,
-            "batch_number": material.batch_number,
-            "supplier_name": supplier.name if supplier else "Неизвестно",
-            "status": material.status,
-            "created_at": material.created_at.isoformat(),
-            "updated_at": material.updated_at.isoformat() if material.updated_at else None
-        })
-    
-    if format == "csv":
-        # Возвращаем CSV
-        import io
-        from fastapi.responses import StreamingResponse
-        
-        df = pd.DataFrame(export_data)
-        stream = io.StringIO()
-        df.to_csv(stream, index=False, encoding='utf-8')
-        response = StreamingResponse(
-            io.BytesIO(stream.getvalue().encode('utf-8')),
-            media_type="text/csv"
-        )
-        response.headers["Content-Disposition"] = f"attachment; filename=analytics_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        return response
-    
-    return {
-        "report_date": datetime.now().isoformat(),
-        "period_days": days,
-        "total_records": len(export_data),
-        "data": export_data
-    }
+    response = StreamingResponse(
+        generate_export(format, start_date, days),
+        media_type=EXPORT_MEDIA_TYPES[format]
+    )
+    if format != "json":
+        response.headers["Content-Disposition"] = f"attachment; filename=analytics_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return response
 
 if __name__ == "__main__":
     import uvicorn
@@ -24,7 +24,10 @@ import json
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
 from database.connection import SessionLocal
-from models.models import MaterialEntry, User, UserRole, MaterialStatus
+from models.models import MaterialEntry, UserRole, MaterialStatus
+from utils.notification_digest import queue_event
+from utils.notification_outbox import enqueue_notification
+from utils.recipient_directory import Recipient, get_recipients
 
 # Настройки логирования
 logging.basicConfig(level=logging.INFO)
@@ -133,14 +136,19 @@ class NotificationManager:
             subject = f"ППСД: Изменение статуса материала #{material_id}"
             
             message = self.create_status_change_message(material, old_status, new_status)
+            telegram_message = self.create_telegram_status_message(material, old_status, new_status)
+            summary = f"#{material.id} {material.material_grade}, плавка {material.melt_number}: " \
+                      f"{self.get_status_display_name(new_status)}"
             
             for user in users_to_notify:
-                if user.email:
-                    await self.send_email(user.email, subject, message)
+                email = user.email
+                if email:
+                    await self.send_email(email, subject, message)
                 
-                if user.telegram_chat_id:
-                    telegram_message = self.create_telegram_status_message(material, old_status, new_status)
-                    await self.send_telegram_message(user.telegram_chat_id, telegram_message)
+                # Telegram - через дайджест получателя (utils.notification_digest)
+                if user.telegram_id:
+                    queue_event(db, user.telegram_id, "status_change", summary, telegram_message,
+                                material_id=material.id, to_status=new_status, user_id=user.id)
                 
                 # Web push уведомление
                 self.send_web_push(
@@ -149,6 +157,7 @@ class NotificationManager:
                     f"Материал #{material_id} переведен в статус: {self.get_status_display_name(new_status)}",
                     {'material_id': material_id, 'status': new_status}
                 )
+            db.commit()
         
         finally:
             db.close()
@@ -162,19 +171,23 @@ class NotificationManager:
                 return
             
             # Уведомляем ОТК о новом материале
-            qc_users = db.query(User).filter(User.role == UserRole.QC.value).all()
+            qc_users = get_recipients([UserRole.QC.value])
             
             subject = f"ППСД: Новый материал для проверки #{material_id}"
+            summary = f"#{material.id} {material.material_grade}, плавка {material.melt_number}"
             
             for user in qc_users:
                 message = self.create_new_material_message(material)
                 
-                if user.email:
-                    await self.send_email(user.email, subject, message)
+                email = user.email
+                if email:
+                    await self.send_email(email, subject, message)
                 
-                if user.telegram_chat_id:
+                if user.telegram_id:
                     telegram_message = self.create_telegram_new_material_message(material)
-                    await self.send_telegram_message(user.telegram_chat_id, telegram_message)
+                    queue_event(db, user.telegram_id, "new_material", summary, telegram_message,
+                                material_id=material.id, user_id=user.id)
+            db.commit()
         
         finally:
             db.close()
@@ -184,16 +197,18 @@ class NotificationManager:
         db = SessionLocal()
         try:
             # Уведомляем администраторов
-            admins = db.query(User).filter(User.role == UserRole.ADMIN.value).all()
+            admins = get_recipients([UserRole.ADMIN.value])
             
             subject = f"ППСД: КРИТИЧЕСКОЕ СОБЫТИЕ - {event_type}"
             
             for admin in admins:
-                if admin.email:
+                email = admin.email
+                if email:
                     email_message = self.create_critical_event_message(event_type, message, affected_material_id)
-                    await self.send_email(admin.email, subject, email_message)
+                    await self.send_email(email, subject, email_message)
                 
-                if admin.telegram_chat_id:
+                # Критические события не ждут дайджеста - сразу в очередь отправки
+                if admin.telegram_id:
                     telegram_message = f"🚨 <b>КРИТИЧЕСКОЕ СОБЫТИЕ</b>\n\n" \
                                      f"<b>Тип:</b> {event_type}\n" \
                                      f"<b>Описание:</b> {message}\n" \
@@ -202,31 +217,28 @@ class NotificationManager:
                     if affected_material_id:
                         telegram_message += f"\n<b>Материал:</b> #{affected_material_id}"
                     
-                    await self.send_telegram_message(admin.telegram_chat_id, telegram_message)
+                    enqueue_notification(db, "critical_event", telegram_message, chat_id=str(admin.telegram_id))
+            db.commit()
         
         finally:
             db.close()
     
-    def get_users_for_status_notification(self, db, old_status: str, new_status: str) -> List[User]:
-        """Получение списка пользователей для уведомления об изменении статуса"""
-        users = []
-        
+    def get_users_for_status_notification(self, db, old_status: str, new_status: str) -> List[Recipient]:
+        """Получение списка пользователей для уведомления об изменении статуса (из справочника получателей)"""
         # Логика определения кого уведомлять в зависимости от изменения статуса
         if new_status == MaterialStatus.QC_CHECK_PENDING.value:
             # Уведомляем ОТК
-            users.extend(db.query(User).filter(User.role == UserRole.QC.value).all())
+            return get_recipients([UserRole.QC.value])
         
         elif new_status == MaterialStatus.LAB_CHECK_PENDING.value:
             # Уведомляем лабораторию
-            users.extend(db.query(User).filter(User.role == UserRole.LAB.value).all())
+            return get_recipients([UserRole.LAB.value])
         
         elif new_status in [MaterialStatus.APPROVED.value, MaterialStatus.REJECTED.value]:
             # Уведомляем склад и производство
-            users.extend(db.query(User).filter(
-                User.role.in_([UserRole.WAREHOUSE.value, UserRole.PRODUCTION.value])
-            ).all())
+            return get_recipients([UserRole.WAREHOUSE.value, UserRole.PRODUCTION.value])
         
-        return users
+        return []
     
     def create_status_change_message(self, material: MaterialEntry, old_status: str, new_status: str) -> str:
         """Создание сообщения об изменении статуса для email"""
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Потоковая выгрузка аналитического отчета (NDJSON, CSV, JSON)
+
+Материалы читаются одним запросом с JOIN поставщиков порциями по
+EXPORT_CHUNK_SIZE строк (yield_per), каждая порция сразу сериализуется
+и отдается в ответ. Память не зависит от длины периода.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import func, select
+
+from database.connection import SessionLocal
+from models.models import MaterialEntry, Supplier
+
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    "id", "material_grade", "material_type", "melt_number", "batch_number",
+    "supplier_name", "status", "created_at", "updated_at"
+]
+
+EXPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def build_export_query(start_date: datetime, end_date: Optional[datetime] = None):
+    """Запрос строк отчета, имя поставщика подставляется в SQL"""
+    statement = select(
+        MaterialEntry.id,
+        MaterialEntry.material_grade,
+        MaterialEntry.material_type,
+        MaterialEntry.melt_number,
+        MaterialEntry.batch_number,
+        func.coalesce(Supplier.name, "Неизвестно").label("supplier_name"),
+        MaterialEntry.status,
+        MaterialEntry.created_at,
+        MaterialEntry.updated_at,
+    ).outerjoin(
+        Supplier, Supplier.id == MaterialEntry.supplier_id
+    ).where(
+        MaterialEntry.is_deleted == False,
+        MaterialEntry.created_at >= start_date
+    )
+    if end_date:
+        statement = statement.where(MaterialEntry.created_at < end_date)
+    return statement.order_by(MaterialEntry.created_at, MaterialEntry.id)
+
+def iter_export_chunks(start_date: datetime, end_date: Optional[datetime] = None,
+                       chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[list]:
+    """
+    Порции строк отчета в виде словарей
+
+    Генератор открывает собственную сессию: он выполняется, пока отдается
+    ответ, когда сессия из зависимости get_db уже может быть закрыта.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            build_export_query(start_date, end_date).execution_options(yield_per=chunk_size)
+        )
+        for partition in result.partitions():
+            yield [_row_to_dict(row) for row in partition]
+    finally:
+        db.close()
+
+def _row_to_dict(row) -> dict:
+    """Строка результата -> запись отчета"""
+    return {
+        "id": row.id,
+        "material_grade": row.material_grade,
+        "material_type": row.material_type,
+        "melt_number": row.melt_number,
+        "batch_number": row.batch_number,
+        "supplier_name": row.supplier_name,
+        "status": row.status,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+    }
+
+def generate_ndjson(chunks: Iterator[list]) -> Iterator[bytes]:
+    """Одна JSON-запись на строку"""
+    for chunk in chunks:
+        yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in chunk).encode("utf-8")
+
+def generate_csv(chunks: Iterator[list]) -> Iterator[bytes]:
+    """CSV с заголовком, порция за порцией"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def generate_json(chunks: Iterator[list], report_date: datetime, days: int) -> Iterator[bytes]:
+    """
+    JSON-объект отчета с массивом data
+
+    total_records известен только после выгрузки, поэтому идет после data.
+    """
+    yield (
+        '{"report_date": ' + json.dumps(report_date.isoformat()) +
+        ', "period_days": ' + json.dumps(days) + ', "data": ['
+    ).encode("utf-8")
+    total = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parts = ",".join(json.dumps(record, ensure_ascii=False) for record in chunk)
+        yield ((", " if total else "") + parts).encode("utf-8")
+        total += len(chunk)
+    yield ('], "total_records": ' + json.dumps(total) + '}').encode("utf-8")
+
+def generate_export(format: str, start_date: datetime, days: int,
+                    end_date: Optional[datetime] = None) -> Iterator[bytes]:
+    """Генератор тела ответа для указанного формата"""
+    chunks = iter_export_chunks(start_date, end_date)
+    if format == "ndjson":
+        return generate_ndjson(chunks)
+    if format == "csv":
+        return generate_csv(chunks)
+    return generate_json(chunks, datetime.now(), days)
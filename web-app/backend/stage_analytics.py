@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Расчет длительности этапов обработки материалов по истории статусов
+
+Для каждого материала одним запросом по material_status_history вычисляются
+моменты достижения этапов (условная агрегация по материалу), длительности
+считаются в SQL, статистика (среднее, медиана, p90, p99) - векторно в NumPy.
+
+Результаты кэшируются по (окно, группировка). Кэш сбрасывается сам, когда
+в истории появляются новые переходы (меняется MAX(id)).
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from models.models import MaterialStatus
+
+# Статусы, по первому переходу в которые фиксируется момент этапа
+QC_DONE_STATUSES = [
+    MaterialStatus.QC_PASSED.value,
+    MaterialStatus.QC_FAILED.value,
+    MaterialStatus.QC_CHECKED.value,
+]
+LAB_STATUSES = [
+    MaterialStatus.LAB_TESTING.value,
+    MaterialStatus.LAB_CHECK_PENDING.value,
+    MaterialStatus.SAMPLES_REQUESTED.value,
+    MaterialStatus.SAMPLES_COLLECTED.value,
+    MaterialStatus.TESTING.value,
+    MaterialStatus.TESTING_COMPLETED.value,
+]
+READY_STATUSES = [
+    MaterialStatus.READY_FOR_USE.value,
+    MaterialStatus.APPROVED.value,
+    MaterialStatus.IN_USE.value,
+]
+
+# (код, название, столбец запроса)
+STAGES = [
+    ("received_to_qc", "ОТК проверка", "received_to_qc_hours"),
+    ("qc_to_lab", "Лабораторные испытания", "qc_to_lab_hours"),
+    ("lab_to_ready", "Окончательное утверждение", "lab_to_ready_hours"),
+]
+
+GROUP_COLUMNS = {
+    None: "NULL",
+    "supplier": "s.name",
+    "grade": "m.material_grade",
+    "type": "m.material_type",
+}
+
+# Этап попадает в окно, если он завершился внутри окна
+STAGE_DURATIONS_SQL = """
+WITH touched AS (
+    SELECT DISTINCT material_entry_id
+    FROM material_status_history
+    WHERE to_status IN :end_statuses
+      AND changed_at >= :date_from
+      AND (:date_to IS NULL OR changed_at < :date_to)
+),
+milestones AS (
+    SELECT h.material_entry_id AS material_id,
+           MIN(CASE WHEN h.from_status IS NULL THEN h.changed_at END) AS received_at,
+           MIN(CASE WHEN h.to_status IN :qc_exit_statuses THEN h.changed_at END) AS qc_done_at,
+           MIN(CASE WHEN h.to_status IN :lab_statuses THEN h.changed_at END) AS lab_started_at,
+           MIN(CASE WHEN h.to_status IN :ready_statuses THEN h.changed_at END) AS ready_at
+    FROM material_status_history h
+    JOIN touched t ON t.material_entry_id = h.material_entry_id
+    GROUP BY h.material_entry_id
+)
+SELECT {group_column} AS group_key,
+       CASE WHEN qc_done_at >= :date_from AND (:date_to IS NULL OR qc_done_at < :date_to)
+            THEN (julianday(qc_done_at) - julianday(received_at)) * 24 END AS received_to_qc_hours,
+       CASE WHEN lab_started_at >= :date_from AND (:date_to IS NULL OR lab_started_at < :date_to)
+            THEN (julianday(lab_started_at) - julianday(qc_done_at)) * 24 END AS qc_to_lab_hours,
+       CASE WHEN ready_at >= :date_from AND (:date_to IS NULL OR ready_at < :date_to)
+            THEN (julianday(ready_at) - julianday(lab_started_at)) * 24 END AS lab_to_ready_hours
+FROM milestones
+JOIN material_entries m ON m.id = milestones.material_id
+LEFT JOIN suppliers s ON s.id = m.supplier_id
+WHERE m.is_deleted = 0
+"""
+
+_CACHE_SIZE = 64
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _format_datetime(value: Optional[datetime]) -> Optional[str]:
+    """Формат, в котором SQLAlchemy хранит DateTime в SQLite"""
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f") if value else None
+
+def get_history_version(db: Session) -> int:
+    """Номер последнего перехода в истории статусов (дешевый запрос по PK)"""
+    return db.execute(text("SELECT COALESCE(MAX(id), 0) FROM material_status_history")).scalar()
+
+def invalidate_stage_cache() -> None:
+    """Очистить кэш статистики этапов"""
+    with _cache_lock:
+        _cache.clear()
+
+def _summarize(values: np.ndarray) -> Optional[Dict[str, float]]:
+    """Статистика по длительностям одного этапа, NaN и отрицательные значения отбрасываются"""
+    values = values[~np.isnan(values)]
+    values = values[values >= 0]
+    if values.size == 0:
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": int(values.size),
+        "mean_hours": float(values.mean()),
+        "median_hours": float(p50),
+        "p90_hours": float(p90),
+        "p99_hours": float(p99),
+    }
+
+def compute_stage_durations(db: Session, date_from: datetime, date_to: Optional[datetime] = None,
+                            group_by: Optional[str] = None) -> List[Dict]:
+    """
+    Статистика длительности этапов received→QC, QC→lab, lab→ready
+
+    Args:
+        db: Сессия базы данных
+        date_from: Начало окна (UTC)
+        date_to: Конец окна (UTC), None - до текущего момента
+        group_by: None, "supplier", "grade" или "type"
+
+    Returns:
+        list: Записи {stage, stage_name, group, count, mean_hours,
+              median_hours, p90_hours, p99_hours}
+    """
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"Unsupported group_by: {group_by}")
+
+    key = (date_from, date_to, group_by)
+    version = get_history_version(db)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    statement = text(STAGE_DURATIONS_SQL.format(group_column=GROUP_COLUMNS[group_by])).bindparams(
+        bindparam("end_statuses", expanding=True),
+        bindparam("qc_exit_statuses", expanding=True),
+        bindparam("lab_statuses", expanding=True),
+        bindparam("ready_statuses", expanding=True),
+    )
+    rows = db.execute(statement, {
+        "end_statuses": QC_DONE_STATUSES + LAB_STATUSES + READY_STATUSES,
+        "qc_exit_statuses": QC_DONE_STATUSES + LAB_STATUSES + READY_STATUSES,
+        "lab_statuses": LAB_STATUSES,
+        "ready_statuses": READY_STATUSES,
+        "date_from": _format_datetime(date_from),
+        "date_to": _format_datetime(date_to),
+    }).fetchall()
+
+    result = []
+    if rows:
+        groups = np.array([row[0] if row[0] is not None else "" for row in rows], dtype=object)
+        durations = np.array([row[1:] for row in rows], dtype=float)
+        group_keys, group_index = np.unique(groups, return_inverse=True)
+
+        for position, group_key in enumerate(group_keys):
+            group_durations = durations[group_index == position]
+            for column, (stage, stage_name, _) in enumerate(STAGES):
+                summary = _summarize(group_durations[:, column])
+                if summary is None:
+                    continue
+                summary.update({
+                    "stage": stage,
+                    "stage_name": stage_name,
+                    "group": group_key if group_by else None,
+                })
+                result.append(summary)
+
+    with _cache_lock:
+        _cache[key] = (version, result)
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return result
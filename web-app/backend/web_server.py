@@ -6,9 +6,13 @@ Flask веб-сервер для системы ППСД
 
 import os
 import sys
-from flask import Flask, render_template, send_from_directory, jsonify, request, redirect, url_for
+import time
+import threading
+from flask import Flask, Response, render_template, send_from_directory, jsonify, request, redirect, url_for
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
 from datetime import datetime
 
 # Добавляем корневую директорию в путь
@@ -20,56 +24,145 @@ app = Flask(__name__,
 CORS(app)
 
 # Конфигурация
-API_BASE_URL = 'http://localhost:8000'
+API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:8000')
 WEB_PORT = 5000
 
+# Прокси: одновременные запросы к API и таймауты (секунды)
+PROXY_MAX_CONCURRENCY = int(os.getenv('PROXY_MAX_CONCURRENCY', '32'))
+PROXY_QUEUE_TIMEOUT = float(os.getenv('PROXY_QUEUE_TIMEOUT', '5'))
+PROXY_CONNECT_TIMEOUT = float(os.getenv('PROXY_CONNECT_TIMEOUT', '3'))
+PROXY_READ_TIMEOUT = float(os.getenv('PROXY_READ_TIMEOUT', '30'))
+PROXY_CHUNK_SIZE = 64 * 1024
+
+PROXY_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+# Заголовки запроса, передаваемые в API
+FORWARDED_REQUEST_HEADERS = [
+    'Accept', 'Accept-Encoding', 'Authorization', 'Content-Type',
+    'If-None-Match', 'If-Modified-Since'
+]
+
+# Заголовки соединения (hop-by-hop), которые не передаются клиенту
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade'
+}
+
+# Общая сессия с пулом keep-alive соединений к API
+api_session = requests.Session()
+api_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=PROXY_MAX_CONCURRENCY, pool_block=True))
+api_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=PROXY_MAX_CONCURRENCY, pool_block=True))
+
+proxy_slots = threading.BoundedSemaphore(PROXY_MAX_CONCURRENCY)
+
+PROXY_LATENCY = Histogram(
+    'ppsd_proxy_request_seconds',
+    'Время проксирования запроса к API (до конца передачи тела)',
+    ['route', 'method', 'status']
+)
+PROXY_UPSTREAM_LATENCY = Histogram(
+    'ppsd_proxy_upstream_seconds',
+    'Время до получения заголовков ответа API',
+    ['route', 'method']
+)
+PROXY_IN_FLIGHT = Gauge('ppsd_proxy_in_flight', 'Запросы к API в обработке')
+
+def route_label(endpoint):
+    """Путь для метрик: числовые идентификаторы заменяются на {id}"""
+    return '/' + '/'.join('{id}' if part.isdigit() else part for part in endpoint.strip('/').split('/'))
+
 @app.route('/')
 def index():
     """Главная страница веб-интерфейса"""
     return render_template('index.html')
 
-@app.route('/api/<path:endpoint>')
+@app.route('/api/<path:endpoint>', methods=PROXY_METHODS)
 def proxy_api(endpoint):
-    """Прокси для API запросов"""
+    """Прокси для API запросов (тело ответа передается без разбора)"""
+    route = route_label(endpoint)
+    started = time.perf_counter()
+    
+    if not proxy_slots.acquire(timeout=PROXY_QUEUE_TIMEOUT):
+        PROXY_LATENCY.labels(route, request.method, '503').observe(time.perf_counter() - started)
+        return jsonify({
+            'error': 'Proxy is busy',
+            'message': 'Слишком много одновременных запросов, повторите позже'
+        }), 503
+    
+    PROXY_IN_FLIGHT.inc()
     try:
-        # Формируем URL для API
-        api_url = f"{API_BASE_URL}/{endpoint}"
-        
-        # Передаем параметры запроса
-        params = request.args.to_dict()
-        
         # Выполняем запрос к API
-        if request.method == 'GET':
-            response = requests.get(api_url, params=params)
-        elif request.method == 'POST':
-            response = requests.post(api_url, json=request.json, params=params)
-        elif request.method == 'PUT':
-            response = requests.put(api_url, json=request.json, params=params)
-        elif request.method == 'DELETE':
-            response = requests.delete(api_url, params=params)
-        else:
-            return jsonify({'error': 'Method not allowed'}), 405
-        
-        # Возвращаем ответ от API
-        return response.json(), response.status_code
-        
+        upstream = api_session.request(
+            request.method,
+            f"{API_BASE_URL}/{endpoint}",
+            params=list(request.args.items(multi=True)),
+            data=request.get_data() or None,
+            headers={name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers},
+            timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT),
+            stream=True,
+            allow_redirects=False
+        )
+        PROXY_UPSTREAM_LATENCY.labels(route, request.method).observe(time.perf_counter() - started)
+    except requests.exceptions.Timeout:
+        return _proxy_error(route, started, 504, {
+            'error': 'API server timeout',
+            'message': 'API сервер не ответил вовремя'
+        })
     except requests.exceptions.ConnectionError:
-        return jsonify({
+        return _proxy_error(route, started, 503, {
             'error': 'API server is not available',
             'message': 'Убедитесь, что API сервер запущен на порту 8000'
-        }), 503
+        })
     except Exception as e:
-        return jsonify({
+        return _proxy_error(route, started, 500, {
             'error': 'Proxy error',
             'message': str(e)
-        }), 500
+        })
+    
+    method = request.method
+    
+    def generate():
+        # Передаем тело как есть, без распаковки gzip
+        for chunk in upstream.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+            yield chunk
+    
+    def finish():
+        # Вызывается при закрытии ответа, в том числе при обрыве клиентом:
+        # соединение возвращается в пул, место освобождается
+        upstream.close()
+        _release_slot()
+        PROXY_LATENCY.labels(route, method, str(upstream.status_code)).observe(time.perf_counter() - started)
+    
+    headers = [
+        (name, value) for name, value in upstream.raw.headers.items()
+        if name.lower() not in HOP_BY_HOP_HEADERS
+    ]
+    response = Response(generate(), status=upstream.status_code, headers=headers)
+    response.call_on_close(finish)
+    return response
+
+def _release_slot():
+    """Освободить место в пуле одновременных запросов"""
+    PROXY_IN_FLIGHT.dec()
+    proxy_slots.release()
+
+def _proxy_error(route, started, status, body):
+    """Ответ прокси при ошибке обращения к API"""
+    _release_slot()
+    PROXY_LATENCY.labels(route, request.method, str(status)).observe(time.perf_counter() - started)
+    return jsonify(body), status
+
+@app.route('/metrics')
+def metrics():
+    """Метрики прокси в формате Prometheus"""
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
 
 @app.route('/health')
 def health_check():
     """Проверка состояния веб-сервера"""
     try:
         # Проверяем доступность API
-        api_response = requests.get(f"{API_BASE_URL}/", timeout=5)
+        api_response = api_session.get(f"{API_BASE_URL}/", timeout=5)
         api_status = "OK" if api_response.status_code == 200 else "ERROR"
     except:
         api_status = "UNAVAILABLE"
@@ -105,7 +198,7 @@ def internal_error(error):
 def check_api_server():
     """Проверка доступности API сервера"""
     try:
-        response = requests.get(f"{API_BASE_URL}/", timeout=5)
+        response = api_session.get(f"{API_BASE_URL}/", timeout=5)
         return response.status_code == 200
     except:
         return False